@@ -0,0 +1,86 @@
+""" Import-time guard for worker processes.
+
+    python -m benchmarks.import_time [--max-seconds 0.5] [--repeat 5]
+
+Imports the package entry points in fresh interpreters and exits non-zero
+if any lazily imported dependency was loaded, or if the package's own
+import time (over numpy and pandas, which it always needs) exceeds
+--max-seconds.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import List
+
+entry_points = [
+    'portfolio.portfolio.asset_groups',
+    'portfolio.scenario.scenarios',
+    'portfolio.scenario.sweeps',
+    'portfolio.utils.data_utils',
+]
+# Loaded on first use only. pyarrow is not listed: pandas imports it
+# whenever it is installed
+lazy_dependencies = ['matplotlib', 'boto3', 'botocore', 'scipy']
+
+_probe = """
+import json, sys, time
+start = time.perf_counter()
+{imports}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'loaded': [m for m in {lazy} if m in sys.modules],
+}}))
+"""
+
+
+def _import_seconds(modules: List[str]) -> dict:
+    code = _probe.format(
+        imports='\n'.join([f'import {module}' for module in modules]),
+        lazy=lazy_dependencies
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(repeat: int = 5) -> dict:
+    """ Best of repeat import times, with and without the package
+    """
+    baseline = min([_import_seconds(['numpy', 'pandas'])['seconds'] for _ in range(repeat)])
+    runs = list([_import_seconds(['numpy', 'pandas'] + entry_points) for _ in range(repeat)])
+    total = min([run['seconds'] for run in runs])
+    return {
+        'entry_points': entry_points,
+        'seconds': total,
+        'baseline_seconds': baseline,
+        'package_seconds': total - baseline,
+        'eagerly_loaded': sorted(set([m for run in runs for m in run['loaded']])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-seconds', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = measure(args.repeat)
+    print(json.dumps(result, indent=2))
+    failures = []
+    if result['eagerly_loaded']:
+        failures.append(f'lazy dependencies imported eagerly: {", ".join(result["eagerly_loaded"])}')
+    if result['package_seconds'] > args.max_seconds:
+        failures.append(f'package import took {result["package_seconds"]:.3f}s '
+                        f'(limit {args.max_seconds:.3f}s)')
+    if failures:
+        sys.exit('Import-time guard failed: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+""" Benchmark the dispatch pipeline on a synthetic portfolio.
+
+    python -m benchmarks.run --years 4 --generators 8 --storages 2 \
+        --output results.json [--compare baseline.json]
+
+Each stage is timed over --repeat calls (dispatch_batch stages dispatch
+--iterations rows per call), then run once more under tracemalloc for its
+peak traced memory. Package import time is measured in fresh interpreters
+(see benchmarks.import_time). Results are written as JSON so builds can be
+compared.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tracemalloc
+import warnings
+from dataclasses import asdict
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import import_time
+from benchmarks.synthetic import SyntheticConfig, build_manager
+from portfolio.portfolio.results_logging.results_logging import MonteCarloLog, DispatchLog, BatchDispatchLog
+from portfolio.scenario.scenarios import ScenarioManager
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stages(manager: ScenarioManager, iterations: int) -> Dict[str, Callable[[], int]]:
+    """ Stage name -> callable returning the number of iterations it ran
+    """
+    manager.refresh_all()
+    demand = pd.Series(manager.demand.data)
+    generator = manager.portfolio.generators.asset_rank[0]
+    storages = manager.portfolio.storages.asset_rank
+    totals = pd.Series({'annual_dispatch_cost': 1.0e8, 'levelized_cost': 30.0})
+    monte_carlo_log = MonteCarloLog(manager.portfolio.asset_capacities())
+    capacities = {
+        asset.name: asset.nameplate_capacity
+        for asset in manager.portfolio.all_assets_list
+    }
+
+    def generator_dispatch():
+        generator.dispatch(demand)
+        return 1
+
+    def storage_dispatch():
+        storages[0].dispatch(demand)
+        return 1
+
+    generators = manager.portfolio.generators
+    demand_matrix = np.tile(demand.to_numpy(dtype=float), (iterations, 1))
+
+    def generators_dispatch():
+        generators.dispatch(DispatchLog(demand.to_numpy(dtype=float)))
+        return 1
+
+    def generators_dispatch_batch():
+        generators.dispatch_batch(BatchDispatchLog(demand_matrix))
+        return iterations
+
+    def asset_groups_dispatch():
+        manager.portfolio.dispatch(manager.demand.data)
+        manager.clear_dispatch_log()
+        return 1
+
+    def refresh_all():
+        manager.refresh_all()
+        return 1
+
+    def log_simulation():
+        monte_carlo_log.log_simulation(totals)
+        return 1
+
+    def capacity_scenario():
+        run = manager.spawn()
+        run.monte_carlo_capacity_scenario(
+            'benchmark',
+            capacities,
+            manager.portfolio.nominal_capacity_cap,
+            iterations=iterations
+        )
+        return iterations
+
+    stages = {'Generator.dispatch': generator_dispatch}
+    if storages:
+        stages['Storage.dispatch'] = storage_dispatch
+    stages.update({
+        'RankedAssetGroup.dispatch': generators_dispatch,
+        'RankedAssetGroup.dispatch_batch': generators_dispatch_batch,
+        'AssetGroups.dispatch': asset_groups_dispatch,
+        'refresh_all': refresh_all,
+        'MonteCarloLog.log_simulation': log_simulation,
+        'monte_carlo_capacity_scenario': capacity_scenario,
+    })
+    return stages
+
+
+def time_stage(stage: Callable[[], int], repeat: int) -> dict:
+    stage()  # warm up
+    count = 0
+    start = perf_counter()
+    for _ in range(repeat):
+        count += stage()
+    seconds = perf_counter() - start
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'iterations': count,
+        'seconds': seconds,
+        'iterations_per_second': count / seconds if seconds else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run(config: SyntheticConfig, repeat: int = 10, iterations: int = 10) -> dict:
+    manager = build_manager(config)
+    results = {}
+    for name, stage in _stages(manager, iterations).items():
+        # The full scenario already runs `iterations` iterations per call
+        stage_repeat = 1 if name == 'monte_carlo_capacity_scenario' else repeat
+        results[name] = time_stage(stage, stage_repeat)
+    return {
+        'metadata': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+        },
+        'config': {**asdict(config), 'repeat': repeat, 'iterations': iterations},
+        'import': import_time.measure(),
+        'stages': results,
+    }
+
+
+def compare(baseline: dict, results: dict) -> pd.DataFrame:
+    """ Speed-up (>1 is faster) and memory ratio of results against baseline
+    """
+    rows = {}
+    for name, stage in results['stages'].items():
+        base = baseline['stages'].get(name)
+        if not base:
+            continue
+        rows[name] = {
+            'baseline_per_second': base['iterations_per_second'],
+            'per_second': stage['iterations_per_second'],
+            'speed_up': stage['iterations_per_second'] / base['iterations_per_second'],
+            'memory_ratio': stage['peak_memory_bytes'] / max(base['peak_memory_bytes'], 1),
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=SyntheticConfig.years)
+    parser.add_argument('--generators', type=int, default=SyntheticConfig.generators)
+    parser.add_argument('--storages', type=int, default=SyntheticConfig.storages)
+    parser.add_argument('--price-history', type=int, default=SyntheticConfig.price_history)
+    parser.add_argument('--seed', type=int, default=SyntheticConfig.seed)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help='baseline results to compare against')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    config = SyntheticConfig(
+        years=args.years,
+        generators=args.generators,
+        storages=args.storages,
+        price_history=args.price_history,
+        seed=args.seed,
+    )
+    results = run(config, args.repeat, args.iterations)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(pd.DataFrame.from_dict(results['stages'], orient='index').to_string())
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), results).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+from portfolio.portfolio.asset_groups import AssetGroups, RankedAssetGroup, RankOnOptimiser, CapacityCapper
+from portfolio.portfolio.constraints import CapacityConstraints
+from portfolio.resources.annual_curves import StochasticChoiceAnnualCurve, StochasticComplementaryChoiceAnnualCurve
+from portfolio.resources.commodities import Fuel, Emissions, PriceCorrelation, Markets, StaticPrice
+from portfolio.resources.emissions import EmissionsCharacteristics
+from portfolio.resources.generators import GeneratorTechnology, Generator
+from portfolio.resources.passive_generators import (
+    PassiveTechnology,
+    PassiveGenerator,
+    CorrelatedPassiveResource,
+    PassiveResources,
+)
+from portfolio.resources.storage import StorageTechnology, Storage, PeakShaveStorageOptimiser
+from portfolio.scenario.scenarios import ScenarioManager
+from portfolio.utils.time_series_utils import SimpleScheduler, SimpleForecaster
+
+hours_per_year = 8760
+fuel_names = ['coal', 'gas', 'diesel']
+
+
+@dataclass
+class SyntheticConfig:
+    """ Scale of a synthetic portfolio:
+     - years of demand, solar and wind traces to sample from
+     - numbers of generators and storages
+     - length of the correlated fuel price history
+    """
+    years: int = 4
+    generators: int = 4
+    storages: int = 1
+    price_history: int = 100
+    peak_demand: float = 1300.0
+    seed: int = 0
+
+
+def demand_traces(years: int, peak: float, rng: np.random.Generator) -> List[list]:
+    """ Daily and seasonal cycles with noise, peaking at roughly peak
+    """
+    hours = np.arange(hours_per_year)
+    daily = np.sin((hours % 24 - 8) * 2 * np.pi / 24)
+    seasonal = np.cos(hours * 2 * np.pi / hours_per_year)
+    base = 0.75 * peak + 0.15 * peak * daily + 0.08 * peak * seasonal
+    return list([
+        np.clip(base + rng.normal(0, 0.02 * peak, hours_per_year), 0, None).tolist()
+        for _ in range(years)
+    ])
+
+
+def solar_traces(years: int, rng: np.random.Generator) -> List[list]:
+    """ Capacity factors following the sun with day-to-day cloud cover
+    """
+    hours = np.arange(hours_per_year)
+    sun = np.clip(np.sin((hours % 24 - 6) * np.pi / 12), 0, 1)
+    traces = []
+    for _ in range(years):
+        cloud = np.repeat(rng.uniform(0.4, 1.0, hours_per_year // 24), 24)
+        traces.append((sun * cloud).tolist())
+    return traces
+
+
+def wind_traces(years: int, rng: np.random.Generator, persistence: float = 0.95) -> List[list]:
+    """ AR(1) capacity factors, so windy and still spells last several hours
+    """
+    traces = []
+    for _ in range(years):
+        noise = rng.normal(0, 1, hours_per_year)
+        state = np.empty(hours_per_year)
+        state[0] = noise[0]
+        for hour in range(1, hours_per_year):
+            state[hour] = persistence * state[hour - 1] + np.sqrt(1 - persistence ** 2) * noise[hour]
+        traces.append((1 / (1 + np.exp(-1.5 * state))).tolist())
+    return traces
+
+
+def price_history(
+        fuels: List[str],
+        number_samples: int,
+        rng: np.random.Generator,
+        correlation: float = 0.6
+) -> pd.DataFrame:
+    """ Correlated lognormal fuel prices
+    """
+    n = len(fuels)
+    covariance = 0.04 * (np.full((n, n), correlation) + (1 - correlation) * np.eye(n))
+    log_means = np.log(np.linspace(2.0, 20.0, n))
+    samples = rng.multivariate_normal(log_means, covariance, number_samples)
+    return pd.DataFrame(np.exp(samples), columns=fuels)
+
+
+def build_manager(config: SyntheticConfig = SyntheticConfig()) -> ScenarioManager:
+    rng = np.random.default_rng(config.seed)
+    demand = StochasticChoiceAnnualCurve.from_array(
+        'demand', 'MW', 2019,
+        demand_traces(config.years, config.peak_demand, rng)
+    )
+    shared = StochasticComplementaryChoiceAnnualCurve.from_array_dict(
+        'renewables', 'capacity_factor', 2019,
+        {'solar': solar_traces(config.years, rng), 'wind': wind_traces(config.years, rng)}
+    )
+    solar_resource = CorrelatedPassiveResource(resource=shared, name='solar')
+    wind_resource = CorrelatedPassiveResource(resource=shared, name='wind')
+
+    fuels = fuel_names[:max(1, min(config.generators, len(fuel_names)))]
+    fuel_dict: Dict[str, Fuel] = {name: Fuel(name, 5.0, '$/GJ') for name in fuels}
+    carbon = Emissions('carbon', 20.0, '$/t')
+    markets = Markets([
+        PriceCorrelation.from_data(
+            price_history(fuels, config.price_history, rng),
+            fuel_dict,
+            'lognormal'
+        ),
+        StaticPrice({'carbon': carbon}),
+    ])
+
+    generator_capacity = config.peak_demand / max(config.generators, 1)
+    generators = []
+    for i in range(config.generators):
+        fuel = fuel_dict[fuels[i % len(fuels)]]
+        technology = GeneratorTechnology(
+            f'gen_tech_{i}', 'generator', 1000 + 200 * i, 30, 10.0, 2.0 + i, 0.05,
+            0.3 + 0.25 * rng.uniform(), 0.9, 0.0,
+            EmissionsCharacteristics(0.8, 't/MWh', carbon), fuel
+        )
+        generators.append(Generator(f'gen_{i}', generator_capacity, 1.0, technology, None, 1.0))
+
+    storages = []
+    for i in range(config.storages):
+        technology = StorageTechnology(f'storage_tech_{i}', 'storage', 500, 15, 5.0, 0.0, 0.05, 0.85, 100.0)
+        storages.append(Storage(
+            f'storage_{i}', 0.1 * config.peak_demand, 1.0, technology, None, 1.0, 2.0 + 2 * i,
+            PeakShaveStorageOptimiser(SimpleScheduler(), SimpleForecaster(24))
+        ))
+
+    passive_generators = [
+        PassiveGenerator(
+            'solar_farm', 0.4 * config.peak_demand, 1.0,
+            PassiveTechnology('solar', 'passive', 1200, 25, 15.0, 0.0, 0.05), None, 1.0, solar_resource
+        ),
+        PassiveGenerator(
+            'wind_farm', 0.3 * config.peak_demand, 1.0,
+            PassiveTechnology('wind', 'passive', 1800, 25, 30.0, 0.0, 0.05), None, 1.0, wind_resource
+        ),
+    ]
+    portfolio = AssetGroups(
+        RankedAssetGroup(generators, 'total_var_cost'),
+        RankedAssetGroup(storages, 'total_var_cost'),
+        RankedAssetGroup(passive_generators, 'total_var_cost'),
+        3 * config.peak_demand,
+        RankOnOptimiser('rank'),
+        CapacityCapper(list(generators)),
+    )
+    return ScenarioManager(
+        2019, demand, markets, PassiveResources([solar_resource, wind_resource]), portfolio,
+        RankOnOptimiser('rank'), CapacityConstraints([]),
+    )
@@ -2,14 +2,28 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Sequence, Union
 
+import numpy as np
 import pandas as pd
 
+from portfolio.portfolio.dispatch_memo import PhysicalDispatch
+from portfolio.portfolio.portfolio_arrays import PortfolioArrays
 from portfolio.portfolio.results_logging.plotting import StackPlotConfig
-from portfolio.portfolio.results_logging.results_logging import DispatchLog
+from portfolio.portfolio.results_logging.results_logging import DispatchLog, BatchDispatchLog
 from portfolio.resources.generators import GeneratorTechnology
 from portfolio.resources.technologies import Asset
+from portfolio.utils.profiling import span
+
+
+class Validator:
+    @staticmethod
+    def supports_batch(unbatchable_assets: List[str]):
+        if unbatchable_assets:
+            raise ValueError(
+                f'Batched dispatch is not supported by the following assets: '
+                f'{", ".join(unbatchable_assets)}'
+            )
 
 
 def idx(columns, name):
@@ -37,6 +51,8 @@ class CapacityCapper:
          capacity is displaced first
     """
     cappable_assets: List[Asset]
+    # Set by AssetGroups to invalidate its PortfolioArrays view
+    on_capacity_change = None
 
     def cap(self, exceedance: float):
         if exceedance > 0:
@@ -49,6 +65,8 @@ class CapacityCapper:
                 exceedance -= capacity_displacement
                 if exceedance <= 0:
                     break
+            if self.on_capacity_change:
+                self.on_capacity_change()
 
 
 @dataclass
@@ -178,6 +196,12 @@ class RankedAssetGroup:
     """
     asset_rank: List[Asset]
     rank_on: str = None
+    # Set by AssetGroups to invalidate its PortfolioArrays view
+    on_capacity_change = None
+
+    def _capacities_changed(self):
+        if self.on_capacity_change:
+            self.on_capacity_change()
 
     @property
     def asset_dict(self) -> Dict[str, Asset]:
@@ -197,6 +221,11 @@ class RankedAssetGroup:
     def scale_asset_capacities(self, factor: float):
         for asset in self.asset_rank:
             asset.scale_capacity(factor)
+        self._capacities_changed()
+
+    @property
+    def unbatchable_assets(self) -> List[str]:
+        return list([a.name for a in self.asset_rank if not a.supports_batch])
 
     def rank_assets(self, optimiser: AssetGroupOptimiser):
         optimiser.optimise(self)
@@ -210,9 +239,10 @@ class RankedAssetGroup:
         annual_costs = None
         levelized_cost = None
         for asset in self.asset_rank:
-            dispatch = asset.dispatch(
-                dispatch_logger.dispatch_log['residual_demand']
-            )
+            with span(f'{type(asset).__name__}.dispatch'):
+                dispatch = asset.dispatch(
+                    dispatch_logger.dispatch_log['residual_demand']
+                )
             if log_annual_costs:
                 annual_costs = asset.annual_dispatch_cost(dispatch.as_net)
             if log_levelized_cost:
@@ -224,6 +254,37 @@ class RankedAssetGroup:
                 levelized_cost=levelized_cost
             )
 
+    def dispatch_batch(
+            self,
+            dispatch_logger: BatchDispatchLog,
+            log_annual_costs: bool = True,
+            log_levelized_cost: bool = True,
+            asset_inputs: Dict[str, Dict[str, np.ndarray]] = None,
+    ):
+        """ dispatch for many iterations at once. asset_inputs maps asset
+        names to keyword arguments of their dispatch_batch, e.g. each
+        iteration's resource data for a passive generator
+        """
+        Validator.supports_batch(self.unbatchable_assets)
+        asset_inputs = asset_inputs or {}
+        for asset in self.asset_rank:
+            with span(f'{type(asset).__name__}.dispatch_batch'):
+                dispatch = asset.dispatch_batch(
+                    dispatch_logger.residual_demand,
+                    **asset_inputs.get(asset.name, {})
+                )
+            net = dispatch.as_net
+            annual_costs = asset.annual_dispatch_costs(net) \
+                if log_annual_costs else None
+            levelized_costs = asset.levelized_costs(net, annual_costs) \
+                if log_levelized_cost else None
+
+            dispatch_logger.log(
+                dispatch=dispatch,
+                annual_costs=annual_costs,
+                levelized_costs=levelized_costs
+            )
+
     def assets_to_dataframe(
             self,
     ) -> pd.DataFrame:
@@ -232,12 +293,25 @@ class RankedAssetGroup:
         return assets
 
     def update_capacities(self, capacities: dict):
+        asset_dict = self.asset_dict
         for gen, new_capacity in capacities.items():
-            self.asset_dict[gen].nameplate_capacity = new_capacity
+            asset_dict[gen].nameplate_capacity = new_capacity
+        self._capacities_changed()
 
 
 @dataclass
 class AssetGroups:
+    """ Ranked generator, storage and passive generator groups.
+     - capacity queries and updates (total capacity, scaling, capping) run
+     on a cached PortfolioArrays view, which writes capacities back to the
+     assets
+     - capacity changes made through the groups or the capacity capper
+     discard the view, which is rebuilt on next use. So are changes made on
+     the assets themselves (e.g. Asset.scale_capacity or setting
+     nameplate_capacity), which the view checks for on every use
+     - call refresh_arrays after adding or removing assets, or replacing a
+     group or the capacity capper
+    """
     generators: RankedAssetGroup
     storages: RankedAssetGroup
     passive_generators: RankedAssetGroup
@@ -247,6 +321,34 @@ class AssetGroups:
     specified_deployment_order: Tuple[str] = ('passive_generators', 'storages', 'generators')
     dispatch_logger: DispatchLog = None
 
+    def __post_init__(self):
+        self._arrays = None
+
+    @property
+    def arrays(self) -> PortfolioArrays:
+        if self._arrays is None or not self._arrays.matches_assets():
+            self.refresh_arrays()
+        return self._arrays
+
+    def refresh_arrays(self):
+        for source in self.ordered_deployment + [self.capacity_capper]:
+            source.on_capacity_change = self.invalidate_arrays
+        self._arrays = PortfolioArrays.from_groups(
+            self.ranked_asset_lists,
+            self.capacity_capper.cappable_assets
+        )
+
+    def invalidate_arrays(self):
+        self._arrays = None
+
+    @property
+    def ranked_asset_lists(self) -> Dict[str, List[Asset]]:
+        return {
+            'generators': self.generators.asset_rank,
+            'storages': self.storages.asset_rank,
+            'passive_generators': self.passive_generators.asset_rank,
+        }
+
     @property
     def all_assets_name_list(self):
         return \
@@ -263,11 +365,7 @@ class AssetGroups:
 
     @property
     def all_assets_dict(self) -> Dict[str, Asset]:
-        return {
-            **self.generators.asset_dict,
-            **self.storages.asset_dict,
-            **self.passive_generators.asset_dict,
-        }
+        return self.arrays.asset_dict
 
     @property
     def ordered_deployment(self) -> List[RankedAssetGroup]:
@@ -278,44 +376,55 @@ class AssetGroups:
 
     @property
     def total_capacity(self):
-        return sum([
-            self.generators.total_capacity,
-            self.storages.total_capacity,
-            self.passive_generators.total_capacity,
-        ])
+        return self.arrays.total_capacity
 
     @property
     def capacity_exceedance(self):
-        return max(
-            0.0,
-            self.total_capacity - self.nominal_capacity_cap
-        )
+        return self.arrays.capacity_exceedance(self.nominal_capacity_cap)
 
     def scale_asset_capacities(self, factor: float):
-        self.generators.scale_asset_capacities(factor)
-        self.storages.scale_asset_capacities(factor)
-        self.passive_generators.scale_asset_capacities(factor)
+        self.arrays.scale(factor)
 
     def cap_capacities(
         self,
     ):
-        self.capacity_capper.cap(self.capacity_exceedance)
+        self.arrays.cap(self.nominal_capacity_cap)
 
     def update_capacities(
             self,
             assets: Dict[str, float],
             cap_capacities: bool
     ):
-        for name, capacity in assets.items():
-            self.all_assets_dict[name].nameplate_capacity = capacity
+        self.arrays.update(assets)
         if cap_capacities:
-            self.capacity_capper.cap(self.capacity_exceedance)
+            self.arrays.cap(self.nominal_capacity_cap)
+
+    def capped_capacities(
+            self,
+            capacities: pd.DataFrame,
+            capacity_caps: Union[float, Sequence[float]]
+    ) -> pd.DataFrame:
+        """ Cap many capacity scenarios at once, without changing the
+        portfolio.
+         - capacities has one row per scenario and nameplate capacities in
+         columns named by asset; assets without a column keep their current
+         capacity
+         - capacity_caps is one nominal capacity cap per row, or one for all
+         - returns the nameplate capacities of all assets after capping, as
+         update_capacities with cap_capacities would leave them
+        """
+        arrays = self.arrays
+        matrix = np.tile(arrays.nameplate, (len(capacities), 1))
+        matrix[:, arrays.positions(list(capacities.columns))] = \
+            capacities.to_numpy(dtype=float)
+        return pd.DataFrame(
+            arrays.cap_batch(matrix, capacity_caps),
+            index=capacities.index,
+            columns=arrays.names
+        )
 
     def asset_capacities(self) -> Dict[str, float]:
-        return {
-            asset.name: asset.firm_capacity
-            for asset in self.all_assets_list
-        }
+        return self.arrays.firm_capacities()
 
     def assets_to_dataframe(self):
         return pd.concat(
@@ -325,8 +434,89 @@ class AssetGroups:
         )
 
     def optimise_groups(self):
-        for asset_group in self.ordered_deployment:
-            asset_group.rank_assets(self.optimiser)
+        with span('AssetGroups.optimise_groups'):
+            for asset_group in self.ordered_deployment:
+                asset_group.rank_assets(self.optimiser)
+            if self._arrays is not None:
+                self._arrays.update_ranks(self.ranked_asset_lists)
+
+    def rank_order(self) -> Tuple[Tuple[str, ...], ...]:
+        """ Dispatch order of asset names, by group in deployment order
+        """
+        return tuple([
+            tuple(group.asset_name_list)
+            for group in self.ordered_deployment
+        ])
+
+    def dispatch_states(self) -> Tuple[Tuple[str, tuple], ...]:
+        """ Dispatch state of each stateful asset (see Asset.dispatch_state)
+        """
+        states = []
+        for asset in self.all_assets_list:
+            state = asset.dispatch_state()
+            if state is not None:
+                states.append((asset.name, state))
+        return tuple(states)
+
+    def restore_dispatch_states(self, states: Tuple[Tuple[str, tuple], ...]):
+        assets = self.all_assets_dict
+        for name, state in states:
+            assets[name].restore_dispatch_state(state)
+
+    def physical_dispatch(self, hourly: bool = True) -> PhysicalDispatch:
+        """ Price-independent outcome of the latest dispatch, with the hourly
+        dispatch log and excess if hourly
+        """
+        dispatch_log = self.dispatch_logger.dispatch_log
+        dispatch_order = list(self.dispatch_logger.dispatch_order)
+        return PhysicalDispatch(
+            dispatch_order,
+            {name: dispatch_log[name].to_numpy().sum() for name in dispatch_order},
+            self.dispatch_states(),
+            dispatch_log if hourly else None,
+            dict(self.dispatch_logger.excess_log) if hourly else None,
+        )
+
+    def replay_dispatch(
+            self,
+            demand,
+            physical: PhysicalDispatch,
+            log_annual_costs: bool = True,
+            log_levelized_cost: bool = True,
+            plot_config: StackPlotConfig = None
+    ):
+        """ Log a memoised or stored physical dispatch of demand in place of
+        dispatching, pricing it at current prices and leaving assets in the
+        dispatch states it ended in. Without hourly data the log holds demand
+        and costs only
+        """
+        with span('AssetGroups.replay_dispatch'):
+            if not self.dispatch_logger:
+                self.dispatch_logger = DispatchLog(demand)
+            else:
+                self.dispatch_logger.clear_log(demand)
+            if physical.hourly:
+                self.dispatch_logger.dispatch_log = physical.dispatch_log.copy()
+                self.dispatch_logger.excess_log = dict(physical.excess_log)
+            else:
+                self.dispatch_logger.dispatch_log = \
+                    self.dispatch_logger.dispatch_log[['demand']]
+            self.dispatch_logger.dispatch_order = list(physical.dispatch_order)
+            assets = self.all_assets_dict
+            costs = {}
+            for name in physical.dispatch_order:
+                asset = assets[name]
+                # Costs depend on the dispatch vector only through its sum
+                net = np.array([physical.energy_totals[name]])
+                costs[name] = (
+                    asset.annual_dispatch_cost(net) if log_annual_costs else None,
+                    asset.levelized_cost(net) if log_levelized_cost else None,
+                )
+            self.dispatch_logger.set_costs(costs)
+            self.restore_dispatch_states(physical.dispatch_states)
+        if plot_config:
+            if plot_config.plot:
+                self.dispatch_logger.plot(plot_config)
 
     def dispatch(
             self,
@@ -338,14 +528,48 @@ class AssetGroups:
     ):
         if not self.dispatch_logger:
             self.dispatch_logger = DispatchLog(demand)
-        for asset_group in self.ordered_deployment:
-            asset_group.dispatch(
-                self.dispatch_logger,
-                log_annual_costs,
-                log_levelized_cost,
-            )
+        elif self.dispatch_logger.demand is not demand:
+            # Demand was refreshed since the log was created or cleared
+            self.dispatch_logger.clear_log(demand)
+        for tech in self.specified_deployment_order:
+            with span(f'RankedAssetGroup.dispatch[{tech}]'):
+                getattr(self, tech).dispatch(
+                    self.dispatch_logger,
+                    log_annual_costs,
+                    log_levelized_cost,
+                )
         if plot_config:
             if plot_config.plot:
                 self.dispatch_logger.plot(plot_config)
 
-
+    def dispatch_batch(
+            self,
+            demand: np.ndarray,
+            asset_inputs: Dict[str, Dict[str, np.ndarray]] = None,
+            log_annual_costs: bool = True,
+            log_levelized_cost: bool = True,
+    ) -> BatchDispatchLog:
+        """ Dispatch an (iterations x hours) demand matrix through all groups
+        in one vectorised pass, returning a new BatchDispatchLog.
+         - asset_inputs holds each iteration's inputs by asset name (see
+         RankedAssetGroup.dispatch_batch); other inputs keep their current
+         samples
+         - costs are at current prices
+         - every asset must support batched dispatch (Asset.supports_batch);
+         storage is stateful across hours and does not, so portfolios with
+         storage are rejected before anything is dispatched
+        """
+        Validator.supports_batch(sum([
+            getattr(self, tech).unbatchable_assets
+            for tech in self.specified_deployment_order
+        ], []))
+        dispatch_logger = BatchDispatchLog(demand)
+        for tech in self.specified_deployment_order:
+            with span(f'RankedAssetGroup.dispatch_batch[{tech}]'):
+                getattr(self, tech).dispatch_batch(
+                    dispatch_logger,
+                    log_annual_costs,
+                    log_levelized_cost,
+                    asset_inputs,
+                )
+        return dispatch_logger
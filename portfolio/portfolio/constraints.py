@@ -1,10 +1,10 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 import numpy as np
 from abc import abstractmethod
 
 from portfolio.resources.annual_curves import StochasticAnnualCurve, StochasticWindowAnnualCurve
-from portfolio.statistics.stochastics import StochasticResource
+from portfolio.statistics.stochastics import StochasticResource, refresh_graph, combined_draw_key
 
 
 @dataclass
@@ -16,6 +16,14 @@ class CapacityConstraint(StochasticResource):
     def constraint(self):
         return self.constraint_model.data
 
+    @property
+    def shared_sources(self) -> List[StochasticAnnualCurve]:
+        return [self.constraint_model]
+
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return self.constraint_model.draw_key
+
     @classmethod
     @abstractmethod
     def from_array(
@@ -47,7 +55,7 @@ class StochasticWindowCapacityConstraint(CapacityConstraint):
     as_factor: bool
 
     def refresh(self):
-        return self.constraint_model.data
+        self.constraint_model.refresh()
 
     @classmethod
     def from_array(
@@ -71,8 +79,18 @@ class StochasticWindowCapacityConstraint(CapacityConstraint):
 
 @dataclass
 class CapacityConstraints(StochasticResource):
+    """ Constraints refreshed as a graph: a constraint model shared by
+    several constraints is sampled once per refresh
+    """
     constraints: List[CapacityConstraint]
 
     def refresh(self):
-        for constraint in self.constraints:
-            constraint.refresh()
+        refresh_graph(self.constraints)
+
+    @property
+    def components(self) -> List[StochasticResource]:
+        return self.constraints
+
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return combined_draw_key(self.constraints)
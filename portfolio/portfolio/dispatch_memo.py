@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from portfolio.utils.data_utils import MemoryCache
+
+
+@dataclass
+class PhysicalDispatch:
+    """ Price-independent outcome of one dispatch of the portfolio: dispatch
+    order, each asset's net energy total, the dispatch state (e.g. storage
+    state of charge) each asset ends in and, optionally, the hourly dispatch
+    log (demand, residual demand and net dispatch of each asset) and excess.
+    Costs depend on dispatch only through the energy totals, so they are
+    re-priced from them at current prices
+    """
+    dispatch_order: List[str]
+    energy_totals: Dict[str, float]
+    dispatch_states: Tuple[Tuple[str, tuple], ...]
+    dispatch_log: pd.DataFrame = None
+    excess_log: Dict[str, np.ndarray] = None
+
+    @property
+    def hourly(self) -> bool:
+        return self.dispatch_log is not None
+
+    @property
+    def nbytes(self) -> int:
+        if not self.hourly:
+            return 8 * len(self.energy_totals)
+        return int(self.dispatch_log.memory_usage(deep=True).sum()) + sum([
+            np.asarray(excess).nbytes for excess in self.excess_log.values()
+        ])
+
+
+class _PhysicalDispatchCache(MemoryCache):
+    @staticmethod
+    def size_of(value: PhysicalDispatch) -> int:
+        return value.nbytes
+
+
+@dataclass
+class DispatchMemo:
+    """ Memo of physical dispatch within a Monte Carlo run
+    (ScenarioManager.dispatch_memo).
+     - draws are recognised by the draw keys of demand, passive resources
+     and constraints (e.g. the indices of the historical years sampled), so
+     a run sampling from 10 demand and 10 resource years needs at most 100
+     physical dispatches while each scenario's capacities and dispatch order
+     are unchanged
+     - the key also holds the dispatch order of each group (prices can
+     re-rank assets), the state storage starts in and the capacities, so
+     storage hits only recur when storage starts from the same state
+     - on a hit, costs are re-priced at current prices and storage is left
+     in the state the memoised dispatch ended in
+     - iterations whose draws cannot be identified are dispatched as usual
+     - least recently used entries are dropped beyond max_entries or
+     max_bytes; entries are cleared with each new scenario (but kept
+     across the batches of a CapacityScenarioRace) and are not copied with
+     the manager
+    """
+    max_entries: int = 1024
+    max_bytes: int = None
+
+    def __post_init__(self):
+        self._cache = _PhysicalDispatchCache(
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            copy_values=False
+        )
+
+    def __deepcopy__(self, memo):
+        return DispatchMemo(self.max_entries, self.max_bytes)
+
+    @property
+    def stats(self) -> dict:
+        return self._cache.stats
+
+    @staticmethod
+    def key(draw_key: Optional[tuple], portfolio) -> Optional[tuple]:
+        """ Memo key for dispatching portfolio on draws identified by
+        draw_key, or None if the draws cannot be identified
+        """
+        if draw_key is None:
+            return None
+        return (
+            draw_key,
+            portfolio.rank_order(),
+            portfolio.dispatch_states(),
+            portfolio.arrays.nameplate.tobytes(),
+        )
+
+    def get(self, key: tuple) -> Optional[PhysicalDispatch]:
+        _, physical = self._cache.get(key)
+        return physical
+
+    def put(self, key: tuple, physical: PhysicalDispatch):
+        self._cache.put(key, physical)
+
+    def clear(self):
+        self._cache.clear()
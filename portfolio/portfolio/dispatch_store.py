@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from portfolio.portfolio.dispatch_memo import PhysicalDispatch
+from portfolio.utils.data_utils import CacheManager
+from portfolio.utils.digests import array_digest
+from portfolio.utils.time_series_utils import freeze
+
+# Bump whenever the stored layout or the meaning of a key changes
+store_format = 2
+
+
+def _encode_state(value):
+    # Dispatch states hold numbers, strings and the scheduler's datetimes,
+    # timedeltas and frozen attributes, in nested tuples
+    if isinstance(value, frozenset):
+        return {'frozenset': list(value)}
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'timedelta': value.total_seconds()}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(
+        f'Dispatch state values of type {type(value).__name__} cannot be stored'
+    )
+
+
+def _decode_state(value):
+    if 'frozenset' in value:
+        return frozenset(freeze(value['frozenset']))
+    if 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    return timedelta(seconds=value['timedelta'])
+
+
+def _dumps_states(states: tuple) -> str:
+    return json.dumps(states, default=_encode_state)
+
+
+def _loads_states(text: str) -> tuple:
+    # JSON arrays back to the frozen states they were built from; restoring
+    # thaws them (Scheduler.restore)
+    return freeze(json.loads(text, object_hook=_decode_state))
+
+
+def _write_entry(physical: PhysicalDispatch, fp: str):
+    arrays = {
+        'format': np.array(store_format),
+        'names': np.array(physical.dispatch_order, dtype=str),
+        'energy': np.array([physical.energy_totals[name] for name in physical.dispatch_order]),
+        'states': np.array(_dumps_states(physical.dispatch_states)),
+    }
+    if physical.hourly:
+        arrays['residual_demand'] = physical.dispatch_log['residual_demand'].to_numpy()
+        arrays['dispatch'] = np.array(
+            [physical.dispatch_log[name].to_numpy() for name in physical.dispatch_order],
+            ndmin=2
+        )
+        arrays['excess'] = np.array(
+            [physical.excess_log[name] for name in physical.dispatch_order],
+            ndmin=2
+        )
+    with open(fp, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+
+def _read_entry(fp: str, demand: pd.Series) -> Optional[PhysicalDispatch]:
+    with np.load(fp) as entry:
+        if int(entry['format']) != store_format:
+            return None
+        names = entry['names'].tolist()
+        physical = PhysicalDispatch(
+            names,
+            dict(zip(names, entry['energy'].tolist())),
+            _loads_states(entry['states'].item()),
+        )
+        if 'dispatch' in entry:
+            dispatch_log = pd.DataFrame({
+                'demand': demand,
+                'residual_demand': entry['residual_demand'],
+            })
+            for name, dispatch in zip(names, entry['dispatch']):
+                dispatch_log[name] = dispatch
+            physical.dispatch_log = dispatch_log
+            physical.excess_log = dict(zip(names, entry['excess']))
+    return physical
+
+
+@dataclass
+class DispatchStore:
+    """ Persistent, content-addressed store of physical dispatch results
+    (ScenarioManager.dispatch_store), shared across runs, scenarios and
+    processes.
+     - entries are keyed by a hash of everything that determines physical
+     dispatch: the drawn demand, each asset's dispatch parameters
+     (capacities, constraint and resource data, storage parameters), the
+     dispatch order, the state storage starts in and the draw indices.
+     Prices and fixed costs are not part of the key, so studies re-run with
+     changed prices or costs reuse the stored dispatch and are re-priced
+     - entries hold per-asset energy totals and, with hourly, the hourly
+     net dispatch, residual demand and excess, as compressed .npz files
+     - the directory is indexed by a CacheManager (SQLite), which evicts
+     least recently used entries beyond max_bytes and ignores entries older
+     than expiration (seconds)
+     - entries hold only arrays, with dispatch states as JSON, and are
+     loaded without unpickling
+     - spawned managers share the store (and its hits and misses) within a
+     process, which is safe across threads: the index opens a connection per
+     call and the counters are locked. Managers pickled to other processes
+     get their own handle on the same directory and counters
+    """
+    directory: str
+    max_bytes: int = None
+    expiration: int = 90 * 24 * 3600
+    hourly: bool = True
+
+    def __post_init__(self):
+        self.cache_manager = CacheManager(
+            self.directory,
+            self.expiration,
+            max_bytes=self.max_bytes
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Spawned runs share the store
+        return self
+
+    @staticmethod
+    def key(demand, draw_key: Optional[tuple], portfolio) -> str:
+        digest = hashlib.sha256()
+        digest.update(repr((
+            store_format,
+            draw_key,
+            portfolio.rank_order(),
+            portfolio.dispatch_states(),
+            list([asset.dispatch_parameters() for asset in portfolio.all_assets_list]),
+        )).encode('UTF-8'))
+        digest.update(array_digest(demand).encode('UTF-8'))
+        return digest.hexdigest()
+
+    def get(
+            self,
+            key: str,
+            demand: pd.Series,
+            hourly: bool = False
+    ) -> Optional[PhysicalDispatch]:
+        """ Stored dispatch for key, with its hourly log indexed like demand,
+        or None if there is none (or, if hourly, it has no hourly data)
+        """
+        fp = self.cache_manager.lookup(key)
+        try:
+            physical = _read_entry(fp, demand) if fp else None
+        except FileNotFoundError:
+            # Evicted by another process since the lookup
+            physical = None
+        if physical is None or (hourly and not physical.hourly):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return physical
+
+    def put(self, key: str, physical: PhysicalDispatch):
+        self.cache_manager.store(key, physical, _write_entry, suffix='.npz')
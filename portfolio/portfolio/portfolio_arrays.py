@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from portfolio.resources.technologies import Asset
+
+
+def capacity_displacements(
+        removable: np.ndarray,
+        exceedance: Union[float, np.ndarray]
+) -> np.ndarray:
+    """ Capacity removed from each asset, in priority order along the last
+    axis, to displace exceedance. Each asset gives up at most its removable
+    capacity, and only once all higher priority assets have given up theirs.
+    For a (scenarios x assets) removable matrix, exceedance is a vector with
+    one value per scenario
+    """
+    removed_before = np.cumsum(removable, axis=-1) - removable
+    return np.clip(
+        np.expand_dims(exceedance, -1) - removed_before,
+        0.0,
+        removable
+    )
+
+
+@dataclass
+class PortfolioArrays:
+    """ Struct-of-arrays view of a portfolio's assets, in all_assets_list
+    order at construction.
+     - index maps asset names to array positions
+     - nameplate, firm_capacity_factor and cappable hold each asset's
+     nameplate capacity, firm capacity factor and cappable fraction
+     - group holds the position of each asset's group in group_names, and
+     rank its dispatch rank within that group
+     - cap_order holds the positions of the cappable assets in capping
+     priority order
+    Capacity updates, scaling and capping are vector operations whose results
+    are written back to the Asset objects, which remain the source of truth
+    for dispatch. Rebuild the view after adding or removing assets, or once
+    matches_assets is False after their capacities were changed directly
+    """
+    assets: List[Asset]
+    group_names: List[str]
+    group: np.ndarray
+    rank: np.ndarray
+    nameplate: np.ndarray
+    firm_capacity_factor: np.ndarray
+    cappable: np.ndarray
+    cap_order: np.ndarray
+
+    def __post_init__(self):
+        self.names = list([asset.name for asset in self.assets])
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.asset_dict = dict(zip(self.names, self.assets))
+
+    @classmethod
+    def from_groups(
+            cls,
+            groups: Dict[str, Sequence[Asset]],
+            cappable_assets: Sequence[Asset]
+    ) -> PortfolioArrays:
+        """ Build from ranked asset lists keyed by group name
+        """
+        assets = []
+        group = []
+        rank = []
+        for position, asset_rank in enumerate(groups.values()):
+            assets += asset_rank
+            group += [position] * len(asset_rank)
+            rank += range(len(asset_rank))
+        index = {asset.name: i for i, asset in enumerate(assets)}
+        return cls(
+            assets,
+            list(groups),
+            np.array(group, dtype=np.intp),
+            np.array(rank, dtype=np.intp),
+            np.array([asset.nameplate_capacity for asset in assets], dtype=float),
+            np.array([asset.firm_capacity_factor for asset in assets], dtype=float),
+            np.array([asset.cappable_capacity for asset in assets], dtype=float),
+            np.array([index[asset.name] for asset in cappable_assets], dtype=np.intp),
+        )
+
+    def matches_assets(self) -> bool:
+        """ Whether the arrays still hold the assets' current capacities
+        """
+        return [a.nameplate_capacity for a in self.assets] == self.nameplate.tolist() \
+            and [a.cappable_capacity for a in self.assets] == self.cappable.tolist() \
+            and [a.firm_capacity_factor for a in self.assets] == self.firm_capacity_factor.tolist()
+
+    @property
+    def firm_capacity(self) -> np.ndarray:
+        return self.nameplate * self.firm_capacity_factor
+
+    @property
+    def total_capacity(self) -> float:
+        return float(self.nameplate @ self.firm_capacity_factor)
+
+    def capacity_exceedance(self, capacity_cap: float) -> float:
+        return max(0.0, self.total_capacity - capacity_cap)
+
+    def positions(self, names: Sequence[str]) -> np.ndarray:
+        return np.array([self.index[name] for name in names], dtype=np.intp)
+
+    def ranked_order(self) -> np.ndarray:
+        """ Positions sorted by group, then by rank within each group
+        """
+        return np.lexsort((self.rank, self.group))
+
+    def firm_capacities(self) -> Dict[str, float]:
+        """ Firm capacity by asset name, in group and rank order
+        """
+        order = self.ranked_order()
+        return dict(zip(
+            [self.names[i] for i in order],
+            self.firm_capacity[order].tolist()
+        ))
+
+    def _write_back(self, positions: np.ndarray, cappable: bool = False):
+        nameplate = self.nameplate[positions].tolist()
+        for i, capacity in zip(positions.tolist(), nameplate):
+            self.assets[i].nameplate_capacity = capacity
+        if cappable:
+            for i, fraction in zip(positions.tolist(), self.cappable[positions].tolist()):
+                self.assets[i].cappable_capacity = fraction
+
+    def update(self, capacities: Dict[str, float]):
+        """ Set nameplate capacities by asset name
+        """
+        positions = self.positions(list(capacities))
+        self.nameplate[positions] = list(capacities.values())
+        self._write_back(positions)
+
+    def scale(self, factor: float):
+        """ Scale nameplate capacities and cappable fractions, as
+        Asset.scale_capacity
+        """
+        self.nameplate *= factor
+        self.cappable *= factor
+        self._write_back(np.arange(len(self.assets)), cappable=True)
+
+    def cap(self, capacity_cap: float):
+        """ Displace firm capacity above capacity_cap by removing nameplate
+        capacity from cappable assets in priority order, as CapacityCapper.cap
+        """
+        exceedance = self.capacity_exceedance(capacity_cap)
+        if exceedance <= 0 or not len(self.cap_order):
+            return
+        order = self.cap_order
+        removal = capacity_displacements(
+            self.cappable[order] * self.nameplate[order],
+            exceedance
+        )
+        self.nameplate[order] -= removal
+        self._write_back(order[removal > 0])
+
+    def cap_batch(
+            self,
+            capacities: np.ndarray,
+            capacity_caps: Union[float, np.ndarray]
+    ) -> np.ndarray:
+        """ Capped copy of a (scenarios x assets) nameplate capacity matrix,
+        columns in array order, against one capacity cap per scenario (or a
+        single cap for all). Each row is capped as cap would cap the
+        portfolio, without changing the arrays or the assets
+        """
+        capacities = np.array(capacities, dtype=float, ndmin=2)
+        capacity_caps = np.broadcast_to(
+            np.asarray(capacity_caps, dtype=float),
+            capacities.shape[:1]
+        )
+        exceedance = np.maximum(
+            capacities @ self.firm_capacity_factor - capacity_caps,
+            0.0
+        )
+        order = self.cap_order
+        capacities[:, order] -= capacity_displacements(
+            self.cappable[order] * capacities[:, order],
+            exceedance
+        )
+        return capacities
+
+    def capacity_matrix(self, scenarios: Sequence[Dict[str, float]]) -> np.ndarray:
+        """ (scenarios x assets) nameplate capacities, in array order, with
+        each scenario's capacities set over the current ones
+        """
+        capacities = np.tile(self.nameplate, (len(scenarios), 1))
+        for row, scenario in zip(capacities, scenarios):
+            row[self.positions(list(scenario))] = list(scenario.values())
+        return capacities
+
+    def update_ranks(self, groups: Dict[str, Sequence[Asset]]):
+        """ Re-read dispatch ranks after the groups have been re-ranked
+        """
+        for asset_rank in groups.values():
+            self.rank[self.positions([asset.name for asset in asset_rank])] = \
+                np.arange(len(asset_rank))
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from portfolio.portfolio.results_logging.results_logging import DispatchLog
+
+system_metrics = [
+    'unserved_energy',
+    'loss_of_load_hours',
+    'peak_unserved',
+    'curtailment',
+]
+
+
+@dataclass
+class DispatchMetrics:
+    """ Reliability and cost metrics of one dispatched iteration, each a
+    vectorised reduction over the dispatch log:
+     - unserved_energy (MWh), loss_of_load_hours and peak_unserved (MW) from
+     positive residual demand. Their means over iterations are the expected
+     unserved energy, LOLE and expected peak shortfall
+     - curtailment (MWh) as total excess over all assets
+     - <asset>_capacity_factor and <asset>_cost per asset
+    Values are written into a row allocated once per scenario; the Series
+    returned by compute is a view of that row and is overwritten by the next
+    call
+    """
+    nameplate_capacities: Dict[str, float]
+    unserved_tolerance: float = 1e-6
+
+    def __post_init__(self):
+        self.asset_names = list(self.nameplate_capacities)
+        self.columns = system_metrics \
+            + list([f'{name}_capacity_factor' for name in self.asset_names]) \
+            + list([f'{name}_cost' for name in self.asset_names])
+        self.row = np.zeros(len(self.columns))
+        self._capacities = np.array(list(self.nameplate_capacities.values()), dtype=float)
+
+    def compute(self, dispatch_logger: DispatchLog) -> pd.Series:
+        log = dispatch_logger.dispatch_log
+        hours = len(log)
+        n_system = len(system_metrics)
+        n_assets = len(self.asset_names)
+        row = self.row
+
+        unserved = np.maximum(log['residual_demand'].to_numpy(dtype=float), 0.0)
+        row[0] = unserved.sum()
+        row[1] = np.count_nonzero(unserved > self.unserved_tolerance)
+        row[2] = unserved.max() if hours else 0.0
+        row[3] = sum([
+            np.sum(dispatch_logger.excess_log[name])
+            for name in self.asset_names
+        ])
+
+        generation = np.maximum(log[self.asset_names].to_numpy(dtype=float), 0.0).sum(axis=0)
+        np.divide(
+            generation,
+            self._capacities * hours,
+            out=row[n_system:n_system + n_assets],
+            where=self._capacities > 0.0
+        )
+        row[n_system:n_system + n_assets][self._capacities <= 0.0] = 0.0
+
+        costs = dispatch_logger.annual_costs.reindex(columns=self.asset_names)
+        row[n_system + n_assets:] = costs.loc['annual_dispatch_cost'].fillna(0.0).to_numpy()
+        return pd.Series(row, index=self.columns, copy=False)
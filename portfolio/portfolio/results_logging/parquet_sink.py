@@ -0,0 +1,124 @@
+import os
+import uuid
+from dataclasses import dataclass
+from typing import List
+from urllib.parse import quote
+
+import pandas as pd
+
+from portfolio.utils.lazy_imports import lazy_import
+
+pa = lazy_import('pyarrow')
+dataset = lazy_import('pyarrow.dataset')
+parquet = lazy_import('pyarrow.parquet')
+
+supported_datasets = ['scenarios', 'iterations']
+
+
+class Validator:
+    @staticmethod
+    def options(value, options, attr_name):
+        if value not in options:
+            raise ValueError(f'Invalid choice: {attr_name} must be one of the following: {", ".join(options)}')
+
+
+@dataclass
+class ParquetResultsSink:
+    """ Appends results to Parquet datasets partitioned by scenario name:
+     - directory/scenarios/scenario_name=<name>/*.parquet holds aggregated
+     scenario statistics
+     - directory/iterations/scenario_name=<name>/*.parquet holds raw
+     per-iteration results, if write_iterations is True
+    Rows are buffered and flushed once batch_rows are pending (and on flush or
+    exit). Every flush writes new files atomically, so the datasets can be
+    queried while a sweep is still running.
+    """
+    directory: str
+    batch_rows: int = 1000
+    write_iterations: bool = False
+
+    def __post_init__(self):
+        self._pending = {name: [] for name in supported_datasets}
+        self._pending_rows = {name: 0 for name in supported_datasets}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def dataset_path(self, name: str) -> str:
+        Validator.options(name, supported_datasets, 'dataset')
+        return os.path.join(self.directory, name)
+
+    def _append(self, name: str, rows: pd.DataFrame):
+        self._pending[name].append(rows)
+        self._pending_rows[name] += len(rows)
+        if self._pending_rows[name] >= self.batch_rows:
+            self._flush_dataset(name)
+
+    def write_scenario(self, scenario_results: pd.DataFrame):
+        """ scenario_results must include a scenario_name column
+        """
+        self._append('scenarios', scenario_results)
+
+    def write_iteration_results(
+            self,
+            scenario_name: str,
+            iteration_results: pd.DataFrame
+    ):
+        if self.write_iterations:
+            rows = iteration_results.reset_index(drop=True)
+            rows.insert(0, 'iteration', rows.index)
+            rows['scenario_name'] = scenario_name
+            self._append('iterations', rows)
+
+    def _write_partition(self, name: str, scenario_name: str, rows: pd.DataFrame):
+        partition = os.path.join(
+            self.dataset_path(name),
+            f'scenario_name={quote(str(scenario_name), safe="")}'
+        )
+        os.makedirs(partition, exist_ok=True)
+        fp = os.path.join(partition, f'part-{uuid.uuid4().hex}.parquet')
+        tmp_fp = os.path.join(partition, f'.{uuid.uuid4().hex}.tmp')
+        table = pa.Table.from_pandas(
+            rows.drop(columns='scenario_name').infer_objects(),
+            preserve_index=False
+        )
+        parquet.write_table(table, tmp_fp)
+        os.replace(tmp_fp, fp)
+
+    def _flush_dataset(self, name: str):
+        if not self._pending[name]:
+            return
+        rows = pd.concat(self._pending[name], ignore_index=True)
+        self._pending[name] = []
+        self._pending_rows[name] = 0
+        for scenario_name, partition_rows in rows.groupby('scenario_name', sort=False):
+            self._write_partition(name, scenario_name, partition_rows)
+
+    def flush(self):
+        for name in supported_datasets:
+            self._flush_dataset(name)
+
+    def read(
+            self,
+            name: str = 'scenarios',
+            scenario_names: List[str] = None,
+            columns: List[str] = None
+    ) -> pd.DataFrame:
+        """ Read flushed results, optionally only for some scenarios and columns
+        """
+        results = dataset.dataset(
+            self.dataset_path(name),
+            format='parquet',
+            partitioning='hive',
+            exclude_invalid_files=True
+        )
+        scenario_filter = None
+        if scenario_names is not None:
+            scenario_filter = dataset.field('scenario_name').isin(scenario_names)
+        return results.to_table(
+            columns=columns,
+            filter=scenario_filter
+        ).to_pandas()
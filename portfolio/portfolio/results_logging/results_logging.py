@@ -1,12 +1,21 @@
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
 
+from portfolio.portfolio.results_logging.parquet_sink import ParquetResultsSink
 from portfolio.portfolio.results_logging.plotting import StackPlotConfig
 from portfolio.resources.dispatch import DispatchVector
+from portfolio.statistics.sketches import KLLSketch, RunningMoments, quantile_from_label
+from portfolio.utils.lazy_imports import lazy_import
+from portfolio.utils.profiling import span
+
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+
+# Metrics logged for every iteration (DispatchLog.annual_cost_totals)
+cost_total_metrics = ['annual_dispatch_cost', 'levelized_cost']
 
 
 @dataclass
@@ -15,12 +24,13 @@ class DispatchLog:
     dispatch_log: pd.DataFrame = None
     annual_costs: pd.DataFrame = None
     dispatch_order: List[str] = None
+    excess_log: Dict[str, np.ndarray] = None
 
     def __post_init__(self):
         self.clear_log(None)
 
     def clear_log(self, new_demand: np.ndarray = None):
-        if new_demand:
+        if new_demand is not None:
             self.demand = new_demand
         self.dispatch_log = pd.DataFrame.from_dict({
             'demand': self.demand,
@@ -33,27 +43,63 @@ class DispatchLog:
             ]
         )
         self.dispatch_order = []
+        self.excess_log = {}
 
     def log(
         self,
         dispatch: DispatchVector,
         annual_cost: float = None,
         levelized_cost: float = None
+    ):
+        with span('DispatchLog.log'):
+            self._log(dispatch, annual_cost, levelized_cost)
+
+    def _log(
+        self,
+        dispatch: DispatchVector,
+        annual_cost: float = None,
+        levelized_cost: float = None
     ):
         self.dispatch_log['residual_demand'] -= dispatch.as_net
         self.dispatch_log[dispatch.name] = dispatch.as_net
         self.dispatch_order.append(dispatch.name)
+        self.excess_log[dispatch.name] = dispatch.excess
+        self.log_costs(dispatch.name, annual_cost, levelized_cost)
+
+    def log_costs(
+        self,
+        name: str,
+        annual_cost: float = None,
+        levelized_cost: float = None
+    ):
         if annual_cost:
             self.annual_costs.loc[
                 'annual_dispatch_cost',
-                dispatch.name
+                name
             ] = annual_cost
         if levelized_cost:
             self.annual_costs.loc[
                 'levelized_cost',
-                dispatch.name
+                name
             ] = levelized_cost
 
+    def set_costs(self, costs: Dict[str, Tuple[float, float]]):
+        """ Replace the cost table with (annual_cost, levelized_cost) by
+        asset, treating missing costs as log_costs does, in one step
+        """
+        self.annual_costs = pd.DataFrame(
+            {
+                name: [annual_cost or np.nan, levelized_cost or np.nan]
+                for name, (annual_cost, levelized_cost) in costs.items()
+                if annual_cost or levelized_cost
+            },
+            index=[
+                'annual_dispatch_cost',
+                'levelized_cost'
+            ],
+            dtype=float
+        )
+
     def plot(self, plot_config: StackPlotConfig):
         rank = self.dispatch_order
         rank.append('residual_demand')
@@ -80,57 +126,327 @@ class DispatchLog:
         })
 
 
+@dataclass
+class BatchDispatchLog:
+    """ DispatchLog for many iterations dispatched at once
+    (see AssetGroups.dispatch_batch):
+     - demand and residual_demand are (iterations x hours) matrices
+     - dispatch and excess hold each asset's (iterations x hours) net
+     dispatch and excess
+     - annual_costs and levelized_costs hold each asset's costs as vectors
+     with one value per iteration
+    """
+    demand: np.ndarray
+
+    def __post_init__(self):
+        self.demand = np.array(self.demand, dtype=float, ndmin=2)
+        self.clear_log()
+
+    def clear_log(self):
+        self.residual_demand = self.demand.copy()
+        self.dispatch: Dict[str, np.ndarray] = {}
+        self.excess: Dict[str, np.ndarray] = {}
+        self.annual_costs: Dict[str, np.ndarray] = {}
+        self.levelized_costs: Dict[str, np.ndarray] = {}
+        self.dispatch_order = []
+
+    def log(
+        self,
+        dispatch: DispatchVector,
+        annual_costs: np.ndarray = None,
+        levelized_costs: np.ndarray = None
+    ):
+        with span('BatchDispatchLog.log'):
+            net = dispatch.as_net
+            self.residual_demand -= net
+            self.dispatch[dispatch.name] = net
+            self.excess[dispatch.name] = dispatch.excess
+            self.dispatch_order.append(dispatch.name)
+            if annual_costs is not None:
+                self.annual_costs[dispatch.name] = annual_costs
+            if levelized_costs is not None:
+                self.levelized_costs[dispatch.name] = levelized_costs
+
+    def annual_cost_totals(self) -> pd.DataFrame:
+        """ One row per iteration, as DispatchLog.annual_cost_totals
+        """
+        names = list(self.annual_costs)
+        annual_costs = np.array([self.annual_costs[name] for name in names], ndmin=2)
+        levelized_costs = np.array([
+            self.levelized_costs.get(name, np.full(len(self.demand), np.nan))
+            for name in names
+        ], ndmin=2)
+        annual_cost_sum = annual_costs.sum(axis=0)
+        weighted_cost = np.nansum(annual_costs * levelized_costs, axis=0)
+        return pd.DataFrame({
+            'annual_dispatch_cost': annual_cost_sum,
+            'levelized_cost': weighted_cost / annual_cost_sum
+        })
+
+
+class Validator:
+    @staticmethod
+    def confidence_level(value: float):
+        if not 0.0 < value < 1.0:
+            raise ValueError(f'Invalid confidence level ({value}): must be between 0.0 and 1.0')
+
+    @staticmethod
+    def iteration_bounds(min_iterations: int, max_iterations: int):
+        if not 2 <= min_iterations <= max_iterations:
+            raise ValueError(f'Invalid iteration bounds: require 2 <= min_iterations '
+                             f'({min_iterations}) <= max_iterations ({max_iterations})')
+
+    @staticmethod
+    def check_interval(check_every: int):
+        if check_every < 1:
+            raise ValueError(f'Invalid check_every ({check_every}): must be a positive integer')
+
+    @staticmethod
+    def logged_targets(targets: Dict[str, float], metrics: List[str]):
+        unknown = list([metric for metric in targets if metric not in metrics])
+        if unknown:
+            raise ValueError(f'Invalid convergence targets ({", ".join(unknown)}): targets must be '
+                             f'logged metrics, i.e. one of the following: {", ".join(metrics)}')
+
+
+@dataclass
+class ConvergenceCriteria:
+    """ Stopping rule for Monte Carlo runs: iteration stops once the confidence
+    interval half-width of the running mean of every target metric is at or
+    below its target, or once max_iterations have been run.
+     - targets map a logged metric (e.g. 'annual_dispatch_cost') to a half-width
+     - if relative is True, targets are fractions of the running mean
+    """
+    targets: Dict[str, float]
+    confidence: float = 0.95
+    min_iterations: int = 10
+    max_iterations: int = 1000
+    check_every: int = 1
+    relative: bool = False
+
+    def __post_init__(self):
+        Validator.confidence_level(self.confidence)
+        Validator.iteration_bounds(self.min_iterations, self.max_iterations)
+        Validator.check_interval(self.check_every)
+
+    def due(self, iterations: int) -> bool:
+        return iterations >= self.min_iterations \
+            and iterations % self.check_every == 0
+
+    def check_targets(self, metrics: List[str]):
+        """ Raise if any target is not among the logged metrics, before a
+        run rather than when convergence is first checked
+        """
+        Validator.logged_targets(self.targets, metrics)
+
+
+streaming_statistics = ['count', 'mean', 'std', 'var', 'min', 'max']
+
+
+@dataclass
+class ConvergenceStatus:
+    iterations: int
+    converged: bool
+    half_widths: pd.Series
+
+
 @dataclass
 class MonteCarloLog:
+    """ Per-iteration results of a Monte Carlo run.
+     - every metric also feeds streaming moments (count, mean, std, min, max)
+     and a KLL quantile sketch, so confidence intervals and quantile statistics
+     need O(1) memory per metric
+     - with retain_log=False, iterations are not kept in log at all, and only
+     the streaming statistics are available
+     - retained iterations are buffered and concatenated only when log is
+     read, rather than copying the log on every iteration
+     - logs of the same scenario run in parallel can be combined with merge
+    """
     scenario: dict
-    log: pd.DataFrame = None
+    confidence: float = 0.95
+    retain_log: bool = True
+    sketch_k: int = 200
 
     def __post_init__(self):
-        self.log = pd.DataFrame()
+        self.clear_log()
+
+    @property
+    def log(self) -> pd.DataFrame:
+        if self._rows:
+            rows = pd.DataFrame(self._rows).reset_index(drop=True)
+            self._log = rows if self._log.empty \
+                else pd.concat([self._log, rows], ignore_index=True)
+            self._rows = []
+        return self._log
 
     def clear_log(self):
-        self.log = pd.DataFrame()
+        self._log = pd.DataFrame()
+        self._rows: List[pd.Series] = []
+        self.moments: Dict[str, RunningMoments] = {}
+        self.sketches: Dict[str, KLLSketch] = {}
+        self._iterations = 0
+
+    def _stream(self, metric: str):
+        if metric not in self.moments:
+            self.moments[metric] = RunningMoments()
+            self.sketches[metric] = KLLSketch(self.sketch_k)
+        return self.moments[metric], self.sketches[metric]
 
     def log_simulation(
         self,
         iteration_result: pd.Series
     ):
-        self.log = self.log.append(iteration_result, ignore_index=True)
+        with span('MonteCarloLog.log_simulation'):
+            self._log_simulation(iteration_result)
+
+    def _log_simulation(self, iteration_result: pd.Series):
+        for metric, value in iteration_result.items():
+            moments, sketch = self._stream(metric)
+            moments.update(value)
+            sketch.update(value)
+        self._iterations += 1
+        if self.retain_log:
+            self._rows.append(iteration_result)
+
+    def merge(self, other):
+        """ Combine another log of the same scenario into this one. If either
+        log was not retained, the merged log is not retained either
+        """
+        for metric in other.moments:
+            moments, sketch = self._stream(metric)
+            moments.merge(other.moments[metric])
+            sketch.merge(other.sketches[metric])
+        self._iterations += other.iterations
+        if self.retain_log and other.retain_log:
+            self._log = pd.concat([self.log, other.log], ignore_index=True)
+        else:
+            self.retain_log = False
+            self._log = pd.DataFrame()
+            self._rows = []
 
     def plot(self):
         pass
 
+    @property
+    def iterations(self) -> int:
+        return self._iterations
+
+    def _moment_statistic(self, stat: str) -> pd.Series:
+        return pd.Series({
+            metric: getattr(moments, stat)
+            for metric, moments in self.moments.items()
+        }, dtype=float)
+
+    def quantiles(self, q: float) -> pd.Series:
+        return pd.Series({
+            metric: sketch.quantile(q)
+            for metric, sketch in self.sketches.items()
+        }, dtype=float)
+
+    def confidence_half_widths(self, confidence: float = None) -> pd.Series:
+        """ Half-width of the Student-t confidence interval on the mean of each
+        logged metric
+        """
+        confidence = confidence or self.confidence
+        n = self._moment_statistic('count')
+        if self.iterations < 2:
+            return pd.Series(np.inf, index=n.index)
+        t_value = stats.t.ppf((1 + confidence) / 2, n - 1)
+        return t_value * self._moment_statistic('std') / np.sqrt(n)
+
+    def convergence_status(self, criteria: ConvergenceCriteria) -> ConvergenceStatus:
+        metrics = list(criteria.targets)
+        half_widths = self.confidence_half_widths(criteria.confidence)[metrics]
+        targets = pd.Series(criteria.targets)
+        if criteria.relative:
+            targets = targets * self._moment_statistic('mean')[metrics].abs()
+        return ConvergenceStatus(
+            iterations=self.iterations,
+            converged=bool((half_widths <= targets).all()),
+            half_widths=half_widths
+        )
+
+    def _statistic(self, stat: str, confidence: float = None) -> pd.Series:
+        q = quantile_from_label(stat)
+        if q is not None:
+            return self.quantiles(q)
+        if stat == 'ci_half_width':
+            return self.confidence_half_widths(confidence)
+        if self.retain_log:
+            stat_method = getattr(pd.DataFrame, stat)
+            return stat_method(self.log)
+        if stat in streaming_statistics:
+            return self._moment_statistic(stat)
+        raise ValueError(f'Invalid statistic ({stat}): without a retained log, statistics '
+                         f'must be quantiles (e.g. p95), ci_half_width or one of the '
+                         f'following: {", ".join(streaming_statistics)}')
+
     def aggregated_statistics(
         self,
         scenario_name: str,
-        stats: Tuple[str] = ('mean', 'std')
+        stats: Tuple[str] = ('mean', 'std'),
+        confidence: float = None
     ):
+        """ Statistics are DataFrame method names (e.g. 'mean', 'std', 'count'),
+        'ci_half_width' for the confidence interval half-width on the mean (at
+        confidence, by default the log's), or quantiles from the streaming
+        sketches such as 'p5', 'p50', 'p95', 'p99'
+        """
         scenario_name_s = pd.Series({'scenario_name': scenario_name})
         scenario_s = pd.Series(self.scenario)
         rows = []
         for stat in stats:
-            stat_method = getattr(pd.DataFrame, stat)
-            statistic_s = stat_method(self.log)
+            statistic_s = self._statistic(stat, confidence)
             stat_label_s = pd.Series({'statistic': stat})
-            rows.append(scenario_s.copy().append([scenario_name_s, stat_label_s, statistic_s]))
+            rows.append(pd.concat([scenario_s, scenario_name_s, stat_label_s, statistic_s]))
         return pd.DataFrame(rows)
 
 
 @dataclass
 class ScenarioLogger:
-    log: pd.DataFrame = None
+    """ Log of aggregated scenario results.
+     - results are kept as a list of frames and concatenated only when log is
+     read, rather than copied on every scenario
+     - with a sink, results (and optionally raw per-iteration results) are also
+     appended to a partitioned Parquet dataset; with retain=False they are
+     written to the sink only, keeping memory bounded
+    """
+    sink: ParquetResultsSink = None
+    retain: bool = True
 
     def __post_init__(self):
         self.clear_log()
 
+    @property
+    def log(self) -> pd.DataFrame:
+        if self._log is None:
+            self._log = pd.concat(self._frames, ignore_index=True) \
+                if self._frames else pd.DataFrame()
+        return self._log
+
     def clear_log(self):
-        self.log = pd.DataFrame()
+        self._frames = []
+        self._log = None
+
+    def log_scenario(
+            self,
+            scenario_results: pd.DataFrame,
+            iteration_results: pd.DataFrame = None
+    ):
+        if self.sink:
+            self.sink.write_scenario(scenario_results)
+            if iteration_results is not None:
+                self.sink.write_iteration_results(
+                    scenario_results['scenario_name'].iloc[0],
+                    iteration_results
+                )
+        if self.retain:
+            self._frames.append(scenario_results)
+            self._log = None
 
-    def log_scenario(self, scenario_results: pd.DataFrame):
-        self.log = pd.concat([
-            self.log,
-            scenario_results
-        ], axis=1)
+    def flush(self):
+        if self.sink:
+            self.sink.flush()
 
     def plot(self):
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import heapq
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from portfolio.portfolio.results_logging.results_logging import DispatchLog
+from portfolio.utils.lazy_imports import lazy_import
+
+pa = lazy_import('pyarrow')
+compute = lazy_import('pyarrow.compute')
+ipc = lazy_import('pyarrow.ipc')
+
+
+class TraceSelector(ABC):
+    """ Decides which Monte Carlo iterations have their hourly traces archived.
+    make_batch builds the iteration's trace and should only be called for
+    iterations that may be kept
+    """
+    @abstractmethod
+    def offer(
+            self,
+            iteration: int,
+            cost_totals: pd.Series,
+            make_batch: Callable[[], pa.RecordBatch]
+    ) -> Optional[pa.RecordBatch]:
+        """ Returns a batch to write immediately, if any
+        """
+        pass
+
+    def drain(self) -> List[pa.RecordBatch]:
+        """ Returns batches held back until the end of the run
+        """
+        return []
+
+
+class ImmediateTraceSelector(TraceSelector):
+    @abstractmethod
+    def select(self, iteration: int, cost_totals: pd.Series) -> bool:
+        pass
+
+    def offer(self, iteration, cost_totals, make_batch):
+        if self.select(iteration, cost_totals):
+            return make_batch()
+        return None
+
+
+@dataclass
+class EveryNthSelector(ImmediateTraceSelector):
+    n: int
+    offset: int = 0
+
+    def select(self, iteration: int, cost_totals: pd.Series) -> bool:
+        return (iteration - self.offset) % self.n == 0
+
+
+@dataclass
+class PredicateSelector(ImmediateTraceSelector):
+    """ Keeps iterations for which predicate(cost_totals) is True, e.g.
+    lambda totals: totals['annual_dispatch_cost'] > 2e8
+    """
+    predicate: Callable[[pd.Series], bool]
+
+    def select(self, iteration: int, cost_totals: pd.Series) -> bool:
+        return bool(self.predicate(cost_totals))
+
+
+@dataclass
+class TopKSelector(TraceSelector):
+    """ Keeps the k iterations with the largest (or smallest) value of metric.
+    At most k traces are held in memory, and they are written at the end of
+    the run
+    """
+    k: int
+    metric: str = 'annual_dispatch_cost'
+    largest: bool = True
+
+    def __post_init__(self):
+        self._heap = []
+
+    def offer(self, iteration, cost_totals, make_batch):
+        value = cost_totals[self.metric]
+        key = value if self.largest else -value
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (key, iteration, make_batch()))
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (key, iteration, make_batch()))
+        return None
+
+    def drain(self) -> List[pa.RecordBatch]:
+        kept = sorted(self._heap, key=lambda entry: entry[1])
+        self._heap = []
+        return list([batch for _, _, batch in kept])
+
+
+@dataclass
+class DispatchTraceRecorder:
+    """ Opt-in archive of hourly dispatch traces for selected iterations.
+     - each scenario is written to directory/<scenario_name>.arrow as an Arrow
+     IPC file with one record batch per selected iteration, between start and
+     close; offering traces outside a started scenario raises RuntimeError
+     - columns are iteration, hour, demand, residual_demand and, per asset
+     (in name order), net dispatch and excess (<asset>_excess)
+     - read_traces memory-maps the file, so analysis is zero-copy
+    """
+    directory: str
+    selector: TraceSelector
+    _writer: ipc.RecordBatchFileWriter = None
+    _sink: pa.OSFile = None
+    _path: str = None
+
+    def path(self, scenario_name: str) -> str:
+        return os.path.join(self.directory, f'{quote(str(scenario_name), safe="")}.arrow')
+
+    def start(self, scenario_name: str):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self._path = self.path(scenario_name)
+
+    @staticmethod
+    def trace_batch(iteration: int, dispatch_logger: DispatchLog) -> pa.RecordBatch:
+        log = dispatch_logger.dispatch_log
+        hours = len(log)
+        columns = {
+            'iteration': np.full(hours, iteration, dtype=np.int32),
+            'hour': np.arange(hours, dtype=np.int32),
+            'demand': np.asarray(log['demand'], dtype=float),
+            'residual_demand': np.asarray(log['residual_demand'], dtype=float),
+        }
+        for name in sorted(dispatch_logger.dispatch_order):
+            columns[name] = np.asarray(log[name], dtype=float)
+            columns[f'{name}_excess'] = np.asarray(
+                dispatch_logger.excess_log[name],
+                dtype=float
+            )
+        return pa.RecordBatch.from_pydict(columns)
+
+    def _write(self, batch: pa.RecordBatch):
+        if self._writer is None:
+            if self._path is None:
+                raise RuntimeError(
+                    'No scenario started: call DispatchTraceRecorder.start '
+                    'before offering traces'
+                )
+            self._sink = pa.OSFile(self._path, 'wb')
+            self._writer = ipc.new_file(self._sink, batch.schema)
+        self._writer.write_batch(batch)
+
+    def offer(
+            self,
+            iteration: int,
+            dispatch_logger: DispatchLog,
+            cost_totals: pd.Series
+    ):
+        batch = self.selector.offer(
+            iteration,
+            cost_totals,
+            lambda: self.trace_batch(iteration, dispatch_logger)
+        )
+        if batch is not None:
+            self._write(batch)
+
+    def close(self):
+        for batch in self.selector.drain():
+            self._write(batch)
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+        self._writer = None
+        self._sink = None
+        self._path = None
+
+    @staticmethod
+    def read_traces(
+            path: str,
+            iterations: List[int] = None,
+            columns: List[str] = None
+    ) -> pa.Table:
+        """ Memory-mapped, zero-copy read of an archived trace file
+        """
+        table = ipc.open_file(pa.memory_map(path)).read_all()
+        if iterations is not None:
+            table = table.filter(compute.is_in(
+                table['iteration'],
+                value_set=pa.array(iterations, pa.int32())
+            ))
+        if columns is not None:
+            table = table.select(columns)
+        return table
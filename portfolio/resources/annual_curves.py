@@ -1,10 +1,8 @@
 import numpy as np
-from scipy import integrate
 import pandas as pd
 from dataclasses import dataclass
-from matplotlib import pyplot as plt
 from abc import ABC, abstractmethod
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 import calendar
 from datetime import date, datetime
 
@@ -14,6 +12,11 @@ from portfolio.statistics.stochastics import (
     RandomWindowChoiceModel,
     StochasticResource, ComplementaryRandomArrayChoiceModel
 )
+from portfolio.statistics.sampling import UniformSampler
+from portfolio.utils.lazy_imports import lazy_import
+
+integrate = lazy_import('scipy.integrate')
+plt = lazy_import('matplotlib.pyplot')
 
 
 @dataclass
@@ -118,6 +121,10 @@ class StochasticAnnualCurveModel(ABC):
     def update(self):
         pass
 
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return self.stochastic_model.last_draw if self.stochastic_model else None
+
 
 @dataclass
 class StochasticWindowAnnualCurveModel(StochasticAnnualCurveModel):
@@ -129,8 +136,13 @@ class StochasticWindowAnnualCurveModel(StochasticAnnualCurveModel):
         return self.scale * self.stochastic_model.generate_samples(self.hours)
 
     @classmethod
-    def from_array(cls, sample_data, scale: float = 1.0):
-        stochastic_model = RandomWindowChoiceModel(sample_data)
+    def from_array(
+            cls,
+            sample_data,
+            scale: float = 1.0,
+            sampler: UniformSampler = None
+    ):
+        stochastic_model = RandomWindowChoiceModel(sample_data, sampler)
         return cls(
             sample_data=sample_data,
             stochastic_model=stochastic_model,
@@ -144,6 +156,7 @@ class StochasticChoiceAnnualCurveModel(StochasticAnnualCurveModel):
     year: int = None
     scale: float = 1.0
     strip_leap_days: bool = True
+    sampler: UniformSampler = None
 
     _direct_instantiation: bool = True
 
@@ -151,7 +164,7 @@ class StochasticChoiceAnnualCurveModel(StochasticAnnualCurveModel):
         if self._direct_instantiation:
             raise Exception(f'You may only instantiate this objects of this class'
                             f'with class methods - e.g. from_array()')
-        self.stochastic_model = RandomAnnualCurveChoice(self.sample_data)
+        self.stochastic_model = RandomAnnualCurveChoice(self.sample_data, self.sampler)
         self.update()
 
     def update(
@@ -176,7 +189,8 @@ class StochasticChoiceAnnualCurveModel(StochasticAnnualCurveModel):
             year: int,
             sample_data: List[list],
             scale=1.0,
-            strip_leap_days: bool = True
+            strip_leap_days: bool = True,
+            sampler: UniformSampler = None
     ):
         Validator.standard_year(sample_data)
         return cls(
@@ -185,6 +199,7 @@ class StochasticChoiceAnnualCurveModel(StochasticAnnualCurveModel):
             year=year,
             scale=scale,
             strip_leap_days=strip_leap_days,
+            sampler=sampler,
             _direct_instantiation=False
         )
 
@@ -196,6 +211,7 @@ class StochasticComplementaryChoiceAnnualCurveModel(StochasticAnnualCurveModel):
     year: int = None
     scale: float = 1.0
     strip_leap_days: bool = True
+    sampler: UniformSampler = None
 
     _direct_instantiation: bool = True
 
@@ -203,7 +219,7 @@ class StochasticComplementaryChoiceAnnualCurveModel(StochasticAnnualCurveModel):
         if self._direct_instantiation:
             raise Exception(f'You may only instantiate this objects of this class'
                             f'with class methods - e.g. from_array()')
-        self.stochastic_model = ComplementaryRandomCurveChoice(self.sample_data)
+        self.stochastic_model = ComplementaryRandomCurveChoice(self.sample_data, self.sampler)
         self.update()
 
     def update(
@@ -219,7 +235,8 @@ class StochasticComplementaryChoiceAnnualCurveModel(StochasticAnnualCurveModel):
             year: int,
             sample_data: Dict[str, List[list]],
             scale=1.0,
-            strip_leap_days: bool = True
+            strip_leap_days: bool = True,
+            sampler: UniformSampler = None
     ):
         Validator.standard_year(sample_data)
         return cls(
@@ -228,6 +245,7 @@ class StochasticComplementaryChoiceAnnualCurveModel(StochasticAnnualCurveModel):
             year=year,
             scale=scale,
             strip_leap_days=strip_leap_days,
+            sampler=sampler,
             _direct_instantiation=False
         )
 
@@ -272,6 +290,10 @@ class StochasticAnnualCurve(StochasticResource):
     def from_dataframe(dataframe: pd.DataFrame):
         pass
 
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return self.stochastic_model.draw_key
+
     @abstractmethod
     def refresh(self):
         pass
@@ -300,10 +322,12 @@ class StochasticWindowAnnualCurve(StochasticAnnualCurve):
             units: str,
             sample_data: np.ndarray,
             scale=1.0,
+            sampler: UniformSampler = None
     ):
         stochastic_model = StochasticWindowAnnualCurveModel.from_array(
             sample_data,
-            scale
+            scale,
+            sampler
         )
         return cls(
             name,
@@ -338,7 +362,8 @@ class StochasticChoiceAnnualCurve(StochasticAnnualCurve):
             year: int,
             sample_data: List[list],
             scale=1.0,
-            strip_leap_days: bool = True
+            strip_leap_days: bool = True,
+            sampler: UniformSampler = None
     ):
         stochastic_model = StochasticChoiceAnnualCurveModel.from_array(
             name,
@@ -346,6 +371,7 @@ class StochasticChoiceAnnualCurve(StochasticAnnualCurve):
             sample_data,
             scale,
             strip_leap_days,
+            sampler,
         )
         return cls(
             name,
@@ -380,7 +406,8 @@ class StochasticComplementaryChoiceAnnualCurve(StochasticAnnualCurve):
             year: int,
             sample_data: Dict[str, List[list]],
             scale=1.0,
-            strip_leap_days: bool = True
+            strip_leap_days: bool = True,
+            sampler: UniformSampler = None
     ):
         stochastic_model = StochasticComplementaryChoiceAnnualCurveModel.from_array_dict(
             name,
@@ -388,6 +415,7 @@ class StochasticComplementaryChoiceAnnualCurve(StochasticAnnualCurve):
             sample_data,
             scale,
             strip_leap_days,
+            sampler,
         )
         return cls(
             name,
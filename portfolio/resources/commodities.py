@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from typing import List, Dict
 import pandas as pd
 
+from portfolio.statistics.sampling import UniformSampler
 from portfolio.statistics.stochastics import CorrelatedDistributionModel, StochasticResource
 
 
@@ -64,7 +65,8 @@ class PriceCorrelation(PriceModel):
     def from_data(
             data: pd.DataFrame,
             commodities: Dict[str, Commodity],
-            distribution: str
+            distribution: str,
+            sampler: UniformSampler = None
     ):
         if not all([k in data.columns for k, v in commodities.items()]):
             raise ValueError(
@@ -72,7 +74,7 @@ class PriceCorrelation(PriceModel):
                 f' be present as headers in data columns'
             )
         data = data[commodities]
-        correlation_dist = CorrelatedDistributionModel.from_data(data, distribution)
+        correlation_dist = CorrelatedDistributionModel.from_data(data, distribution, sampler)
         instance = PriceCorrelation(commodities, correlation_dist, distribution)
         instance.update_prices()
         return instance
@@ -80,8 +82,14 @@ class PriceCorrelation(PriceModel):
 
 @dataclass
 class Markets(StochasticResource):
+    """ Price models are updated once per refresh, even if listed more than
+    once
+    """
     market_prices: List[PriceModel]
 
     def refresh(self):
+        updated = set()
         for market_price in self.market_prices:
-            market_price.update_prices()
\ No newline at end of file
+            if id(market_price) not in updated:
+                updated.add(id(market_price))
+                market_price.update_prices()
\ No newline at end of file
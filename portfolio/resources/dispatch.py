@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 from dataclasses import dataclass, field
 from typing import Iterable, Union, Optional
 
 import numpy as np
 
+from portfolio.utils.profiling import span
+from portfolio.utils.validation import should_validate
+
 
 @dataclass
 class DispatchVector:
@@ -12,6 +17,9 @@ class DispatchVector:
 
     Charge and discharge are enforced as mutually exclusive - (I.e. Discharge should
     never occur at the same index as charge)
+
+    Checks follow the package validation level (portfolio.utils.validation);
+    DispatchVector.trusted skips them altogether
     """
     name: str
     charge: Optional[np.ndarray] = field(default=None)
@@ -39,14 +47,47 @@ class DispatchVector:
 
     def fill_zeros(self):
         length = self.validate_equal_lengths()
-        self.charge = np.array(length * [0]) if self.charge is None else self.charge
-        self.discharge = np.array(length * [0]) if self.discharge is None else self.discharge
-        self.excess = np.array(length * [0]) if self.excess is None else self.excess
+        self.charge = np.zeros(length) if self.charge is None else self.charge
+        self.discharge = np.zeros(length) if self.discharge is None else self.discharge
+        self.excess = np.zeros(length) if self.excess is None else self.excess
 
     def __post_init__(self):
-        self.fill_zeros()
-        self.validate_positive_vector_values()
-        self.validate_charge_discharge_mutual_exclusion()
+        with span('DispatchVector.validate'):
+            if should_validate('DispatchVector'):
+                self.fill_zeros()
+                self.validate_positive_vector_values()
+                self.validate_charge_discharge_mutual_exclusion()
+            else:
+                self._fill_zeros_unchecked()
+
+    def _fill_zeros_unchecked(self):
+        shape = next(np.shape(v) for v in self.vector_list if v is not None)
+        if self.charge is None:
+            self.charge = np.zeros(shape)
+        if self.discharge is None:
+            self.discharge = np.zeros(shape)
+        if self.excess is None:
+            self.excess = np.zeros(shape)
+
+    @classmethod
+    def trusted(
+            cls,
+            name: str,
+            charge: np.ndarray = None,
+            discharge: np.ndarray = None,
+            excess: np.ndarray = None
+    ) -> DispatchVector:
+        """ Construct without any checks, for vectors that are valid by
+        construction. Missing vectors are filled with zeros. Vectors may also
+        be (iterations x hours) matrices, as returned by Asset.dispatch_batch
+        """
+        dispatch = cls.__new__(cls)
+        dispatch.name = name
+        dispatch.charge = charge
+        dispatch.discharge = discharge
+        dispatch.excess = excess
+        dispatch._fill_zeros_unchecked()
+        return dispatch
 
     def validate_equal_lengths(self) -> int:
         non_zero_lengths = [l for l in self.vector_lengths if l]
@@ -58,6 +99,8 @@ class DispatchVector:
         return max(self.vector_lengths)
 
     def validate_positive_vector_values(self):
+        if not (np.any(self.charge < 0.0) or np.any(self.discharge < 0.0) or np.any(self.excess < 0.0)):
+            return
         message = 'Vectors must be >= 0.0. The {} vector has negative values at the following indices {}'.format
         charge_neg_indices = np.where(self.charge < 0.0)[0]
         discharge_neg_indices = np.where( self.discharge < 0.0)[0]
@@ -73,8 +116,8 @@ class DispatchVector:
     def validate_charge_discharge_mutual_exclusion(self):
         charge_active = self.charge > 0.0
         discharge_active = self.discharge > 0.0
-        both_active = charge_active * discharge_active
-        if any(both_active):
+        both_active = charge_active & discharge_active
+        if np.any(both_active):
             indices = np.where(both_active)
             raise ValueError(
                 f'Dispatch charge and discharge are mutually exclusive - they must not be active'
@@ -87,8 +130,10 @@ class DispatchVector:
         """ Create instance from raw float where positive value
         is interpreted as discharge and negative dispatch interpreted as charge
         """
-        dispatch_vector = np.array(dispatch_vector)
-        return cls(
+        dispatch_vector = np.asarray(dispatch_vector, dtype=float)
+        # Charge and discharge are non-negative and mutually exclusive by
+        # construction
+        return cls.trusted(
             name=name,
             charge=np.where(dispatch_vector < 0.0, -dispatch_vector, 0.0),
             discharge=np.where(dispatch_vector > 0.0, dispatch_vector, 0.0),
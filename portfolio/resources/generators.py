@@ -101,20 +101,38 @@ class GeneratorTechnology(GridTechnology):
 @dataclass(order=True)
 class Generator(Asset):
     technology: GeneratorTechnology
+    supports_batch = True
 
     def dispatch(
             self,
             demand: np.ndarray
     ) -> DispatchVector:
-        if self.constraint:
+        dispatch = self.dispatch_batch(demand)
+        return DispatchVector(
+            name=self.name,
+            discharge=dispatch.discharge
+        )
+
+    def dispatch_batch(
+            self,
+            demand: np.ndarray,
+            constraint: np.ndarray = None
+    ) -> DispatchVector:
+        """ dispatch against each row of an (iterations x hours) demand
+        matrix, or against a single demand vector. constraint holds each
+        iteration's constraint data in the units of self.constraint; by
+        default the current constraint sample applies to every row
+        """
+        if constraint is None and self.constraint:
             constraint = self.constraint.constraint
-            if self.constraint.as_factor:
+        if constraint is not None:
+            if self.constraint and self.constraint.as_factor:
                 constraint = constraint * self.firm_capacity
             ultimate_constraint = np.clip(constraint, 0, self.firm_capacity)
         else:
             ultimate_constraint = self.firm_capacity
 
-        return DispatchVector(
+        return DispatchVector.trusted(
             name=self.name,
             discharge=np.clip(
                 demand,
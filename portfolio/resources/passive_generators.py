@@ -1,16 +1,17 @@
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
 from portfolio.resources.dispatch import DispatchVector
-from portfolio.statistics.stochastics import StochasticResource
+from portfolio.statistics.stochastics import StochasticResource, refresh_graph, combined_draw_key
 from portfolio.resources.technologies import (
     Asset,
     GridTechnology,
 )
 from portfolio.resources.annual_curves import StochasticAnnualCurve, StochasticComplementaryChoiceAnnualCurve
+from portfolio.utils.digests import array_digest
 
 
 @dataclass
@@ -25,6 +26,10 @@ class PassiveResource(StochasticResource):
     def refresh(self):
         pass
 
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return self.resource.draw_key
+
 
 @dataclass
 class SimplePassiveResource(PassiveResource):
@@ -33,25 +38,58 @@ class SimplePassiveResource(PassiveResource):
 
     def refresh(self):
         self.resource.refresh()
+        self.read_sources()
+
+    @property
+    def shared_sources(self) -> List[StochasticAnnualCurve]:
+        return [self.resource]
+
+    def read_sources(self):
         self.data = np.array(self.resource.data)
 
 
 @dataclass
 class CorrelatedPassiveResource(PassiveResource):
+    """ View of one named series of a complementary curve (e.g. wind from a
+    wind/solar curve). Resources sharing a curve see the same draw when
+    refreshed together (see PassiveResources)
+    """
     name: str = None
 
+    def __post_init__(self):
+        # The shared curve already holds a draw; reading it rather than
+        # resampling keeps resources constructed on one curve consistent
+        self.read_sources()
+
     def refresh(self):
         self.resource.refresh()
+        self.read_sources()
+
+    @property
+    def shared_sources(self) -> List[StochasticAnnualCurve]:
+        return [self.resource]
+
+    def read_sources(self):
         self.data = np.array(self.resource.data[self.name])
 
 
 @dataclass
 class PassiveResources(StochasticResource):
+    """ Passive resources refreshed as a graph: each shared curve is sampled
+    once per refresh and every resource reading it sees the same draw
+    """
     resources: List[StochasticAnnualCurve]
 
     def refresh(self):
-        for resource in self.resources:
-            resource.refresh()
+        refresh_graph(self.resources)
+
+    @property
+    def components(self) -> List[StochasticResource]:
+        return self.resources
+
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        return combined_draw_key(self.resources)
 
 
 @dataclass
@@ -67,6 +105,7 @@ class PassiveTechnology(GridTechnology):
 class PassiveGenerator(Asset):
     technology: PassiveTechnology
     passive_resource: PassiveResource
+    supports_batch = True
 
     @property
     def generation_curve(self) -> np.ndarray:
@@ -76,19 +115,46 @@ class PassiveGenerator(Asset):
             self,
             demand: np.ndarray
     ) -> DispatchVector:
-        if self.constraint:
-            max_dispatch = np.clip(self.generation_curve, 0, self.constraint)
-        else:
-            max_dispatch = self.generation_curve
+        dispatch = self.dispatch_batch(demand)
+        return DispatchVector(
+            name=self.name,
+            discharge=dispatch.discharge,
+            excess=dispatch.excess
+        )
 
-        discharge = np.clip(
-            demand,
-            0,
-            max_dispatch
+    def dispatch_parameters(self) -> tuple:
+        return super().dispatch_parameters() + (
+            array_digest(self.passive_resource.data),
         )
-        return DispatchVector(
+
+    def dispatch_batch(
+            self,
+            demand: np.ndarray,
+            constraint: np.ndarray = None,
+            resource: np.ndarray = None
+    ) -> DispatchVector:
+        """ dispatch against each row of an (iterations x hours) demand
+        matrix, or against a single demand vector. resource holds each
+        iteration's resource data (and constraint its constraint); by
+        default the current samples apply to every row
+        """
+        if resource is None:
+            resource = self.passive_resource.data
+        if constraint is None and self.constraint:
+            constraint = self.constraint.constraint
+        max_dispatch = resource * self.nameplate_capacity
+        if constraint is not None:
+            if self.constraint and self.constraint.as_factor:
+                constraint = constraint * self.nameplate_capacity
+            max_dispatch = np.clip(max_dispatch, 0, constraint)
+
+        return DispatchVector.trusted(
             name=self.name,
-            discharge=discharge,
+            discharge=np.clip(
+                demand,
+                0,
+                max_dispatch
+            ),
             excess=np.where(max_dispatch > demand, max_dispatch - demand, 0.0)
         )
 
@@ -112,3 +178,12 @@ class PassiveGenerator(Asset):
                 return total_dispatch_cost / dispatch.sum()
             else:
                 return np.nan
+
+    def levelized_costs(
+            self,
+            dispatch: np.ndarray,
+            total_dispatch_costs: np.ndarray = None
+    ) -> np.ndarray:
+        if self.technology.levelized_cost:
+            return np.full(np.shape(dispatch)[:-1], self.technology.levelized_cost)
+        return super().levelized_costs(dispatch, total_dispatch_costs)
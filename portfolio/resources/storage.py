@@ -18,6 +18,7 @@ class StorageOptimiser(ABC):
     discharge_threshold: float = 0.0
     charge_threshold = 0.0
 
+    @property
     def _simple_indexing(self):
         return self.scheduler._simple_indexing
 
@@ -98,6 +99,24 @@ class Storage(Asset):
     def available_storage(self) -> float:
         return self.depth_of_discharge * self.energy_capacity
 
+    def dispatch_parameters(self) -> tuple:
+        return super().dispatch_parameters() + (
+            self.hours_storage,
+            self.technology.round_trip_efficiency,
+            repr(self.optimiser),
+        )
+
+    def dispatch_state(self) -> tuple:
+        return (
+            self.state_of_charge,
+            self.optimiser.discharge_threshold,
+            self.optimiser.scheduler.state(),
+        )
+
+    def restore_dispatch_state(self, state: tuple):
+        self.state_of_charge, self.optimiser.discharge_threshold, scheduler_state = state
+        self.optimiser.scheduler.restore(scheduler_state)
+
     def reset_soc(self, new_soc=1.0):
         self.state_of_charge = new_soc
 
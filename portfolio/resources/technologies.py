@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Union
+from typing import List, Optional, Union
 from abc import ABC, abstractmethod
 import numpy as np
 
 from portfolio.portfolio.constraints import CapacityConstraint
 from portfolio.resources.dispatch import DispatchVector
+from portfolio.utils.digests import array_digest
 
 
 class Validator:
@@ -66,7 +67,13 @@ class GridTechnology(ABC):
 class Asset(ABC):
     """ Installed asset(or aggregation of identical assets), of specific technology type,
     capable of power dispatch (including active and passive dispatch)
+
+    Stateless assets that can dispatch against each row of an (iterations x
+    hours) demand matrix in one call set supports_batch and implement
+    dispatch_batch (see AssetGroups.dispatch_batch)
     """
+    supports_batch = False
+
     name: str
     nameplate_capacity: float
     firm_capacity_factor: float
@@ -103,6 +110,59 @@ class Asset(ABC):
     ) -> float:
         pass
 
+    def annual_dispatch_costs(self, dispatch: np.ndarray) -> np.ndarray:
+        """ annual_dispatch_cost of each row of an (iterations x hours)
+        dispatch matrix, at current prices
+        """
+        return dispatch.sum(axis=-1) * self.technology.total_var_cost + \
+            self.firm_capacity * self.technology.total_fixed_cost
+
+    def levelized_costs(
+            self,
+            dispatch: np.ndarray,
+            total_dispatch_costs: np.ndarray = None
+    ) -> np.ndarray:
+        """ levelized_cost of each row of an (iterations x hours) dispatch
+        matrix; NaN where nothing is dispatched
+        """
+        if total_dispatch_costs is None:
+            total_dispatch_costs = self.annual_dispatch_costs(dispatch)
+        dispatch_sums = dispatch.sum(axis=-1)
+        return np.divide(
+            total_dispatch_costs,
+            dispatch_sums,
+            out=np.full(np.shape(dispatch_sums), np.nan),
+            where=dispatch_sums > 0
+        )
+
+    def dispatch_parameters(self) -> tuple:
+        """ Everything besides residual demand and dispatch state that
+        determines this asset's physical dispatch (but not its costs), for
+        content-addressing dispatch results
+        """
+        constraint = None
+        if self.constraint:
+            constraint = (
+                self.constraint.as_factor,
+                array_digest(self.constraint.constraint)
+            )
+        return (
+            type(self).__name__,
+            self.name,
+            self.nameplate_capacity,
+            self.firm_capacity_factor,
+            constraint,
+        )
+
+    def dispatch_state(self) -> Optional[tuple]:
+        """ Hashable state carried from one dispatch into the next, or None
+        for stateless assets
+        """
+        return None
+
+    def restore_dispatch_state(self, state: tuple):
+        pass
+
     def scale_capacity(self, factor: float):
         self.nameplate_capacity *= factor
         self.cappable_capacity *= factor
@@ -0,0 +1,201 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+from portfolio.scenario.scenarios import ScenarioManager
+from portfolio.utils.lazy_imports import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+class Validator:
+    @staticmethod
+    def confidence_level(value: float):
+        if not 0.0 < value < 1.0:
+            raise ValueError(f'Invalid confidence level ({value}): must be between 0.0 and 1.0')
+
+    @staticmethod
+    def batch_size(batch_iterations: int, max_iterations: int):
+        if not 2 <= batch_iterations <= max_iterations:
+            raise ValueError(f'Invalid iteration budget: require 2 <= batch_iterations '
+                             f'({batch_iterations}) <= max_iterations ({max_iterations})')
+
+    @staticmethod
+    def halving_fraction(value: float):
+        if value is not None and not 0.0 < value < 1.0:
+            raise ValueError(f'Invalid halving_fraction ({value}): must be between 0.0 and 1.0')
+
+
+@dataclass
+class RaceCandidate:
+    name: str
+    nominal_capacities: dict
+    log: pd.DataFrame = field(default_factory=pd.DataFrame)
+    eliminated_round: int = None
+
+    @property
+    def alive(self) -> bool:
+        return self.eliminated_round is None
+
+    @property
+    def iterations(self) -> int:
+        return len(self.log)
+
+    def mean(self, metric: str) -> float:
+        return self.log[metric].mean()
+
+    def half_width(self, metric: str, alpha: float) -> float:
+        n = self.iterations
+        if n < 2:
+            return np.inf
+        t_value = stats.t.ppf(1 - alpha / 2, n - 1)
+        return t_value * self.log[metric].std() / np.sqrt(n)
+
+
+@dataclass
+class CapacityScenarioRace:
+    """ Racing allocation of Monte Carlo iterations across candidate capacity
+    scenarios, searching for the candidate with the lowest mean metric.
+     - every surviving candidate receives batch_iterations per round, up to
+     max_iterations in total
+     - after each round, candidates whose confidence interval lies entirely
+     above (best upper bound - tolerance) are eliminated. The candidate with the
+     lowest upper bound is never eliminated
+     - optionally, successive halving additionally keeps only the best
+     halving_fraction of the survivors (by mean) after each round
+     - the race ends when one candidate remains, all survivors have used
+     max_iterations, or every survivor's half-width is within tolerance / 2
+
+    The race runs on a spawned copy of the manager, which is left unchanged.
+    Racing batches are not archived by the manager's trace_recorder; run the
+    chosen scenario with monte_carlo_capacity_scenario to record its traces.
+
+    Error tolerance: intervals are Bonferroni-adjusted over all candidates and
+    rounds, so with probability at least `confidence` (under the normal
+    approximation of the mean) the best surviving candidate has a true mean
+    within `tolerance` of the best candidate. Candidates dropped by successive
+    halving carry no such guarantee.
+    """
+    manager: ScenarioManager
+    capacity_cap: float
+    metric: str = 'annual_dispatch_cost'
+    batch_iterations: int = 10
+    max_iterations: int = 200
+    confidence: float = 0.95
+    tolerance: float = 0.0
+    halving_fraction: float = None
+    candidates: List[RaceCandidate] = None
+    _run: ScenarioManager = None
+
+    def __post_init__(self):
+        Validator.confidence_level(self.confidence)
+        Validator.batch_size(self.batch_iterations, self.max_iterations)
+        Validator.halving_fraction(self.halving_fraction)
+
+    @property
+    def max_rounds(self) -> int:
+        return int(np.ceil(self.max_iterations / self.batch_iterations))
+
+    @property
+    def alive(self) -> List[RaceCandidate]:
+        return list([c for c in self.candidates if c.alive])
+
+    @property
+    def alpha(self) -> float:
+        return (1 - self.confidence) / (len(self.candidates) * self.max_rounds)
+
+    def _base_capacities(self) -> Dict[str, float]:
+        return {
+            asset.name: asset.nameplate_capacity
+            for asset in self._run.portfolio.all_assets_list
+        }
+
+    def _run_batch(self, candidate: RaceCandidate, base_capacities: dict):
+        # Start from the base portfolio so capping applied to one candidate
+        # does not leak into the next. The dispatch memo is kept across
+        # batches, so each candidate's later batches reuse its earlier ones
+        iterations = min(
+            self.batch_iterations,
+            self.max_iterations - candidate.iterations
+        )
+        self._run.update_capacities(
+            {**base_capacities, **candidate.nominal_capacities},
+            cap_capacities=True,
+            clear_memo=False
+        )
+        self._run.monte_carlo(iterations)
+        candidate.log = pd.concat(
+            [candidate.log, self._run.monte_carlo_logger.log],
+            ignore_index=True
+        )
+
+    def _eliminate(self, round_n: int):
+        alive = self.alive
+        bounds = pd.DataFrame({
+            'mean': [c.mean(self.metric) for c in alive],
+            'half_width': [c.half_width(self.metric, self.alpha) for c in alive],
+        })
+        upper = bounds['mean'] + bounds['half_width']
+        lower = bounds['mean'] - bounds['half_width']
+        leader = upper.idxmin()
+        for i, candidate in enumerate(alive):
+            if i != leader and lower[i] > upper[leader] - self.tolerance:
+                candidate.eliminated_round = round_n
+        if self.halving_fraction:
+            survivors = list([i for i, c in enumerate(alive) if c.alive])
+            keep = max(1, int(np.ceil(self.halving_fraction * len(survivors))))
+            ranked = bounds.loc[survivors, 'mean'].sort_values()
+            for i in ranked.index[keep:]:
+                alive[i].eliminated_round = round_n
+
+    def _finished(self) -> bool:
+        alive = self.alive
+        if len(alive) <= 1:
+            return True
+        if all([c.iterations >= self.max_iterations for c in alive]):
+            return True
+        return self.tolerance > 0 and all([
+            c.half_width(self.metric, self.alpha) <= self.tolerance / 2
+            for c in alive
+        ])
+
+    def run(self, candidates: Dict[str, dict]) -> pd.DataFrame:
+        """ Race candidate capacity scenarios (name -> nominal capacities) and
+        return the final ranking
+        """
+        self.candidates = list([
+            RaceCandidate(name, capacities)
+            for name, capacities in candidates.items()
+        ])
+        self._run = self.manager.spawn()
+        self._run.trace_recorder = None
+        self._run.portfolio.nominal_capacity_cap = self.capacity_cap
+        base_capacities = self._base_capacities()
+        for round_n in range(1, self.max_rounds + 1):
+            for candidate in self.alive:
+                self._run_batch(candidate, base_capacities)
+            self._eliminate(round_n)
+            if self._finished():
+                break
+        return self.ranking()
+
+    def ranking(self) -> pd.DataFrame:
+        ranking = pd.DataFrame([
+            {
+                'scenario_name': c.name,
+                'mean': c.mean(self.metric),
+                'ci_half_width': c.half_width(self.metric, self.alpha),
+                'iterations': c.iterations,
+                'eliminated_round': c.eliminated_round,
+            }
+            for c in self.candidates
+        ])
+        ranking['survivor'] = ranking['eliminated_round'].isna()
+        ranking = ranking.sort_values(
+            ['survivor', 'mean'],
+            ascending=[False, True],
+            ignore_index=True
+        )
+        ranking['rank'] = ranking.index + 1
+        return ranking.set_index('scenario_name')
@@ -1,16 +1,65 @@
+from __future__ import annotations
+
+import copy
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Tuple, Dict, Optional
+
+import pandas as pd
 
 from portfolio.portfolio.constraints import CapacityConstraints
+from portfolio.portfolio.dispatch_memo import DispatchMemo
+from portfolio.portfolio.dispatch_store import DispatchStore
+from portfolio.portfolio.results_logging.dispatch_metrics import DispatchMetrics
 from portfolio.portfolio.results_logging.plotting import StackPlotConfig
-from portfolio.portfolio.results_logging.results_logging import MonteCarloLog, ScenarioLogger
+from portfolio.portfolio.results_logging.trace_archive import DispatchTraceRecorder
+from portfolio.portfolio.results_logging.results_logging import (
+    MonteCarloLog,
+    ScenarioLogger,
+    ConvergenceCriteria,
+    ConvergenceStatus,
+    cost_total_metrics,
+)
 from portfolio.resources.annual_curves import StochasticAnnualCurve
 from portfolio.resources.commodities import Markets
 from portfolio.resources.passive_generators import PassiveResources
+from portfolio.statistics.stochastics import thread_random_state, combined_draw_key, refresh_graph
+from portfolio.utils.profiling import span
+from portfolio.utils.progress import ProgressReporter
 
 from portfolio.portfolio.asset_groups import RankOnOptimiser, AssetGroups
 
 
+@dataclass(frozen=True)
+class CapacityScenario:
+    """ Immutable specification of a capacity scenario. Nominal capacities are
+    stored as sorted (name, capacity) pairs so scenarios are hashable
+    """
+    scenario_name: str
+    nominal_capacities: Tuple[Tuple[str, float], ...]
+    capacity_cap: float
+
+    def __post_init__(self):
+        if isinstance(self.nominal_capacities, dict):
+            object.__setattr__(
+                self,
+                'nominal_capacities',
+                tuple(sorted(self.nominal_capacities.items()))
+            )
+
+    @property
+    def capacities(self) -> Dict[str, float]:
+        return dict(self.nominal_capacities)
+
+
+# Covered by ScenarioManager.refresh_stochastic_resources in refresh_all
+_graph_refreshes = (
+    'refresh_all',
+    'refresh_constraints',
+    'refresh_demand',
+    'refresh_passive_generation_resource',
+)
+
+
 @dataclass
 class ScenarioManager:
     """
@@ -21,6 +70,20 @@ class ScenarioManager:
      - methods with the "update" prefix change static parameters and hence
      instantiate a new scenario
      - methods with the "refresh" prefix generate new samples of stochastic data
+     - run_scenario treats this manager as a read-only template and runs each
+     scenario on its own copy, so many scenarios may run concurrently in threads
+     - an optional trace_recorder archives the hourly dispatch of selected
+     iterations (one file per capacity scenario)
+     - with log_dispatch_metrics, reliability metrics (unserved energy,
+     loss-of-load hours, curtailment, ...) and per-asset capacity factors and
+     costs are logged with each iteration's cost totals
+     - an optional progress reporter publishes iterations, throughput, ETA and
+     running statistics during monte_carlo
+     - with a dispatch_memo, iterations repeating an earlier draw of demand,
+     passive resources and constraints reuse its physical dispatch, with
+     costs re-priced at the iteration's prices (see DispatchMemo)
+     - with a dispatch_store, physical dispatch is also reused across runs
+     and scenarios from disk (see DispatchStore)
     """
     year: int
     demand: StochasticAnnualCurve
@@ -31,6 +94,11 @@ class ScenarioManager:
     constraints: CapacityConstraints
     scenario_summary: dict = None
     scenario_logger: ScenarioLogger = None
+    trace_recorder: DispatchTraceRecorder = None
+    log_dispatch_metrics: bool = False
+    progress: ProgressReporter = None
+    dispatch_memo: DispatchMemo = None
+    dispatch_store: DispatchStore = None
 
     def __post_init__(self):
         self.monte_carlo_logger = MonteCarloLog(self.portfolio.asset_capacities())
@@ -44,40 +112,150 @@ class ScenarioManager:
     def refresh_passive_generation_resource(self):
         self.passive_resource.refresh()
 
+    def refresh_stochastic_resources(self):
+        """ Refresh demand, passive resources and constraints as one graph,
+        so a curve shared between them is sampled once (see refresh_graph)
+        """
+        refresh_graph([self.demand, self.passive_resource, self.constraints])
+
     def refresh_markets(self, reoptimise=True):
         self.markets.refresh()
         if reoptimise:
             self.portfolio.optimise_groups()
 
     def refresh_all(self):
+        """ Run every refresh method, with demand, passive resources and
+        constraints refreshed together by refresh_stochastic_resources
+        """
         for method in dir(self):
-            if method.startswith('refresh_') and method != 'refresh_all':
+            if method.startswith('refresh_') and method not in _graph_refreshes:
                 refresh = getattr(self, method)
-                refresh()
+                with span(f'ScenarioManager.{method}'):
+                    refresh()
 
     def clear_dispatch_log(self):
         self.portfolio.dispatch_logger.clear_log()
 
-    def update_capacities(self, nominal_capacities: dict, cap_capacities: bool):
+    def update_capacities(
+            self,
+            nominal_capacities: dict,
+            cap_capacities: bool,
+            clear_memo: bool = True
+    ):
+        """ Memo keys hold the capacities, so with clear_memo=False the memo
+        is kept for capacities that will be dispatched again (e.g. racing
+        batches)
+        """
         self.portfolio.update_capacities(nominal_capacities, cap_capacities)
         self.monte_carlo_logger.scenario = self.portfolio.asset_capacities()
+        self.monte_carlo_logger.clear_log()
+        if self.dispatch_memo and clear_memo:
+            self.dispatch_memo.clear()
 
-    def monte_carlo(
-        self,
-        iterations: int = 100,
-        plot_config: StackPlotConfig = None
+    def draw_key(self) -> Optional[tuple]:
+        """ Identifies the current draws of demand, passive resources and
+        constraints, or None if any cannot be identified
+        """
+        return combined_draw_key([self.demand, self.passive_resource, self.constraints])
 
-    ):
-        for simulation in range(iterations + 1):
-            self.refresh_all()
-            self.portfolio.dispatch(
+    def hourly_dispatch_required(self, plot_config: StackPlotConfig = None) -> bool:
+        """ Whether the hourly dispatch log is used beyond costs (metrics,
+        traces or plots), so reused dispatch must include it
+        """
+        return bool(
+            self.log_dispatch_metrics
+            or self.trace_recorder
+            or (plot_config and plot_config.plot)
+        )
+
+    def dispatch(self, plot_config: StackPlotConfig = None):
+        """ Dispatch the portfolio against the current draws. Physical
+        dispatch is reused, and re-priced, from the dispatch_memo and then
+        the dispatch_store, if set, before dispatching
+        """
+        hourly = self.hourly_dispatch_required(plot_config)
+        draw_key = self.draw_key() if self.dispatch_memo or self.dispatch_store else None
+        memo_key = None
+        if self.dispatch_memo:
+            memo_key = self.dispatch_memo.key(draw_key, self.portfolio)
+        physical = None
+        if memo_key is not None:
+            physical = self.dispatch_memo.get(memo_key)
+        store_key = None
+        if physical is None and self.dispatch_store:
+            store_key = self.dispatch_store.key(self.demand.data, draw_key, self.portfolio)
+            physical = self.dispatch_store.get(store_key, self.demand.data, hourly)
+            if physical is not None and memo_key is not None:
+                self.dispatch_memo.put(memo_key, physical)
+        if physical is not None:
+            self.portfolio.replay_dispatch(
                 self.demand.data,
+                physical,
                 plot_config=plot_config
             )
-            self.monte_carlo_logger.log_simulation(
-                self.portfolio.dispatch_logger.annual_cost_totals(),
+            return
+        self.portfolio.dispatch(
+            self.demand.data,
+            plot_config=plot_config
+        )
+        if memo_key is not None:
+            self.dispatch_memo.put(memo_key, self.portfolio.physical_dispatch(hourly))
+        if store_key is not None:
+            self.dispatch_store.put(
+                store_key,
+                self.portfolio.physical_dispatch(self.dispatch_store.hourly)
+            )
+
+    def monte_carlo(
+        self,
+        iterations: int = 100,
+        plot_config: StackPlotConfig = None,
+        convergence: ConvergenceCriteria = None
+    ) -> ConvergenceStatus:
+        """ Run Monte Carlo iterations for the current scenario.
+         - with convergence criteria, iterations is ignored and the run stops
+         once the criteria are met or max_iterations is reached
+        """
+        status = None
+        metrics = DispatchMetrics({
+            asset.name: asset.nameplate_capacity
+            for asset in self.portfolio.all_assets_list
+        }) if self.log_dispatch_metrics else None
+        if convergence:
+            iterations = convergence.max_iterations
+            convergence.check_targets(
+                cost_total_metrics + (metrics.columns if metrics else [])
             )
+        if self.progress:
+            self.progress.start(iterations)
+        for simulation in range(iterations):
+            self.refresh_all()
+            self.dispatch(plot_config)
+            cost_totals = self.portfolio.dispatch_logger.annual_cost_totals()
+            if metrics:
+                cost_totals = pd.concat([
+                    cost_totals,
+                    metrics.compute(self.portfolio.dispatch_logger)
+                ])
+            self.monte_carlo_logger.log_simulation(cost_totals)
+            if self.trace_recorder:
+                self.trace_recorder.offer(
+                    simulation,
+                    self.portfolio.dispatch_logger,
+                    cost_totals
+                )
             self.clear_dispatch_log()
+            if self.progress:
+                self.progress.update(self.monte_carlo_logger)
+            if convergence and convergence.due(simulation + 1):
+                status = self.monte_carlo_logger.convergence_status(convergence)
+                if status.converged:
+                    break
+        if convergence and not (status and status.converged):
+            status = self.monte_carlo_logger.convergence_status(convergence)
+        if self.progress:
+            self.progress.finish(self.monte_carlo_logger)
+        return status
 
     def monte_carlo_capacity_scenario(
             self,
@@ -86,16 +264,75 @@ class ScenarioManager:
             capacity_cap: float,
             iterations: int = 100,
             log_stats: Tuple[str] = ('mean', 'std'),
-            plot_config: StackPlotConfig = None
+            plot_config: StackPlotConfig = None,
+            convergence: ConvergenceCriteria = None
     ):
+        """ With convergence criteria, the achieved precision ('count' and
+        'ci_half_width') is logged alongside log_stats
+        """
         self.portfolio.nominal_capacity_cap = capacity_cap
-        self.scenario_logger = ScenarioLogger()
+        if not self.scenario_logger:
+            self.scenario_logger = ScenarioLogger()
         self.scenario_summary = nominal_capacities
         self.update_capacities(nominal_capacities, cap_capacities=True)
+        if self.trace_recorder:
+            self.trace_recorder.start(scenario_name)
+        if self.progress:
+            self.progress.set_scenario(scenario_name)
         self.monte_carlo(
             iterations,
-            plot_config=plot_config
+            plot_config=plot_config,
+            convergence=convergence
         )
+        if self.trace_recorder:
+            self.trace_recorder.close()
+        if convergence:
+            log_stats = tuple(log_stats) + tuple(
+                stat for stat in ('count', 'ci_half_width')
+                if stat not in log_stats
+            )
         self.scenario_logger.log_scenario(
-            self.monte_carlo_logger.aggregated_statistics(scenario_name, log_stats),
-        )
\ No newline at end of file
+            self.monte_carlo_logger.aggregated_statistics(
+                scenario_name,
+                log_stats,
+                convergence.confidence if convergence else None
+            ),
+            self.monte_carlo_logger.log if self.monte_carlo_logger.retain_log else None,
+        )
+
+    def spawn(self) -> ScenarioManager:
+        """ Independent copy holding all mutable run state (capacities, prices,
+        storage state, stochastic samples). Shared references within the
+        manager (e.g. a fuel used by several generators) are preserved
+        """
+        run = copy.deepcopy(self)
+        run.scenario_logger = None
+        run.progress = None
+        run.portfolio.dispatch_logger = None
+        return run
+
+    def run_scenario(
+            self,
+            scenario: CapacityScenario,
+            iterations: int = 100,
+            log_stats: Tuple[str] = ('mean', 'std'),
+            convergence: ConvergenceCriteria = None,
+            seed: int = None
+    ) -> pd.DataFrame:
+        """ Run a capacity scenario on a spawned copy without mutating this
+        manager, drawing from a per-thread random state (seeded from OS entropy
+        if seed is None). Returns the aggregated scenario statistics
+        """
+        run = self.spawn()
+        with thread_random_state(seed):
+            run.monte_carlo_capacity_scenario(
+                scenario.scenario_name,
+                scenario.capacities,
+                scenario.capacity_cap,
+                iterations=iterations,
+                log_stats=log_stats,
+                convergence=convergence,
+            )
+        results = run.scenario_logger.log
+        results['capacity_cap'] = scenario.capacity_cap
+        return results
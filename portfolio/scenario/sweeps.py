@@ -0,0 +1,203 @@
+import itertools
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Callable, Iterable
+import numpy as np
+import pandas as pd
+
+from portfolio.portfolio.asset_groups import AssetGroups
+from portfolio.portfolio.results_logging.parquet_sink import ParquetResultsSink
+from portfolio.portfolio.results_logging.results_logging import ConvergenceCriteria
+from portfolio.scenario.scenarios import ScenarioManager, CapacityScenario
+from portfolio.utils import profiling
+from portfolio.utils.profiling import Profiler
+from portfolio.utils.progress import ProgressReporter
+
+supported_executors = ['process', 'thread']
+
+
+class Validator:
+    @staticmethod
+    def options(value, options, attr_name):
+        if value not in options:
+            raise ValueError(f'Invalid choice: {attr_name} must be one of the following: {", ".join(options)}')
+
+
+def capacity_grid(
+        capacity_options: Dict[str, Iterable[float]],
+        capacity_caps: Iterable[float],
+) -> List[CapacityScenario]:
+    """ Full factorial grid over candidate capacities of each asset and
+    capacity caps
+    """
+    names = list(capacity_options)
+    points = []
+    for cap in capacity_caps:
+        for capacities in itertools.product(*capacity_options.values()):
+            nominal_capacities = dict(zip(names, capacities))
+            scenario_name = '_'.join(
+                [f'{k}={v}' for k, v in nominal_capacities.items()] + [f'cap={cap}']
+            )
+            points.append(CapacityScenario(scenario_name, nominal_capacities, cap))
+    return points
+
+
+def cap_scenarios(
+        portfolio: AssetGroups,
+        scenarios: List[CapacityScenario],
+) -> List[CapacityScenario]:
+    """ Scenarios with nominal capacities of all assets capped against their
+    capacity caps in one batch, as each run would cap them. Grid points that
+    cap to the same portfolio can then be found before running any
+    """
+    arrays = portfolio.arrays
+    capped = arrays.cap_batch(
+        arrays.capacity_matrix([scenario.capacities for scenario in scenarios]),
+        [scenario.capacity_cap for scenario in scenarios]
+    )
+    return list([
+        CapacityScenario(
+            scenario.scenario_name,
+            dict(zip(arrays.names, capacities)),
+            scenario.capacity_cap
+        )
+        for scenario, capacities in zip(scenarios, capped.tolist())
+    ])
+
+
+# Each worker process holds its own template manager, set by the pool
+# initializer so the manager is pickled once per worker rather than per task
+_worker_manager: ScenarioManager = None
+
+
+def _init_worker(manager: ScenarioManager, profile: bool = False):
+    global _worker_manager
+    _worker_manager = manager
+    if profile:
+        profiling.enable()
+
+
+def _run_in_worker(
+        scenario: CapacityScenario,
+        iterations: int,
+        log_stats: Tuple[str],
+        convergence: ConvergenceCriteria,
+        seed: int,
+) -> Tuple[pd.DataFrame, Profiler]:
+    """ Returns the scenario results and, if profiling, the spans recorded by
+    the worker for this task
+    """
+    results = _worker_manager.run_scenario(
+        scenario,
+        iterations,
+        log_stats,
+        convergence,
+        seed
+    )
+    return results, profiling.collect()
+
+
+@dataclass
+class CapacitySweep:
+    """ Runs many capacity scenarios concurrently in a worker pool.
+     - executor 'process' pickles the manager once into each worker process;
+     'thread' shares the manager between threads without pickling, which is
+     cheapest where the NumPy dispatch releases the GIL
+     - every scenario runs on its own copy of the manager (see
+     ScenarioManager.run_scenario), starting from the manager's capacities
+     - results are passed to an optional callback as scenarios complete, and
+     consolidated into one table (self.results)
+     - with a sink, results are appended to a partitioned Parquet dataset as
+     they complete; with retain_results=False they are not kept in memory
+     - with a seed, each scenario's random stream is reproducible regardless
+     of which worker runs it
+     - with profile=True, profiling spans from all workers are merged into
+     self.profiler
+     - an optional progress reporter publishes scenarios completed, rate and
+     ETA as scenarios complete
+    """
+    manager: ScenarioManager
+    iterations: int = 100
+    log_stats: Tuple[str] = ('mean', 'std')
+    convergence: ConvergenceCriteria = None
+    max_workers: int = None
+    seed: int = None
+    executor: str = 'process'
+    sink: ParquetResultsSink = None
+    retain_results: bool = True
+    profile: bool = False
+    progress: ProgressReporter = None
+    results: pd.DataFrame = None
+    profiler: Profiler = None
+
+    def __post_init__(self):
+        Validator.options(self.executor, supported_executors, 'executor')
+
+    def _seeds(self, n: int) -> List[int]:
+        if self.seed is None:
+            return [None] * n
+        return list([
+            int(s.generate_state(1)[0])
+            for s in np.random.SeedSequence(self.seed).spawn(n)
+        ])
+
+    def _run_in_thread(self, *args) -> Tuple[pd.DataFrame, Profiler]:
+        return self.manager.run_scenario(*args), None
+
+    def _pool(self):
+        if self.executor == 'thread':
+            return ThreadPoolExecutor(max_workers=self.max_workers), self._run_in_thread
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            # spawn drops run-local state such as the progress reporter,
+            # whose publishers need not be picklable
+            initargs=(self.manager.spawn(), self.profile)
+        ), _run_in_worker
+
+    def run(
+            self,
+            scenarios: List[CapacityScenario],
+            callback: Callable[[CapacityScenario, pd.DataFrame], None] = None
+    ) -> pd.DataFrame:
+        results = []
+        pool, run_scenario = self._pool()
+        if self.profile:
+            self.profiler = Profiler()
+        # Threads record into the process-wide profiler; processes return
+        # their spans with each result
+        profiled_threads = profiling.profiling(profiler=self.profiler) \
+            if self.profile and self.executor == 'thread' else nullcontext()
+        if self.progress:
+            self.progress.start_sweep(len(scenarios))
+        with profiled_threads, pool as executor:
+            futures = {
+                executor.submit(
+                    run_scenario,
+                    scenario,
+                    self.iterations,
+                    self.log_stats,
+                    self.convergence,
+                    seed
+                ): scenario
+                for scenario, seed in zip(scenarios, self._seeds(len(scenarios)))
+            }
+            for future in as_completed(futures):
+                scenario_results, worker_profiler = future.result()
+                if self.profile and worker_profiler:
+                    self.profiler.merge(worker_profiler)
+                if self.sink:
+                    self.sink.write_scenario(scenario_results)
+                if self.retain_results:
+                    results.append(scenario_results)
+                if self.progress:
+                    self.progress.scenario_completed(futures[future].scenario_name)
+                if callback:
+                    callback(futures[future], scenario_results)
+        if self.progress:
+            self.progress.finish_sweep()
+        if self.sink:
+            self.sink.flush()
+        self.results = pd.concat(results, ignore_index=True) if results else None
+        return self.results
@@ -0,0 +1,216 @@
+import copy
+import threading
+from contextlib import contextmanager
+import numpy as np
+from dataclasses import dataclass, field
+from abc import ABC, abstractmethod
+
+from portfolio.utils.lazy_imports import lazy_import
+
+stats = lazy_import('scipy.stats')
+qmc = lazy_import('scipy.stats.qmc')
+
+_thread_random = threading.local()
+
+
+def random_state():
+    """ Random state used by the stochastic models in the current thread: a
+    per-thread RandomState inside thread_random_state(), otherwise NumPy's
+    global random state
+    """
+    return getattr(_thread_random, 'state', None) or np.random
+
+
+@contextmanager
+def thread_random_state(seed: int = None):
+    """ Give the current thread its own RandomState (seeded from OS entropy if
+    seed is None) so concurrent runs neither share nor contend for the global
+    random state
+    """
+    previous = getattr(_thread_random, 'state', None)
+    _thread_random.state = np.random.RandomState(seed)
+    try:
+        yield _thread_random.state
+    finally:
+        _thread_random.state = previous
+
+
+@dataclass
+class Validator:
+    @staticmethod
+    def power_of_two(value, attr_name):
+        if value < 1 or value & (value - 1):
+            raise ValueError(f'Invalid value ({value}): {attr_name} must be a power of 2')
+
+    @staticmethod
+    def positive_integer(value, attr_name):
+        if value < 1:
+            raise ValueError(f'Invalid value ({value}): {attr_name} must be a positive integer')
+
+
+@dataclass
+class UniformSampler(ABC):
+    """ Source of uniform variates on [0, 1) consumed by stochastic models.
+
+    Successive calls continue the same sequence, so a sampler attached to a
+    stochastic model spreads its draws evenly over the iterations of a
+    Monte Carlo run rather than over a single call.
+     - with a seed, the sequence is fixed, and copies (e.g. in spawned runs)
+     replay it from where it was copied
+     - without one, the generator is seeded from random_state() on first use,
+     and copies start afresh, so spawned runs draw independently (and
+     reproducibly within a seeded thread_random_state)
+    """
+    seed: int = None
+
+    def __post_init__(self):
+        self._rng = None
+
+    def __deepcopy__(self, memo):
+        copied = copy.copy(self)
+        memo[id(self)] = copied
+        copied.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        if self.seed is None:
+            copied._reseed()
+        return copied
+
+    def _reseed(self):
+        self._rng = None
+
+    def _generator(self) -> np.random.Generator:
+        if self._rng is None:
+            seed = self.seed if self.seed is not None \
+                else random_state().randint(2 ** 32, dtype=np.uint64)
+            self._rng = np.random.default_rng(seed)
+        return self._rng
+
+    @abstractmethod
+    def uniform(self, dimensions: int, number_samples: int = 1) -> np.ndarray:
+        """ Returns array of shape (number_samples, dimensions)
+        """
+        pass
+
+    def choice_indices(self, number_choices: int, number_samples: int = 1) -> np.ndarray:
+        """ Maps uniform variates to integer indices in [0, number_choices)
+        """
+        u = self.uniform(1, number_samples)[:, 0]
+        return np.minimum(
+            (u * number_choices).astype(int),
+            number_choices - 1
+        )
+
+    def standard_normal(self, dimensions: int, number_samples: int = 1) -> np.ndarray:
+        """ Returns array of shape (dimensions, number_samples) by inverse
+        transform of uniform variates
+        """
+        eps = np.finfo(float).eps
+        u = np.clip(self.uniform(dimensions, number_samples), eps, 1 - eps)
+        return stats.norm.ppf(u).T
+
+
+@dataclass
+class PseudoRandomSampler(UniformSampler):
+    """ Plain pseudo-random sampling with an independent, seedable generator
+    """
+    def uniform(self, dimensions: int, number_samples: int = 1) -> np.ndarray:
+        return self._generator().random((number_samples, dimensions))
+
+
+@dataclass
+class BufferedSampler(UniformSampler):
+    """ Sampler which generates points in blocks of batch_size and hands them out
+    sequentially. Stratification (and low discrepancy) holds over each block,
+    so batch_size should be of the order of the number of iterations. A
+    sampler shared by models of different dimensions keeps a block (and
+    position) per dimension, so each model's draws stay stratified
+    """
+    batch_size: int = 256
+    _buffers: dict = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        Validator.positive_integer(self.batch_size, 'batch_size')
+
+    def _reseed(self):
+        super()._reseed()
+        self._buffers = {}
+
+    @abstractmethod
+    def _draw_batch(self, dimensions: int) -> np.ndarray:
+        pass
+
+    def uniform(self, dimensions: int, number_samples: int = 1) -> np.ndarray:
+        buffer, position = self._buffers.get(dimensions, (None, 0))
+        samples = []
+        remaining = number_samples
+        while remaining > 0:
+            if buffer is None or position >= len(buffer):
+                buffer, position = self._draw_batch(dimensions), 0
+            take = min(remaining, len(buffer) - position)
+            samples.append(buffer[position: position + take])
+            position += take
+            remaining -= take
+        self._buffers[dimensions] = (buffer, position)
+        return np.concatenate(samples)
+
+
+@dataclass
+class SobolSampler(BufferedSampler):
+    """ Scrambled Sobol' sequence. batch_size must be a power of 2 to retain the
+    balance properties of the sequence. Each block is drawn from a freshly
+    scrambled engine, so consecutive blocks are independent randomised QMC
+    replicates
+    """
+    scramble: bool = True
+
+    def __post_init__(self):
+        super().__post_init__()
+        Validator.power_of_two(self.batch_size, 'batch_size')
+
+    def _draw_batch(self, dimensions: int) -> np.ndarray:
+        engine = qmc.Sobol(
+            d=dimensions,
+            scramble=self.scramble,
+            seed=self._generator()
+        )
+        return engine.random_base2(int(np.log2(self.batch_size)))
+
+
+@dataclass
+class LatinHypercubeSampler(BufferedSampler):
+    """ Latin hypercube design: each block of batch_size points places exactly one
+    point in each of batch_size equal strata of every dimension
+    """
+    def _draw_batch(self, dimensions: int) -> np.ndarray:
+        return qmc.LatinHypercube(
+            d=dimensions,
+            seed=self._generator()
+        ).random(self.batch_size)
+
+
+@dataclass
+class StratifiedChoiceSampler(BufferedSampler):
+    """ Stratified allocation over a small set of discrete choices (e.g. sample
+    years): for n choices, each consecutive run of n draws visits every choice
+    once, in random order. Use with the choice models, where the uniform variates
+    map onto choice indices
+    """
+    number_choices: int = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.number_choices is not None:
+            Validator.positive_integer(self.number_choices, 'number_choices')
+
+    def _draw_batch(self, dimensions: int) -> np.ndarray:
+        n = self.number_choices or self.batch_size
+        strata = np.column_stack([
+            self._generator().permutation(n) for _ in range(dimensions)
+        ])
+        return (strata + self._generator().random((n, dimensions))) / n
+
+    def choice_indices(self, number_choices: int, number_samples: int = 1) -> np.ndarray:
+        if self.number_choices != number_choices:
+            self.number_choices = number_choices
+            self._buffers = {}
+        return super().choice_indices(number_choices, number_samples)
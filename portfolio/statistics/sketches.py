@@ -0,0 +1,161 @@
+import re
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+quantile_label_pattern = re.compile(r'^p(\d+(\.\d+)?)$')
+
+
+class Validator:
+    @staticmethod
+    def quantile(value: float):
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f'Invalid quantile ({value}): must be between 0.0 and 1.0')
+
+    @staticmethod
+    def sketch_size(value: int):
+        if value < 8:
+            raise ValueError(f'Invalid sketch size ({value}): k must be at least 8')
+
+
+def quantile_from_label(label: str):
+    """ Parses statistic labels such as 'p5', 'p50' or 'p99.9' into quantiles
+    (0.05, 0.5, 0.999). Returns None for other labels
+    """
+    match = quantile_label_pattern.match(label)
+    if match is None:
+        return None
+    q = float(match.group(1)) / 100
+    Validator.quantile(q)
+    return q
+
+
+@dataclass
+class RunningMoments:
+    """ Welford's streaming count, mean and variance, plus min and max.
+    NaN values are ignored, like the pandas reductions they replace
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = np.inf
+    max: float = -np.inf
+
+    def update(self, value: float):
+        if np.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """ Chan et al. pairwise combination
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def var(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.var)
+
+
+@dataclass
+class KLLSketch:
+    """ KLL quantile sketch (Karnin, Lang & Liberty, 2016).
+     - memory is O(k) regardless of the number of values; quantiles are
+     exact until about k values have been seen, after which rank error is
+     roughly 1.7 / k
+     - sketches of the same k can be merged, e.g. across parallel workers
+     - compaction uses its own generator, so it does not consume draws from
+     the simulation's random stream
+    """
+    k: int = 200
+    c: float = 2 / 3
+    seed: int = None
+
+    def __post_init__(self):
+        Validator.sketch_size(self.k)
+        self._rng = np.random.default_rng(self.seed)
+        self.compactors: List[List[float]] = [[]]
+        self.count = 0
+
+    @property
+    def size(self) -> int:
+        return sum([len(compactor) for compactor in self.compactors])
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(np.ceil(self.k * self.c ** depth)), 2)
+
+    @property
+    def _max_size(self) -> int:
+        return sum([self._capacity(level) for level in range(len(self.compactors))])
+
+    def _compact(self, level: int):
+        if level + 1 == len(self.compactors):
+            self.compactors.append([])
+        items = sorted(self.compactors[level])
+        leftover = [items.pop()] if len(items) % 2 else []
+        offset = int(self._rng.integers(2))
+        self.compactors[level + 1].extend(items[offset::2])
+        self.compactors[level] = leftover
+
+    def _compress(self):
+        while self.size >= self._max_size:
+            for level in range(len(self.compactors)):
+                if len(self.compactors[level]) >= self._capacity(level):
+                    self._compact(level)
+                    break
+
+    def update(self, value: float):
+        if np.isnan(value):
+            return
+        self.compactors[0].append(value)
+        self.count += 1
+        self._compress()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+        self.count += other.count
+        self._compress()
+
+    def quantiles(self, qs: List[float]) -> np.ndarray:
+        """ Values at quantiles qs, each an item held by the sketch
+        """
+        for q in qs:
+            Validator.quantile(q)
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        values = np.concatenate([np.asarray(c, dtype=float) for c in self.compactors])
+        weights = np.concatenate([
+            np.full(len(c), 2.0 ** level) for level, c in enumerate(self.compactors)
+        ])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        ranks = np.asarray(qs) * cumulative[-1]
+        positions = np.minimum(
+            np.searchsorted(cumulative, ranks, side='left'),
+            len(values) - 1
+        )
+        return values[order][positions]
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
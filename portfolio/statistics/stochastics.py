@@ -1,11 +1,16 @@
+from __future__ import annotations
+
 import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from typing import Type, List, Dict
-from scipy.stats import norm
-from scipy.linalg import cholesky
+from typing import Type, List, Dict, Iterable, Optional
 from abc import ABC, abstractmethod
 
+from portfolio.statistics.sampling import UniformSampler, random_state, thread_random_state
+from portfolio.utils.lazy_imports import lazy_import
+
+linalg = lazy_import('scipy.linalg')
+
 supported_distributions = ['normal']
 supported_correlation_distributions = ['normal', 'lognormal']
 
@@ -45,7 +50,7 @@ class DistributionModel(ABC):
 class NormalDistribution(DistributionModel):
     @staticmethod
     def generate_samples(mean, std_dev, n):
-        samples = np.random.normal(
+        samples = random_state().normal(
             mean,
             std_dev,
             n
@@ -57,6 +62,10 @@ class NormalDistribution(DistributionModel):
 
 
 class StochasticModel(ABC):
+    # Indices behind the latest samples, for models drawing from a finite set
+    # of choices (see StochasticResource.draw_key); None otherwise
+    last_draw: tuple = None
+
     @abstractmethod
     def generate_samples(self, number_samples=1):
         pass
@@ -65,30 +74,53 @@ class StochasticModel(ABC):
 @dataclass
 class RandomWindowChoiceModel(StochasticModel):
     data: np.ndarray
+    sampler: UniformSampler = None
 
     @property
     def last_idx(self):
         return len(self.data) - 1
 
     def generate_samples(self, number_samples=1):
-        start_index = np.random.randint(
-            0,
-            self.last_idx - number_samples
-        )
+        if self.sampler:
+            start_index = self.sampler.choice_indices(
+                self.last_idx - number_samples
+            )[0]
+        else:
+            start_index = random_state().randint(
+                0,
+                self.last_idx - number_samples
+            )
         end_index = start_index + number_samples
+        self.last_draw = (int(start_index), int(end_index))
         return self.data[start_index: end_index]
 
 
+def choice_indices(
+        number_choices: int,
+        number_samples: int,
+        sampler: UniformSampler = None
+) -> np.ndarray:
+    if sampler:
+        return sampler.choice_indices(number_choices, number_samples)
+    return random_state().randint(
+        0,
+        number_choices,
+        size=number_samples
+    )
+
+
 @dataclass
 class RandomArrayChoiceModel(StochasticModel):
     data: List[list]
+    sampler: UniformSampler = None
 
     def generate_samples(self, number_samples=1) -> np.ndarray:
-        random_idx = np.random.randint(
-            0,
+        random_idx = choice_indices(
             len(self.data),
-            size=number_samples
+            number_samples,
+            self.sampler
         )
+        self.last_draw = tuple([int(idx) for idx in random_idx])
         samples = []
         for idx in random_idx:
             samples.append(self.data[idx])
@@ -101,13 +133,22 @@ class RandomArrayChoiceModel(StochasticModel):
 @dataclass
 class ComplementaryRandomArrayChoiceModel(StochasticModel):
     data: Dict[str, List[list]]
+    sampler: UniformSampler = None
+
+    @property
+    def number_choices(self) -> int:
+        """ Number of sample arrays (e.g. years) per name; one index is drawn
+        for all names so that they stay complementary
+        """
+        return len(next(iter(self.data.values())))
 
     def generate_samples(self, number_samples=1) -> Dict[str, np.ndarray]:
-        random_idx = np.random.randint(
-            0,
-            len(self.data),
-            size=number_samples
+        random_idx = choice_indices(
+            self.number_choices,
+            number_samples,
+            self.sampler
         )
+        self.last_draw = tuple([int(idx) for idx in random_idx])
         sample_dict = {}
         for name, data in self.data.items():
             samples = []
@@ -141,6 +182,7 @@ class CorrelatedDistributionModel(StochasticModel):
     distribution_means: np.ndarray
     distribution_std: np.ndarray
     distribution_type: str
+    sampler: UniformSampler = None
 
     def __post_init__(self):
         validator = Validator()
@@ -167,7 +209,11 @@ class CorrelatedDistributionModel(StochasticModel):
         )
 
     @staticmethod
-    def from_data(data: pd.DataFrame, distribution: str):
+    def from_data(
+            data: pd.DataFrame,
+            distribution: str,
+            sampler: UniformSampler = None
+    ):
         Validator().multivariate_data(data)
         Validator().options(
             distribution,
@@ -184,7 +230,8 @@ class CorrelatedDistributionModel(StochasticModel):
                 covariance_matrix,
                 distribution_means,
                 distribution_std,
-                distribution
+                distribution,
+                sampler
             )
         if distribution == 'lognormal':
             data_logged = np.log(data)
@@ -197,18 +244,23 @@ class CorrelatedDistributionModel(StochasticModel):
                 covariance_matrix,
                 distribution_means,
                 distribution_std,
-                distribution
+                distribution,
+                sampler
             )
 
     def standard_normal_samples(self, number_samples=1):
-        return norm.rvs(
-            scale=1,
+        if self.sampler:
+            return self.sampler.standard_normal(
+                len(self.norm_covariance),
+                number_samples
+            )
+        return random_state().standard_normal(
             size=(len(self.norm_covariance), number_samples),
         )
 
     def correlated_normal_samples(self, number_samples=1):
         normal_sample = self.standard_normal_samples(number_samples)
-        cky_decomp = cholesky(self.norm_covariance)
+        cky_decomp = linalg.cholesky(self.norm_covariance)
         correlated_normal_sample = np.dot(cky_decomp, normal_sample)
         return correlated_normal_sample
 
@@ -243,4 +295,87 @@ class CorrelatedDistributionModel(StochasticModel):
 class StochasticResource(ABC):
     @abstractmethod
     def refresh(self):
-        pass
\ No newline at end of file
+        pass
+
+    @property
+    def shared_sources(self) -> List[StochasticResource]:
+        """ Stochastic sources this resource reads and may share with other
+        resources (e.g. one complementary curve behind wind and solar). An
+        empty list means the resource is its own source
+        """
+        return []
+
+    def read_sources(self):
+        """ Update this resource's view of its shared sources, once they have
+        been refreshed
+        """
+        pass
+
+    @property
+    def components(self) -> List[StochasticResource]:
+        """ Resources a collection refreshes as a graph (see refresh_graph),
+        so that it can join a larger graph. Empty for single resources
+        """
+        return []
+
+    @property
+    def draw_key(self) -> Optional[tuple]:
+        """ Identifies the current sample among a finite set of possible
+        draws (e.g. the index of a historical year), so that identical draws
+        can be recognised. None if the sample cannot be identified
+        """
+        return None
+
+
+def combined_draw_key(resources: Iterable[StochasticResource]) -> Optional[tuple]:
+    """ Draw keys of several resources, or None if any is unidentifiable
+    """
+    keys = tuple([resource.draw_key for resource in resources])
+    if any([key is None for key in keys]):
+        return None
+    return keys
+
+
+def graph_resources(resources: Iterable[StochasticResource]) -> List[StochasticResource]:
+    """ Resources with collections replaced by their components
+    """
+    flat = []
+    for resource in resources:
+        components = resource.components
+        if components:
+            flat += graph_resources(components)
+        else:
+            flat.append(resource)
+    return flat
+
+
+def refresh_graph(resources: Iterable[StochasticResource]):
+    """ Refresh resources so that each shared source is sampled exactly once:
+     - collections are refreshed through their components, so one graph
+     spans e.g. passive resources and constraints sharing a curve
+     - shared sources (by identity) are refreshed first, once each
+     - resources without shared sources are refreshed as usual, unless they
+     are themselves a shared source
+     - resources with shared sources then read their views, so resources
+     sharing a source see the same draw
+    """
+    sources = {}
+    dependants = []
+    independents = []
+    for resource in graph_resources(resources):
+        shared_sources = resource.shared_sources
+        if shared_sources:
+            dependants.append(resource)
+            for source in shared_sources:
+                sources.setdefault(id(source), source)
+        else:
+            independents.append(resource)
+    for source in sources.values():
+        source.refresh()
+    refreshed = set(sources)
+    for resource in independents:
+        if id(resource) not in refreshed:
+            refreshed.add(id(resource))
+            resource.refresh()
+    for resource in dependants:
+        resource.read_sources()
\ No newline at end of file
@@ -1,13 +1,21 @@
+import copy
 import functools
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-import boto3
 import json
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO, BytesIO
 import pandas as pd
 from dataclasses import dataclass
+from typing import List, Optional, Tuple
 import os
 from time import time
-import functools
+
+from portfolio.utils.storage_backends import StorageBackend, S3Backend, LocalBackend
 
 
 class ReaderWriter:
@@ -40,85 +48,320 @@ class CacheStatus:
             return False
 
 
+@dataclass
+class MemoryCache:
+    """ Bounded in-process LRU tier in front of the file cache, holding already
+    parsed values (e.g. DataFrames) keyed by cache key.
+     - least recently used entries are dropped beyond max_entries or max_bytes
+     - entries older than expiration (seconds), if set, are treated as misses
+     - with copy_values, values are copied in and out so callers cannot
+     mutate cached values
+    """
+    max_entries: int = 128
+    max_bytes: int = None
+    expiration: int = None
+    copy_values: bool = True
+    hits: int = 0
+    misses: int = 0
+
+    def __post_init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def size_of(value) -> int:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return int(value.memory_usage(deep=True).sum())
+        return len(json.dumps(value, default=str))
+
+    def _copy(self, value):
+        if not self.copy_values:
+            return value
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy()
+        return copy.deepcopy(value)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def get(self, key: str):
+        """ Returns (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.expiration \
+                    and time() - entry[0] > self.expiration:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[2]
+        return True, self._copy(value)
+
+    def put(self, key: str, value):
+        size = self.size_of(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        value = self._copy(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time(), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries \
+                    or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
 @dataclass
 class CacheManager:
+    """ File cache indexed by a SQLite database in the cache directory.
+     - entries are keyed by a hash of the cached function and its call signature
+     - the index is safe to share between threads and processes
+     - entries older than expiration (seconds) are refreshed on access
+     - if max_bytes is set, least recently used entries are evicted once the
+     total size of cached files exceeds it
+     - an optional MemoryCache serves repeated calls without touching disk,
+     including for dummy managers
+     - files of the former log.json index are removed on first use, as their
+     keys cannot be mapped to the current ones
+     - entries evicted by another process between lookup and read are
+     treated as misses
+    """
     directory: str
     expiration: int
     dummy: bool = False
-    _log_fp: str = None
+    max_bytes: int = None
+    memory_cache: MemoryCache = None
+    _index_fp: str = None
 
     def __post_init__(self):
-        if not os.path.exists(self.directory):
-            os.makedirs(self.directory)
-        self._log_fp = os.path.join(self.directory, 'log.json')
-        if not os.path.exists(self._log_fp):
-            self._overwrite_log({'next_call_ref_n': 0})
-        self._call_record = {}
-        self._file_references = []
-
-    def _retrieve_log(self):
-        with open(self._log_fp, 'r') as f:
-            file = json.load(f)
-        return file
+        if self.dummy:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_fp = os.path.join(self.directory, 'index.sqlite')
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, '
+                'filepath TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'created REAL NOT NULL, '
+                'last_access REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS entries_last_access '
+                'ON entries (last_access)'
+            )
+        self._remove_legacy_log()
 
-    def _overwrite_log(self, obj: dict):
-        with open(self._log_fp, 'w') as f:
-            json.dump(obj, f, indent=2)
+    def _remove_legacy_log(self):
+        # The log.json index mapped call signatures (without function names)
+        # to files named by a counter
+        log_fp = os.path.join(self.directory, 'log.json')
+        try:
+            with open(log_fp, 'r') as f:
+                log = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        directory = os.path.abspath(self.directory)
+        for fp in log.values():
+            if isinstance(fp, str) and os.path.dirname(os.path.abspath(fp)) == directory:
+                try:
+                    os.remove(fp)
+                except FileNotFoundError:
+                    pass
+        try:
+            os.remove(log_fp)
+        except FileNotFoundError:
+            pass
 
-    def _name_file(self):
-        log = self._retrieve_log()
-        name = str(log['next_call_ref_n']).zfill(10)
-        log['next_call_ref_n'] += 1
-        self._overwrite_log(log)
-        return name
-
-    def _exists(self, call_str: str) -> CacheStatus:
-        log = self._retrieve_log()
-        if call_str in log.keys():
-            fp = log[call_str]
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self._index_fp, timeout=60)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def call_key(func_name: str, call_signature: str) -> str:
+        return hashlib.sha256(
+            f'{func_name}({call_signature})'.encode('UTF-8')
+        ).hexdigest()
+
+    def _exists(self, key: str) -> CacheStatus:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT filepath FROM entries WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if row:
+            fp = row[0]
             exists = os.path.exists(fp)
         else:
-            fp = os.path.join(self.directory, self._name_file())
+            fp = os.path.join(self.directory, key)
             exists = False
-        return CacheStatus(call_str, fp, exists, False)
+        return CacheStatus(key, fp, exists, False)
 
     def _expired(self, fp):
-        return time() - os.path.getmtime(fp) > self.expiration
+        try:
+            return time() - os.path.getmtime(fp) > self.expiration
+        except FileNotFoundError:
+            # Evicted since it was looked up
+            return True
+
+    def touch(self, key: str):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE entries SET last_access = ? WHERE key = ?',
+                (time(), key)
+            )
+
+    def lookup(self, key: str) -> Optional[str]:
+        """ Path of the cached file for key, marked as used, or None if
+        there is no unexpired entry
+        """
+        if self.dummy:
+            return None
+        cache_status = self._exists(key)
+        if not cache_status.exists or self._expired(cache_status.filepath):
+            return None
+        self.touch(key)
+        return cache_status.filepath
+
+    def store(self, key: str, value, writer, suffix: str = ''):
+        """ Write value for key with writer(value, fp) and record the entry
+        """
+        if self.dummy:
+            return
+        cache_status = CacheStatus(key, os.path.join(self.directory, key + suffix))
+        _atomic_write(writer, value, cache_status.filepath)
+        self.new_call_record(cache_status)
 
     def new_call_record(self, cs: CacheStatus):
         if not self.dummy:
-            log = self._retrieve_log()
-            log[cs.call_signature] = cs.filepath
-            self._overwrite_log(log)
+            now = time()
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries '
+                    '(key, filepath, size, created, last_access) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (cs.call_signature, cs.filepath, os.path.getsize(cs.filepath), now, now)
+                )
+            self.evict()
+
+    def total_bytes(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self):
+        """ Remove least recently used entries until within max_bytes
+        """
+        if not self.max_bytes:
+            return
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for key, fp, size in conn.execute(
+                    'SELECT key, filepath, size FROM entries ORDER BY last_access'
+            ):
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key, fp))
+                total -= size
+            conn.executemany(
+                'DELETE FROM entries WHERE key = ?',
+                [(key,) for key, _ in evicted]
+            )
+        for _, fp in evicted:
+            if os.path.exists(fp):
+                os.remove(fp)
+
+
+def _atomic_write(writer, value, fp):
+    # Write beside the target and rename, so concurrent readers never see a
+    # partially written file
+    tmp_fp = f'{fp}.{os.getpid()}.{threading.get_ident()}.tmp'
+    writer(value, tmp_fp)
+    os.replace(tmp_fp, fp)
 
 
 def cache_data(reader, writer):
     def decorator_cache_data(func):
         @functools.wraps(func)
         def wrapper_cache_data(obj, *args, **kwargs):
-            if obj.cache_manager.dummy:
-                value = CacheStatus(
-                    'null',
-                    'dummy_to_trigger_call',
-                    False,
-                    True
-                )
-            else:
-                args_repr = [repr(a) for a in args]
-                kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
-                call_signature = ", ".join(args_repr + kwargs_repr)
+            cache_manager = obj.cache_manager
+            args_repr = [repr(a) for a in args]
+            kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
+            call_signature = ", ".join(args_repr + kwargs_repr)
+            key = cache_manager.call_key(func.__qualname__, call_signature)
+
+            memory_cache = cache_manager.memory_cache
+            if memory_cache:
+                found, value = memory_cache.get(key)
+                if found:
+                    return value
 
-                cache_status = obj.cache_manager._exists(call_signature)
+            if cache_manager.dummy:
+                value = func(obj, *args, **kwargs)
+            else:
+                cache_status = cache_manager._exists(key)
                 if cache_status.exists:
-                    cache_status.expired = obj.cache_manager._expired(cache_status.filepath)
+                    cache_status.expired = cache_manager._expired(cache_status.filepath)
                 else:
                     cache_status.expired = True
-                if cache_status.execute_call:
+                found = False
+                if not cache_status.execute_call:
+                    try:
+                        value = reader(cache_status.filepath)
+                        found = True
+                        cache_manager.touch(key)
+                    except FileNotFoundError:
+                        # Evicted by another process since _exists
+                        pass
+                if not found:
                     value = func(obj, *args, **kwargs)
-                    writer(value, cache_status.filepath)
-                    obj.cache_manager.new_call_record(cache_status)
-                else:
-                    value = reader(cache_status.filepath)
+                    _atomic_write(writer, value, cache_status.filepath)
+                    cache_manager.new_call_record(cache_status)
+            if memory_cache:
+                memory_cache.put(key, value)
             return value
         return wrapper_cache_data
     return decorator_cache_data
@@ -126,28 +369,73 @@ def cache_data(reader, writer):
 
 @dataclass
 class s3BucketManager:
+    """ Reads and writes DataFrames and dicts to a storage backend - by default
+    an S3Backend for bucket, or e.g. a LocalBackend (see local())
+     - bulk (*_many) methods run transfers concurrently on a thread pool of at
+     most max_workers
+     - the S3 backend shares one pooled client and retries transient failures
+     up to retries times with exponential backoff
+    """
     bucket: str
     aws_id: str
     aws_key: str
     cache_manager: CacheManager = None
+    max_workers: int = 8
+    retries: int = 3
+    backoff: float = 0.5
+    backend: StorageBackend = None
 
     def __post_init__(self):
         if not self.cache_manager:
             self.cache_manager = CacheManager('dummy_cache', 1, dummy=True)
+        if not self.backend:
+            self.backend = S3Backend(
+                self.bucket,
+                self.aws_id,
+                self.aws_key,
+                max_pool_connections=max(10, self.max_workers),
+                retries=self.retries,
+                backoff=self.backoff
+            )
+
+    @classmethod
+    def local(
+            cls,
+            root: str,
+            cache_manager: CacheManager = None,
+            max_workers: int = 8,
+            memory_map: bool = True
+    ):
+        return cls(
+            bucket=None,
+            aws_id=None,
+            aws_key=None,
+            cache_manager=cache_manager,
+            max_workers=max_workers,
+            backend=LocalBackend(root, memory_map)
+        )
 
     @property
     def resource(self):
-        return boto3.resource(
-            's3',
-            aws_access_key_id=self.aws_id,
-            aws_secret_access_key=self.aws_key
-        )
+        return self.backend.resource
 
     @staticmethod
     def path(folders, fn):
         folders_str = '/'.join(folders)
         return f'{folders_str}/{fn}'
 
+    def _put(self, folders, fn, body):
+        self.backend.put(self.path(folders, fn), body)
+
+    def _get(self, folders, fn) -> bytes:
+        return self.backend.get(self.path(folders, fn))
+
+    def _map(self, func, calls: List[tuple]) -> list:
+        """ Apply func to each tuple of arguments concurrently, preserving order
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda call: func(*call), calls))
+
     def df_to_s3_csv(
             self, 
             df: pd.DataFrame, 
@@ -157,10 +445,7 @@ class s3BucketManager:
     ):
         csv_buffer = StringIO()
         df.to_csv(csv_buffer, **kwargs)
-        self.resource.Object(
-            self.bucket,
-            self.path(folders, fn),
-        ).put(Body=csv_buffer.getvalue())
+        self._put(folders, fn, csv_buffer.getvalue())
 
     def dict_to_s3_json(
             self,
@@ -169,10 +454,7 @@ class s3BucketManager:
             fn,
             indent=2
     ):
-        self.resource.Object(
-            self.bucket,
-            self.path(folders, fn),
-        ).put(Body=bytes(
+        self._put(folders, fn, bytes(
             json.dumps(
                 json_data,
                 indent=indent
@@ -184,11 +466,7 @@ class s3BucketManager:
             folders,
             fn
     ) -> dict:
-        file_object = self.resource.Object(
-            self.bucket,
-            self.path(folders, fn),
-        )
-        file = file_object.get()['Body'].read().decode('utf-8')
+        file = self._get(folders, fn).decode('utf-8')
         json_data = json.loads(file)
         return json_data
 
@@ -201,33 +479,91 @@ class s3BucketManager:
     ):
         buffer = BytesIO()
         df.to_feather(buffer, **kwargs)
-        self.resource.Object(
-            self.bucket,
-            self.path(folders, fn),
-        ).put(Body=buffer.getvalue())
+        self._put(folders, fn, buffer.getvalue())
+
+    def df_to_s3_parquet(
+            self,
+            df: pd.DataFrame,
+            folders,
+            fn,
+            **kwargs
+    ):
+        buffer = BytesIO()
+        df.to_parquet(buffer, **kwargs)
+        self._put(folders, fn, buffer.getvalue())
 
     @cache_data(pd.read_feather, pd.DataFrame.to_feather)
     def s3_ftr_to_df(
             self,
             folders,
-            fn
+            fn,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None
     ) -> pd.DataFrame:
-        file_object = self.resource.Object(
-            self.bucket,
-            self.path(folders, fn)
-        )
-        file = BytesIO(file_object.get()['Body'].read())
-        return pd.read_feather(file)
+        """ Read only the given columns and (start, stop) row range, if given.
+        Only the byte ranges holding those columns are fetched
+        """
+        return self.backend.read_feather(self.path(folders, fn), columns, rows)
+
+    @cache_data(pd.read_feather, pd.DataFrame.to_feather)
+    def s3_parquet_to_df(
+            self,
+            folders,
+            fn,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        """ Read only the given columns and (start, stop) row range, if given.
+        Only the column chunks of overlapping row groups are fetched
+        """
+        return self.backend.read_parquet(self.path(folders, fn), columns, rows)
 
     @cache_data(pd.read_feather, pd.DataFrame.to_feather)
     def s3_csv_to_df(
             self,
             folders,
             fn,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None
     ) -> pd.DataFrame:
-        file_object = self.resource.Object(
-            self.bucket,
-            self.path(folders, fn)
-        )
-        file = BytesIO(file_object.get()['Body'].read())
-        return pd.read_csv(file)
+        """ Parse only the given columns and (start, stop) row range, if given
+        """
+        return self.backend.read_csv(self.path(folders, fn), columns, rows)
+
+    def df_to_s3_csv_many(self, items: List[Tuple[pd.DataFrame, list, str]]):
+        """ items are (df, folders, fn) tuples
+        """
+        self._map(self.df_to_s3_csv, items)
+
+    def df_to_s3_ftr_many(self, items: List[Tuple[pd.DataFrame, list, str]]):
+        """ items are (df, folders, fn) tuples
+        """
+        self._map(self.df_to_s3_ftr, items)
+
+    def dict_to_s3_json_many(self, items: List[Tuple[dict, list, str]]):
+        """ items are (json_data, folders, fn) tuples
+        """
+        self._map(self.dict_to_s3_json, items)
+
+    def s3_json_to_dict_many(self, paths: List[Tuple[list, str]]) -> List[dict]:
+        """ paths are (folders, fn) tuples; results are returned in order
+        """
+        return self._map(self.s3_json_to_dict, paths)
+
+    def s3_ftr_to_df_many(self, paths: List[tuple]) -> List[pd.DataFrame]:
+        """ paths are (folders, fn[, columns[, rows]]) tuples; results are
+        returned in order
+        """
+        return self._map(self.s3_ftr_to_df, paths)
+
+    def s3_parquet_to_df_many(self, paths: List[tuple]) -> List[pd.DataFrame]:
+        """ paths are (folders, fn[, columns[, rows]]) tuples; results are
+        returned in order
+        """
+        return self._map(self.s3_parquet_to_df, paths)
+
+    def s3_csv_to_df_many(self, paths: List[tuple]) -> List[pd.DataFrame]:
+        """ paths are (folders, fn[, columns[, rows]]) tuples; results are
+        returned in order
+        """
+        return self._map(self.s3_csv_to_df, paths)
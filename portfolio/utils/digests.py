@@ -0,0 +1,11 @@
+import hashlib
+
+import numpy as np
+
+
+def array_digest(data) -> str:
+    """ Content hash of an array of floats
+    """
+    return hashlib.sha256(
+        np.ascontiguousarray(data, dtype=float).tobytes()
+    ).hexdigest()
@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import List
-from matplotlib import pyplot as plt
+
+from portfolio.utils.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
 
 
 @dataclass
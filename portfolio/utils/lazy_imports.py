@@ -0,0 +1,29 @@
+import importlib
+
+
+class LazyModule:
+    """ Stand-in for a module, imported on first attribute access.
+
+    Used for plotting, AWS, Arrow and SciPy dependencies, so importing the
+    package (e.g. in every spawned worker process) does not pay for
+    libraries a run never touches
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from portfolio.statistics.sketches import KLLSketch
+
+
+@dataclass
+class SpanStats:
+    """ Count, total and duration distribution (in seconds) of one named span
+    """
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self):
+        self.sketch = KLLSketch()
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.sketch.update(duration)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self) -> dict:
+        p50, p95, p99 = self.sketch.quantiles([0.5, 0.95, 0.99])
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': self.max,
+        }
+
+
+@dataclass
+class Profiler:
+    """ Accumulates named spans across iterations (and, via merge, across
+    workers).
+     - per-span counts, totals and percentiles are always kept
+     - with record_events, individual spans (up to max_events) are also kept
+     for export as a Chrome trace (chrome://tracing or Perfetto)
+     - each thread records into its own accumulator without locking; spans
+     and events merge the accumulators when read
+    """
+    record_events: bool = False
+    max_events: int = 1_000_000
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (spans, events) per recording thread, and of merged profilers
+        self._accumulators: List[Tuple[Dict[str, SpanStats], list]] = []
+        self._merged: Tuple[Dict[str, SpanStats], list] = ({}, [])
+
+    def __getstate__(self):
+        return {
+            'record_events': self.record_events,
+            'max_events': self.max_events,
+            'spans': self.spans,
+            'events': self.events,
+        }
+
+    def __setstate__(self, state):
+        self.record_events = state['record_events']
+        self.max_events = state['max_events']
+        self.__post_init__()
+        self._merged = (state['spans'], state['events'])
+
+    def _accumulator(self) -> Tuple[Dict[str, SpanStats], list]:
+        accumulator = getattr(self._local, 'accumulator', None)
+        if accumulator is None:
+            accumulator = ({}, [])
+            self._local.accumulator = accumulator
+            with self._lock:
+                self._accumulators.append(accumulator)
+        return accumulator
+
+    def _all_accumulators(self) -> List[Tuple[Dict[str, SpanStats], list]]:
+        with self._lock:
+            return [self._merged] + list(self._accumulators)
+
+    def record(self, name: str, start_ns: int, duration_ns: int):
+        spans, events = self._accumulator()
+        stats = spans.get(name)
+        if stats is None:
+            stats = spans[name] = SpanStats()
+        stats.add(duration_ns * 1e-9)
+        if self.record_events and len(events) < self.max_events:
+            events.append(
+                (name, start_ns, duration_ns, os.getpid(), threading.get_ident())
+            )
+
+    def merge(self, other):
+        other_spans, other_events = other.spans, other.events
+        with self._lock:
+            spans, events = self._merged
+            for name, stats in other_spans.items():
+                if name not in spans:
+                    spans[name] = SpanStats()
+                spans[name].merge(stats)
+            room = max(self.max_events - len(events), 0)
+            events.extend(other_events[:room])
+
+    @property
+    def spans(self) -> Dict[str, SpanStats]:
+        """ Span statistics merged over all threads and merged profilers
+        """
+        merged = {}
+        for spans, _ in self._all_accumulators():
+            for name, stats in list(spans.items()):
+                if name not in merged:
+                    merged[name] = SpanStats()
+                merged[name].merge(stats)
+        return merged
+
+    def totals(self) -> Dict[str, float]:
+        """ Total seconds per span, without merging duration sketches
+        """
+        totals = {}
+        for spans, _ in self._all_accumulators():
+            for name, stats in list(spans.items()):
+                totals[name] = totals.get(name, 0.0) + stats.total
+        return totals
+
+    @property
+    def events(self) -> List[Tuple[str, int, int, int, int]]:
+        events = []
+        for _, thread_events in self._all_accumulators():
+            events.extend(thread_events)
+        return events[:self.max_events]
+
+    def summary(self) -> pd.DataFrame:
+        """ One row per span, durations in seconds, sorted by total time
+        """
+        summary = pd.DataFrame.from_dict(
+            {name: stats.to_dict() for name, stats in self.spans.items()},
+            orient='index'
+        )
+        if summary.empty:
+            return summary
+        return summary.sort_values('total', ascending=False)
+
+    def to_json(self, fp: str = None) -> str:
+        text = json.dumps(
+            {name: stats.to_dict() for name, stats in self.spans.items()},
+            indent=2
+        )
+        if fp:
+            with open(fp, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_chrome_trace(self, fp: str):
+        """ Requires record_events
+        """
+        trace_events = list([
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': start_ns / 1000,
+                'dur': duration_ns / 1000,
+                'pid': pid,
+                'tid': tid,
+            }
+            for name, start_ns, duration_ns, pid, tid in self.events
+        ])
+        with open(fp, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profiler.record(self.name, self.start, perf_counter_ns() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+_null_span = _NullSpan()
+# Process-wide active profiler, None when profiling is disabled
+_profiler: Profiler = None
+
+
+def span(name: str):
+    """ Context manager timing a named span. When profiling is disabled this
+    returns a shared no-op, so instrumented code pays only for the call
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _null_span
+    return _Span(profiler, name)
+
+
+def active_profiler() -> Profiler:
+    return _profiler
+
+
+def enable(profiler: Profiler = None) -> Profiler:
+    global _profiler
+    _profiler = profiler or Profiler()
+    return _profiler
+
+
+def disable() -> Profiler:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def collect() -> Profiler:
+    """ Return the active profiler and replace it with an empty one with the
+    same settings, e.g. to ship a worker's spans back after each task
+    """
+    global _profiler
+    profiler = _profiler
+    if profiler is not None:
+        _profiler = Profiler(profiler.record_events, profiler.max_events)
+    return profiler
+
+
+@contextmanager
+def profiling(record_events: bool = False, profiler: Profiler = None):
+    """ Profile the enclosed block (into profiler, if given), restoring the
+    previous state on exit
+    """
+    previous = _profiler
+    profiler = enable(profiler or Profiler(record_events))
+    try:
+        yield profiler
+    finally:
+        if previous:
+            enable(previous)
+        else:
+            disable()
@@ -0,0 +1,276 @@
+import logging
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from time import monotonic, time
+from typing import Callable, Dict, List
+
+from portfolio.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Profiling spans that partition a Monte Carlo iteration into stages
+stage_span_prefixes = [
+    'ScenarioManager.refresh_',
+    'RankedAssetGroup.dispatch',
+    'AssetGroups.replay_dispatch',
+    'MonteCarloLog.',
+]
+
+
+@dataclass
+class ProgressSnapshot:
+    """ Progress of the current Monte Carlo run and, within a sweep, of the
+    sweep. ETAs use the average rate so far; with convergence criteria
+    total_iterations is the max_iterations bound
+    """
+    timestamp: float
+    scenario_name: str = None
+    iterations: int = None
+    total_iterations: int = None
+    iterations_per_second: float = None
+    eta_seconds: float = None
+    means: Dict[str, float] = field(default_factory=dict)
+    ci_half_widths: Dict[str, float] = field(default_factory=dict)
+    stage_shares: Dict[str, float] = field(default_factory=dict)
+    scenarios_completed: int = None
+    scenarios_total: int = None
+    scenarios_per_second: float = None
+    sweep_eta_seconds: float = None
+
+
+class ProgressPublisher(ABC):
+    @abstractmethod
+    def publish(self, snapshot: ProgressSnapshot):
+        pass
+
+
+@dataclass
+class CallbackPublisher(ProgressPublisher):
+    callback: Callable[[ProgressSnapshot], None]
+
+    def publish(self, snapshot: ProgressSnapshot):
+        self.callback(snapshot)
+
+
+@dataclass
+class LoggingPublisher(ProgressPublisher):
+    level: int = logging.INFO
+    metric: str = 'annual_dispatch_cost'
+
+    def publish(self, snapshot: ProgressSnapshot):
+        message = f'{snapshot.scenario_name or "monte_carlo"}:'
+        if snapshot.total_iterations is not None:
+            message += f' {snapshot.iterations}/{snapshot.total_iterations} iterations'
+        if snapshot.iterations_per_second:
+            message += f', {snapshot.iterations_per_second:.2f} it/s'
+        if snapshot.eta_seconds is not None:
+            message += f', ETA {snapshot.eta_seconds:.0f}s'
+        if self.metric in snapshot.means:
+            message += f', {self.metric} {snapshot.means[self.metric]:.6g}' \
+                       f' ± {snapshot.ci_half_widths.get(self.metric, float("nan")):.3g}'
+        if snapshot.scenarios_total:
+            message += f' scenarios {snapshot.scenarios_completed}/{snapshot.scenarios_total}'
+            if snapshot.sweep_eta_seconds is not None:
+                message += f', sweep ETA {snapshot.sweep_eta_seconds:.0f}s'
+        logger.log(self.level, message)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+@dataclass
+class PrometheusTextfilePublisher(ProgressPublisher):
+    """ Writes the snapshot in the Prometheus text exposition format, e.g.
+    for the node exporter textfile collector. The file is rewritten
+    atomically, and portfolio_progress_last_update_timestamp_seconds lets a
+    scheduler detect stalled workers
+    """
+    fp: str
+    labels: Dict[str, str] = field(default_factory=dict)
+    prefix: str = 'portfolio_progress'
+
+    def _series(self, name, help_text, values, label_name=None) -> List[str]:
+        values = list([(key, value) for key, value in values if value is not None])
+        if not values:
+            return []
+        lines = [
+            f'# HELP {self.prefix}_{name} {help_text}',
+            f'# TYPE {self.prefix}_{name} gauge',
+        ]
+        for key, value in values:
+            labels = dict(self.labels)
+            if label_name:
+                labels[label_name] = key
+            label_text = ','.join([f'{k}="{_escape(v)}"' for k, v in labels.items()])
+            label_block = f'{{{label_text}}}' if label_text else ''
+            lines.append(f'{self.prefix}_{name}{label_block} {_format_value(value)}')
+        return lines
+
+    def publish(self, snapshot: ProgressSnapshot):
+        lines = []
+        single = {
+            'last_update_timestamp_seconds': ('Unix time of the last progress update', snapshot.timestamp),
+            'iterations': ('Iterations completed in the current run', snapshot.iterations),
+            'total_iterations': ('Iterations planned for the current run', snapshot.total_iterations),
+            'iterations_per_second': ('Average iteration rate of the current run', snapshot.iterations_per_second),
+            'eta_seconds': ('Estimated seconds until the current run completes', snapshot.eta_seconds),
+            'scenarios_completed': ('Scenarios completed in the sweep', snapshot.scenarios_completed),
+            'scenarios_total': ('Scenarios in the sweep', snapshot.scenarios_total),
+            'scenarios_per_second': ('Average scenario completion rate', snapshot.scenarios_per_second),
+            'sweep_eta_seconds': ('Estimated seconds until the sweep completes', snapshot.sweep_eta_seconds),
+        }
+        for name, (help_text, value) in single.items():
+            lines += self._series(name, help_text, [(None, value)])
+        lines += self._series('metric_mean', 'Running mean of logged metrics',
+                              snapshot.means.items(), 'metric')
+        lines += self._series('metric_ci_half_width', 'Confidence interval half-width of the running mean',
+                              snapshot.ci_half_widths.items(), 'metric')
+        lines += self._series('stage_time_share', 'Share of run time spent in each stage',
+                              snapshot.stage_shares.items(), 'stage')
+        directory = os.path.dirname(os.path.abspath(self.fp))
+        os.makedirs(directory, exist_ok=True)
+        tmp_fp = f'{self.fp}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_fp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_fp, self.fp)
+
+
+@dataclass
+class ProgressReporter:
+    """ Publishes progress of Monte Carlo runs (ScenarioManager.progress) and
+    sweeps (CapacitySweep.progress), at most every interval seconds and at
+    the end of each run.
+     - running means and confidence intervals come from the MonteCarloLog's
+     streaming statistics
+     - stage time shares are reported while profiling is enabled (see
+     portfolio.utils.profiling); with profile_stages=True a profiler is
+     enabled for each run if none is active
+    """
+    publishers: List[ProgressPublisher]
+    interval: float = 10.0
+    metrics: List[str] = field(default_factory=lambda: ['annual_dispatch_cost'])
+    profile_stages: bool = False
+
+    def __post_init__(self):
+        self.scenario_name = None
+        self._run_start = None
+        self._total_iterations = None
+        self._last_publish = None
+        self._span_totals = {}
+        self._owns_profiler = False
+        self._sweep_start = None
+        self._scenarios_total = None
+        self._scenarios_completed = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def set_scenario(self, scenario_name: str):
+        self.scenario_name = scenario_name
+
+    def _stage_totals(self) -> Dict[str, float]:
+        profiler = profiling.active_profiler()
+        if profiler is None:
+            return {}
+        return {
+            name: total
+            for name, total in profiler.totals().items()
+            if any([name.startswith(prefix) for prefix in stage_span_prefixes])
+        }
+
+    def start(self, total_iterations: int):
+        if self.profile_stages and profiling.active_profiler() is None:
+            profiling.enable()
+            self._owns_profiler = True
+        self._run_start = monotonic()
+        self._last_publish = self._run_start
+        self._total_iterations = total_iterations
+        self._span_totals = self._stage_totals()
+
+    def _snapshot(self, monte_carlo_log=None) -> ProgressSnapshot:
+        now = monotonic()
+        snapshot = ProgressSnapshot(timestamp=time(), scenario_name=self.scenario_name)
+        if monte_carlo_log is not None and self._run_start is not None:
+            elapsed = now - self._run_start
+            iterations = monte_carlo_log.iterations
+            snapshot.iterations = iterations
+            snapshot.total_iterations = self._total_iterations
+            if elapsed > 0 and iterations:
+                rate = iterations / elapsed
+                snapshot.iterations_per_second = rate
+                snapshot.eta_seconds = max(self._total_iterations - iterations, 0) / rate
+            half_widths = monte_carlo_log.confidence_half_widths()
+            for metric in self.metrics:
+                if metric in monte_carlo_log.moments:
+                    snapshot.means[metric] = monte_carlo_log.moments[metric].mean
+                    snapshot.ci_half_widths[metric] = float(half_widths[metric])
+            if elapsed > 0:
+                for name, total in self._stage_totals().items():
+                    share = (total - self._span_totals.get(name, 0.0)) / elapsed
+                    if share > 0:
+                        snapshot.stage_shares[name] = share
+        if self._scenarios_total is not None:
+            snapshot.scenarios_completed = self._scenarios_completed
+            snapshot.scenarios_total = self._scenarios_total
+            elapsed = now - self._sweep_start
+            if elapsed > 0 and self._scenarios_completed:
+                rate = self._scenarios_completed / elapsed
+                snapshot.scenarios_per_second = rate
+                snapshot.sweep_eta_seconds = \
+                    (self._scenarios_total - self._scenarios_completed) / rate
+        return snapshot
+
+    def _publish(self, snapshot: ProgressSnapshot):
+        for publisher in self.publishers:
+            publisher.publish(snapshot)
+        self._last_publish = monotonic()
+
+    def update(self, monte_carlo_log):
+        """ Call after each iteration; publishes if interval has elapsed
+        """
+        if monotonic() - self._last_publish >= self.interval:
+            self._publish(self._snapshot(monte_carlo_log))
+
+    def finish(self, monte_carlo_log):
+        self._publish(self._snapshot(monte_carlo_log))
+        if self._owns_profiler:
+            profiling.disable()
+            self._owns_profiler = False
+        self._run_start = None
+
+    def start_sweep(self, scenarios_total: int):
+        self._sweep_start = monotonic()
+        self._last_publish = self._sweep_start
+        self._scenarios_total = scenarios_total
+        self._scenarios_completed = 0
+
+    def scenario_completed(self, scenario_name: str):
+        with self._lock:
+            self._scenarios_completed += 1
+            self.scenario_name = scenario_name
+            if monotonic() - self._last_publish >= self.interval:
+                self._publish(self._snapshot())
+
+    def finish_sweep(self):
+        self._publish(self._snapshot())
+        self._scenarios_total = None
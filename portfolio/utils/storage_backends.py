@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass
+from io import BytesIO
+from time import sleep
+from typing import List, Tuple
+
+import pandas as pd
+
+from portfolio.utils.lazy_imports import lazy_import
+
+boto3 = lazy_import('boto3')
+botocore_config = lazy_import('botocore.config')
+botocore_exceptions = lazy_import('botocore.exceptions')
+pa = lazy_import('pyarrow')
+ipc = lazy_import('pyarrow.ipc')
+parquet = lazy_import('pyarrow.parquet')
+
+retryable_error_codes = [
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'RequestTimeout',
+    'InternalError',
+    'ServiceUnavailable',
+]
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, botocore_exceptions.BotoCoreError):
+        return True
+    if isinstance(error, botocore_exceptions.ClientError):
+        return error.response.get('Error', {}).get('Code') in retryable_error_codes
+    return False
+
+
+class Validator:
+    @staticmethod
+    def row_range(rows: Tuple[int, int]):
+        if rows is not None and not 0 <= rows[0] <= rows[1]:
+            raise ValueError(f'Invalid row range {rows}: must be (start, stop) '
+                             f'with 0 <= start <= stop')
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    # Row-ranged reads keep a default index so results remain cacheable
+    # as feather
+    return table.to_pandas().reset_index(drop=True)
+
+
+def _read_ipc(
+        source,
+        columns: List[str] = None,
+        rows: Tuple[int, int] = None
+) -> pd.DataFrame:
+    """ Read an Arrow IPC (feather v2) file from a random-access source,
+    reading only the buffers of the projected columns and stopping after the
+    last record batch in the row range
+    """
+    reader = ipc.open_file(source)
+    if columns is not None:
+        reader = ipc.open_file(
+            source,
+            options=ipc.IpcReadOptions(
+                included_fields=sorted([reader.schema.get_field_index(c) for c in columns])
+            )
+        )
+    if rows is None:
+        table = reader.read_all()
+    else:
+        start, stop = rows
+        batches = []
+        offset = 0
+        for i in range(reader.num_record_batches):
+            if offset >= stop:
+                break
+            batch = reader.get_batch(i)
+            lo = max(start - offset, 0)
+            hi = min(stop - offset, batch.num_rows)
+            if lo < hi:
+                batches.append(batch.slice(lo, hi - lo))
+            offset += batch.num_rows
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+    if columns is not None:
+        table = table.select(columns)
+    return _to_frame(table)
+
+
+def _read_parquet(
+        source,
+        columns: List[str] = None,
+        rows: Tuple[int, int] = None
+) -> pd.DataFrame:
+    """ Read a Parquet file from a random-access source, reading only the
+    projected column chunks of the row groups overlapping the row range
+    """
+    parquet_file = parquet.ParquetFile(source)
+    if rows is None:
+        return _to_frame(parquet_file.read(columns=columns, use_pandas_metadata=False))
+    start, stop = rows
+    groups = []
+    offset = 0
+    first_offset = None
+    for i in range(parquet_file.num_row_groups):
+        n = parquet_file.metadata.row_group(i).num_rows
+        if offset < stop and offset + n > start:
+            groups.append(i)
+            if first_offset is None:
+                first_offset = offset
+        offset += n
+    if not groups:
+        return _to_frame(parquet_file.schema_arrow.empty_table().select(
+            columns or parquet_file.schema_arrow.names
+        ))
+    table = parquet_file.read_row_groups(groups, columns=columns, use_pandas_metadata=False)
+    return _to_frame(table.slice(start - first_offset, stop - start))
+
+
+def _read_csv(
+        stream,
+        columns: List[str] = None,
+        rows: Tuple[int, int] = None,
+        **kwargs
+) -> pd.DataFrame:
+    if rows is not None:
+        kwargs.update(
+            skiprows=range(1, rows[0] + 1),
+            nrows=rows[1] - rows[0]
+        )
+    df = pd.read_csv(stream, usecols=columns, **kwargs)
+    # usecols keeps file order; match the column order of the Arrow readers
+    return df if columns is None else df[columns]
+
+
+class StorageBackend(ABC):
+    """ Object store addressed by '/'-separated keys.
+
+    Reads take an optional column projection and (start, stop) row range.
+    Feather and Parquet reads go through open_input_file, so backends with
+    random access only fetch the byte ranges they need.
+    """
+    @abstractmethod
+    def put(self, key: str, body: bytes):
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        pass
+
+    def open_input_file(self, key: str):
+        """ Random-access file for Arrow readers
+        """
+        return pa.BufferReader(self.get(key))
+
+    def open_stream(self, key: str):
+        """ Sequential file-like object
+        """
+        return BytesIO(self.get(key))
+
+    def read_feather(
+            self,
+            key: str,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        Validator.row_range(rows)
+        with self.open_input_file(key) as source:
+            return _read_ipc(source, columns, rows)
+
+    def read_parquet(
+            self,
+            key: str,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        Validator.row_range(rows)
+        with self.open_input_file(key) as source:
+            return _read_parquet(source, columns, rows)
+
+    def read_csv(
+            self,
+            key: str,
+            columns: List[str] = None,
+            rows: Tuple[int, int] = None,
+            **kwargs
+    ) -> pd.DataFrame:
+        """ CSV cannot be read by byte range, but reading stops once the last
+        row in the range has been parsed
+        """
+        Validator.row_range(rows)
+        with closing(self.open_stream(key)) as stream:
+            return _read_csv(stream, columns, rows, **kwargs)
+
+
+class S3RangedFile(io.RawIOBase):
+    """ Seekable read-only view of an S3 object, fetching each read with a
+    ranged GET
+    """
+    def __init__(self, backend, key: str):
+        self.backend = backend
+        self.key = key
+        self.size = backend._with_retries(
+            backend.client.head_object,
+            Bucket=backend.bucket,
+            Key=key
+        )['ContentLength']
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+
+        def get():
+            return self.backend.client.get_object(
+                Bucket=self.backend.bucket,
+                Key=self.key,
+                Range=f'bytes={self.position}-{end - 1}'
+            )['Body'].read()
+        data = self.backend._with_retries(get)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+@dataclass
+class S3Backend(StorageBackend):
+    """ S3 bucket store.
+     - a single thread-safe client (with a connection pool of at least
+     max_pool_connections) is created on first use and shared by all transfers
+     - transient failures are retried up to retries times with exponential
+     backoff
+     - feather and Parquet reads fetch byte ranges of at least read_buffer_size
+    """
+    bucket: str
+    aws_id: str
+    aws_key: str
+    max_pool_connections: int = 10
+    retries: int = 3
+    backoff: float = 0.5
+    read_buffer_size: int = 1 << 16
+
+    def __post_init__(self):
+        self._client = None
+        self._resource = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_client=None, _resource=None, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _session(self):
+        return boto3.session.Session(
+            aws_access_key_id=self.aws_id,
+            aws_secret_access_key=self.aws_key
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._session().client(
+                        's3',
+                        config=botocore_config.Config(max_pool_connections=self.max_pool_connections)
+                    )
+        return self._client
+
+    @property
+    def resource(self):
+        """ Shared boto3 resource, kept for compatibility. Unlike client, it
+        must not be used from several threads at once
+        """
+        if self._resource is None:
+            with self._lock:
+                if self._resource is None:
+                    self._resource = self._session().resource('s3')
+        return self._resource
+
+    def _with_retries(self, func, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except (botocore_exceptions.BotoCoreError, botocore_exceptions.ClientError) as error:
+                if attempt == self.retries or not _retryable(error):
+                    raise
+                sleep(self.backoff * 2 ** attempt)
+
+    def put(self, key: str, body: bytes):
+        self._with_retries(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=key,
+            Body=body
+        )
+
+    def get(self, key: str) -> bytes:
+        def get():
+            return self.client.get_object(
+                Bucket=self.bucket,
+                Key=key,
+            )['Body'].read()
+        return self._with_retries(get)
+
+    def open_input_file(self, key: str):
+        return pa.PythonFile(
+            io.BufferedReader(S3RangedFile(self, key), buffer_size=self.read_buffer_size),
+            mode='r'
+        )
+
+    def open_stream(self, key: str):
+        return self._with_retries(
+            self.client.get_object,
+            Bucket=self.bucket,
+            Key=key
+        )['Body']
+
+
+@dataclass
+class LocalBackend(StorageBackend):
+    """ Directory store, e.g. on a fast shared filesystem. Keys map to paths
+    under root. Feather files are read through a memory map, so only the
+    pages actually used are read from disk
+    """
+    root: str
+    memory_map: bool = True
+
+    def filepath(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key: str, body: bytes):
+        fp = self.filepath(key)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        tmp_fp = f'{fp}.{os.getpid()}.{threading.get_ident()}.tmp'
+        mode = 'w' if isinstance(body, str) else 'wb'
+        with open(tmp_fp, mode) as f:
+            f.write(body)
+        os.replace(tmp_fp, fp)
+
+    def get(self, key: str) -> bytes:
+        with open(self.filepath(key), 'rb') as f:
+            return f.read()
+
+    def open_input_file(self, key: str):
+        if self.memory_map:
+            return pa.memory_map(self.filepath(key))
+        return pa.OSFile(self.filepath(key))
+
+    def open_stream(self, key: str):
+        return open(self.filepath(key), 'rb')
@@ -28,6 +28,32 @@ class Timer:
                   f'Check that event start time was added')
 
 
+def freeze(value):
+    """ Immutable, hashable copy of a state value: lists (and tuples) become
+    tuples, dicts sorted tuples of items and sets frozensets, recursively
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple([freeze(v) for v in value])
+    if isinstance(value, dict):
+        return tuple(sorted([(k, freeze(v)) for k, v in value.items()]))
+    if isinstance(value, (set, frozenset)):
+        return frozenset([freeze(v) for v in value])
+    return value
+
+
+def thaw(value, like):
+    """ Fresh copy of a frozen value with the mutable type of like, so that
+    restored state never shares objects with a snapshot
+    """
+    if isinstance(like, list):
+        return list(value)
+    if isinstance(like, dict):
+        return dict(value)
+    if isinstance(like, set):
+        return set(value)
+    return value
+
+
 class Scheduler(ABC):
     _simple_indexing = False
 
@@ -35,6 +61,20 @@ class Scheduler(ABC):
     def event_due(self, index) -> bool:
         pass
 
+    def state(self) -> tuple:
+        """ Hashable snapshot of the scheduler's attributes, including any
+        carried between dispatches (e.g. the next event due). Mutable
+        attributes (e.g. a list of custom events) are frozen (see freeze)
+        """
+        return tuple(sorted([
+            (name, freeze(value)) for name, value in vars(self).items()
+        ]))
+
+    def restore(self, state: tuple):
+        attributes = vars(self)
+        for name, value in state:
+            attributes[name] = thaw(value, attributes.get(name))
+
 
 @dataclass
 class SimpleScheduler(Scheduler):
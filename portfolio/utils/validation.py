@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+
+supported_levels = ['strict', 'sampled', 'off']
+
+
+class Validator:
+    @staticmethod
+    def options(value, options, attr_name):
+        if value not in options:
+            raise ValueError(f'Invalid choice: {attr_name} must be one of the following: {", ".join(options)}')
+
+    @staticmethod
+    def positive_integer(value, attr_name):
+        if value < 1:
+            raise ValueError(f'Invalid value ({value}): {attr_name} must be a positive integer')
+
+
+# Package-wide validation level:
+#  - 'strict' runs every check (default)
+#  - 'sampled' runs each check on its first call and every sample_every calls
+#  thereafter, catching systematic input errors at a fraction of the cost
+#  - 'off' skips checks, for production runs on inputs known to be good
+# It applies to checks on the per-iteration hot path (e.g. DispatchVector);
+# checks run once at construction always run
+_level = 'strict'
+_sample_every = 100
+_counts = {}
+_lock = threading.Lock()
+
+
+def validation_level() -> str:
+    return _level
+
+
+def set_validation_level(level: str, sample_every: int = None):
+    global _level, _sample_every
+    Validator.options(level, supported_levels, 'level')
+    if sample_every is not None:
+        Validator.positive_integer(sample_every, 'sample_every')
+    with _lock:
+        if sample_every is not None:
+            _sample_every = sample_every
+        _level = level
+        _counts.clear()
+
+
+@contextmanager
+def validation(level: str, sample_every: int = None):
+    """ Apply a validation level within the enclosed block
+    """
+    previous = (_level, _sample_every)
+    set_validation_level(level, sample_every)
+    try:
+        yield
+    finally:
+        set_validation_level(*previous)
+
+
+def should_validate(check: str) -> bool:
+    if _level == 'strict':
+        return True
+    if _level == 'off':
+        return False
+    with _lock:
+        count = _counts.get(check, 0)
+        _counts[check] = count + 1
+        return count % _sample_every == 0
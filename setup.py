@@ -16,7 +16,7 @@ setup(
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3.9',
     ],
-    packages=find_packages(exclude=('tests',)),
+    packages=find_packages(exclude=('tests', 'benchmarks', 'benchmarks.*')),
     include_package_data=True,
     install_requires=[
         'boto3 >= 1.18.44',
@@ -27,5 +27,11 @@ setup(
         'scipy >= 1.7.1',
         'pyarrow >= 5.0.0',
         'pydantic >= 1.8.2',
-   ]
+   ],
+    extras_require={
+        'test': [
+            'pytest',
+            'moto >= 5.0',
+        ],
+    }
 )
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+bucket = 'portfolio-test-bucket'
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'demand': [float(i) for i in range(100)],
+        'solar': [i / 100 for i in range(100)],
+        'region': [f'r{i % 3}' for i in range(100)],
+    })
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """ moto stand-in for S3, with an empty bucket
+    """
+    moto = pytest.importorskip('moto')
+    boto3 = pytest.importorskip('boto3')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        boto3.client('s3').create_bucket(Bucket=bucket)
+        yield bucket
+
+
+@pytest.fixture
+def synthetic_manager():
+    """ Builds small synthetic ScenarioManagers (see benchmarks.synthetic)
+    """
+    from benchmarks.synthetic import SyntheticConfig, build_manager
+
+    def build(storages: int = 0, years: int = 2, generators: int = 3):
+        return build_manager(SyntheticConfig(years=years, generators=generators, storages=storages))
+    return build
+
+
+@pytest.fixture
+def seeded_monte_carlo():
+    """ Runs a seeded capacity scenario on a spawned manager, with the given
+    manager attributes set, and returns its Monte Carlo log
+    """
+    from portfolio.statistics.stochastics import thread_random_state
+
+    def run(manager, iterations: int = 40, **settings) -> pd.DataFrame:
+        spawned = manager.spawn()
+        spawned.log_dispatch_metrics = True
+        for name, value in settings.items():
+            setattr(spawned, name, value)
+        capacities = {a.name: a.nameplate_capacity for a in spawned.portfolio.all_assets_list}
+        with thread_random_state(7):
+            spawned.monte_carlo_capacity_scenario('scenario', capacities, 1e9, iterations=iterations)
+        return spawned.monte_carlo_logger.log
+    return run
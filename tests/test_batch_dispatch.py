@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from portfolio.portfolio.constraints import StochasticWindowCapacityConstraint
+
+
+def window_constraint(high: float, as_factor: bool) -> StochasticWindowCapacityConstraint:
+    rng = np.random.default_rng(1)
+    return StochasticWindowCapacityConstraint.from_array(
+        'constraint', 'MW', rng.uniform(0.0, high, 3 * 8760), as_factor
+    )
+
+
+def assert_scalar_matches_batch(asset, demand: np.ndarray):
+    scalar = asset.dispatch(demand)
+    batch = asset.dispatch_batch(np.tile(demand, (3, 1)))
+    for row in range(3):
+        np.testing.assert_array_equal(batch.discharge[row], scalar.discharge)
+        np.testing.assert_array_equal(batch.excess[row], scalar.excess)
+        np.testing.assert_array_equal(batch.charge[row], scalar.charge)
+
+
+@pytest.mark.parametrize('constraint', [None, (0.5, True), (500.0, False)])
+def test_passive_generator_parity(synthetic_manager, constraint):
+    manager = synthetic_manager()
+    asset = manager.portfolio.passive_generators.asset_rank[0]
+    if constraint:
+        asset.constraint = window_constraint(*constraint)
+    assert_scalar_matches_batch(asset, np.asarray(manager.demand.data, dtype=float))
+
+
+def test_passive_generator_factor_constraint(synthetic_manager):
+    manager = synthetic_manager()
+    asset = manager.portfolio.passive_generators.asset_rank[0]
+    asset.constraint = window_constraint(0.5, True)
+    demand = np.full(len(manager.demand.data), 1e9)
+    expected = np.minimum(
+        asset.passive_resource.data * asset.nameplate_capacity,
+        asset.constraint.constraint * asset.nameplate_capacity
+    )
+    np.testing.assert_allclose(asset.dispatch_batch(np.tile(demand, (2, 1))).discharge[1], expected)
+
+
+@pytest.mark.parametrize('constraint', [None, (1.0, True), (300.0, False)])
+def test_generator_parity(synthetic_manager, constraint):
+    manager = synthetic_manager()
+    asset = manager.portfolio.generators.asset_rank[0]
+    if constraint:
+        asset.constraint = window_constraint(*constraint)
+    assert_scalar_matches_batch(asset, np.asarray(manager.demand.data, dtype=float))
+
+
+def test_constrained_passive_dispatch_respects_constraint(synthetic_manager):
+    manager = synthetic_manager()
+    asset = manager.portfolio.passive_generators.asset_rank[0]
+    asset.constraint = window_constraint(50.0, False)
+    dispatch = asset.dispatch(np.full(8760, 1e6))
+    assert np.all(dispatch.discharge <= asset.constraint.constraint)
+
+
+def test_portfolio_batch_matches_scalar(synthetic_manager):
+    manager = synthetic_manager()
+    portfolio = manager.portfolio
+    demand = np.asarray(manager.demand.data, dtype=float)
+    demands = np.array([demand, 0.8 * demand, 1.2 * demand])
+
+    batch = portfolio.dispatch_batch(demands)
+    batch_totals = batch.annual_cost_totals()
+    for row, row_demand in enumerate(demands):
+        portfolio.dispatch(row_demand)
+        log = portfolio.dispatch_logger
+        for name in log.dispatch_order:
+            np.testing.assert_allclose(batch.dispatch[name][row], log.dispatch_log[name])
+            np.testing.assert_allclose(batch.excess[name][row], log.excess_log[name])
+        np.testing.assert_allclose(batch.residual_demand[row], log.dispatch_log['residual_demand'])
+        np.testing.assert_allclose(
+            batch_totals.iloc[row].to_numpy(),
+            log.annual_cost_totals().to_numpy()
+        )
+
+
+def test_batch_rejects_stateful_assets_up_front(synthetic_manager, monkeypatch):
+    manager = synthetic_manager(storages=1)
+    portfolio = manager.portfolio
+    assert not portfolio.storages.asset_rank[0].supports_batch
+
+    def dispatched(*args, **kwargs):
+        raise AssertionError('dispatched before the check')
+    for asset in portfolio.all_assets_list:
+        monkeypatch.setattr(asset, 'dispatch_batch', dispatched, raising=False)
+    with pytest.raises(ValueError, match='storage_0'):
+        portfolio.dispatch_batch(np.tile(np.asarray(manager.demand.data, dtype=float), (2, 1)))
@@ -0,0 +1,134 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from portfolio.utils.data_utils import CacheManager, ReaderWriter, cache_data, s3BucketManager
+
+
+def write_bytes(value: bytes, fp: str):
+    with open(fp, 'wb') as f:
+        f.write(value)
+
+
+def test_call_keys_are_content_hashes():
+    key = CacheManager.call_key('s3_ftr_to_df', "['inputs'], 'demand.ftr'")
+    assert key == CacheManager.call_key('s3_ftr_to_df', "['inputs'], 'demand.ftr'")
+    assert key != CacheManager.call_key('s3_ftr_to_df', "['inputs'], 'solar.ftr'")
+    assert len(key) == 64
+
+
+def test_cached_reads_skip_the_backend(tmp_path, frame):
+    manager = s3BucketManager.local(
+        str(tmp_path / 'store'),
+        cache_manager=CacheManager(str(tmp_path / 'cache'), 3600)
+    )
+    manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+    first = manager.s3_ftr_to_df(['inputs'], 'demand.ftr')
+    os.remove(manager.backend.filepath('inputs/demand.ftr'))
+    pd.testing.assert_frame_equal(manager.s3_ftr_to_df(['inputs'], 'demand.ftr'), first)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CacheManager(str(tmp_path), 3600, max_bytes=3000)
+    for key in ('a', 'b', 'c'):
+        cache.store(key, bytes(1000), write_bytes)
+    assert cache.lookup('a')
+    cache.store('d', bytes(1000), write_bytes)
+
+    assert cache.lookup('b') is None
+    assert all([cache.lookup(key) for key in ('a', 'c', 'd')])
+    assert cache.total_bytes() == 3000
+    assert not os.path.exists(tmp_path / 'b')
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = CacheManager(str(tmp_path), -1)
+    cache.store('a', bytes(10), write_bytes)
+    assert cache.lookup('a') is None
+
+
+def test_index_is_shared_between_managers(tmp_path):
+    CacheManager(str(tmp_path), 3600).store('a', {'x': 1}, ReaderWriter.write_json)
+    fp = CacheManager(str(tmp_path), 3600).lookup('a')
+    assert ReaderWriter.read_json(fp) == {'x': 1}
+
+
+def test_concurrent_writers(tmp_path):
+    cache = CacheManager(str(tmp_path), 3600, max_bytes=20 * 100)
+
+    def store(i):
+        cache.store(f'k{i}', bytes(100), write_bytes)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(store, range(64)))
+
+    assert cache.total_bytes() <= 20 * 100
+    cached = [f for f in os.listdir(tmp_path) if f.startswith('k')]
+    assert len(cached) == cache.total_bytes() // 100
+
+
+def test_legacy_log_files_are_removed(tmp_path):
+    cache_directory = tmp_path / 'cache'
+    cache_directory.mkdir()
+    legacy = list([str(cache_directory / str(n).zfill(10)) for n in range(2)])
+    outside = tmp_path / 'outside.csv'
+    for fp in legacy + [str(outside)]:
+        write_bytes(b'legacy', fp)
+    with open(cache_directory / 'log.json', 'w') as f:
+        json.dump({
+            'next_call_ref_n': 2,
+            "['inputs'], 'demand.ftr'": legacy[0],
+            "['inputs'], 'solar.ftr'": legacy[1],
+            "['inputs'], 'wind.ftr'": str(outside),
+        }, f)
+
+    CacheManager(str(cache_directory), 3600)
+    assert sorted(os.listdir(cache_directory)) == ['index.sqlite']
+    assert outside.exists()
+
+
+class Source:
+    def __init__(self, cache_manager: CacheManager):
+        self.cache_manager = cache_manager
+        self.calls = 0
+        self.evict_before_read = False
+
+    def read(self, fp: str) -> str:
+        if self.evict_before_read:
+            os.remove(fp)
+        with open(fp) as f:
+            return f.read()
+
+    def load(self, name: str) -> str:
+        self.calls += 1
+        return name.upper()
+
+
+def write_text(value: str, fp: str):
+    with open(fp, 'w') as f:
+        f.write(value)
+
+
+def test_entries_evicted_before_read_are_misses(tmp_path):
+    source = Source(CacheManager(str(tmp_path), 3600))
+    load = cache_data(source.read, write_text)(Source.load)
+    assert load(source, 'demand') == 'DEMAND'
+    assert load(source, 'demand') == 'DEMAND'
+    assert source.calls == 1
+
+    source.evict_before_read = True
+    assert load(source, 'demand') == 'DEMAND'
+    assert source.calls == 2
+    source.evict_before_read = False
+    assert load(source, 'demand') == 'DEMAND'
+    assert source.calls == 2
+
+
+def test_evicted_files_are_expired(tmp_path):
+    cache = CacheManager(str(tmp_path), 3600)
+    cache.store('a', bytes(10), write_bytes)
+    fp = cache.lookup('a')
+    os.remove(fp)
+    assert cache._expired(fp)
+    assert cache.lookup('a') is None
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.results_logging.parquet_sink import ParquetResultsSink
+from portfolio.scenario.sweeps import CapacitySweep, capacity_grid, cap_scenarios
+from portfolio.utils.progress import CallbackPublisher, ProgressReporter
+
+caps = [1500.0, 1e9]
+
+
+def grid() -> list:
+    return capacity_grid({'gen_0': [100.0, 400.0]}, caps)
+
+
+def sorted_results(results: pd.DataFrame) -> pd.DataFrame:
+    return results.sort_values(['scenario_name', 'statistic']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('executor', ['process', 'thread'])
+def test_sweep_results(synthetic_manager, executor):
+    scenarios = grid()
+    completed = []
+    sweep = CapacitySweep(synthetic_manager(), iterations=3, max_workers=2, seed=1, executor=executor)
+    results = sweep.run(scenarios, callback=lambda scenario, rows: completed.append(scenario))
+
+    assert len(results) == len(scenarios) * 2
+    assert set(completed) == set(scenarios)
+    expected_caps = {scenario.scenario_name: scenario.capacity_cap for scenario in scenarios}
+    assert set(results['scenario_name']) == set(expected_caps)
+    np.testing.assert_array_equal(
+        results['capacity_cap'],
+        results['scenario_name'].map(expected_caps)
+    )
+    assert results.groupby('scenario_name')['statistic'].apply(sorted).tolist() == [['mean', 'std']] * 4
+
+
+def test_seeded_sweeps_are_reproducible(synthetic_manager):
+    manager = synthetic_manager()
+    runs = list([
+        CapacitySweep(manager, iterations=3, max_workers=workers, seed=5, executor=executor).run(grid())
+        for executor, workers in [('thread', 2), ('thread', 1), ('process', 2)]
+    ])
+    for results in runs[1:]:
+        pd.testing.assert_frame_equal(sorted_results(results), sorted_results(runs[0]))
+    other = CapacitySweep(manager, iterations=3, seed=6, executor='thread').run(grid())
+    assert not sorted_results(other)['annual_dispatch_cost'].equals(
+        sorted_results(runs[0])['annual_dispatch_cost']
+    )
+
+
+def test_sink_and_progress(synthetic_manager, tmp_path):
+    snapshots = []
+    sink = ParquetResultsSink(str(tmp_path), batch_rows=3)
+    sweep = CapacitySweep(
+        synthetic_manager(),
+        iterations=3,
+        executor='thread',
+        sink=sink,
+        retain_results=False,
+        progress=ProgressReporter([CallbackPublisher(snapshots.append)], interval=0.0),
+    )
+    assert sweep.run(grid()) is None
+
+    stored = sink.read()
+    assert len(stored) == len(grid()) * 2
+    assert set(stored['scenario_name']) == set([scenario.scenario_name for scenario in grid()])
+    sweep_snapshots = list([s for s in snapshots if s.scenarios_total is not None])
+    assert sweep_snapshots[-1].scenarios_completed == sweep_snapshots[-1].scenarios_total == 4
+    assert [s.scenarios_completed for s in sweep_snapshots] == sorted([s.scenarios_completed for s in sweep_snapshots])
+
+
+def test_cap_scenarios_match_each_run(synthetic_manager):
+    manager = synthetic_manager()
+    scenarios = grid()
+    capped_scenarios = cap_scenarios(manager.portfolio, scenarios)
+    for scenario, capped in zip(scenarios, capped_scenarios):
+        assert (capped.scenario_name, capped.capacity_cap) == (scenario.scenario_name, scenario.capacity_cap)
+        run = manager.spawn()
+        run.portfolio.nominal_capacity_cap = scenario.capacity_cap
+        run.update_capacities(scenario.capacities, cap_capacities=True)
+        applied = dict([(a.name, a.nameplate_capacity) for a in run.portfolio.all_assets_list])
+        assert capped.capacities == pytest.approx(applied)
+    # The 1500 MW cap binds, the uncapped grid point does not
+    assert sum(capped_scenarios[0].capacities.values()) < sum(capped_scenarios[2].capacities.values())
@@ -0,0 +1,64 @@
+import pytest
+
+from portfolio.portfolio.results_logging.results_logging import ConvergenceCriteria
+
+
+@pytest.mark.parametrize('settings', [
+    {'check_every': 0},
+    {'check_every': -5},
+    {'confidence': 1.0},
+    {'min_iterations': 1},
+    {'min_iterations': 50, 'max_iterations': 20},
+])
+def test_invalid_criteria(settings):
+    with pytest.raises(ValueError):
+        ConvergenceCriteria({'annual_dispatch_cost': 1e6}, **settings)
+
+
+def test_checks_are_due_every_check_every_after_min_iterations():
+    criteria = ConvergenceCriteria({'annual_dispatch_cost': 1e6}, min_iterations=10, check_every=5)
+    assert [i for i in range(1, 31) if criteria.due(i)] == [10, 15, 20, 25, 30]
+
+
+def test_run_stops_once_converged(synthetic_manager):
+    manager = synthetic_manager()
+    criteria = ConvergenceCriteria(
+        {'annual_dispatch_cost': 0.5},
+        min_iterations=4,
+        max_iterations=40,
+        check_every=2,
+        relative=True
+    )
+    status = manager.monte_carlo(convergence=criteria)
+    assert status.converged
+    assert status.iterations == 4
+    assert len(manager.monte_carlo_logger.log) == 4
+
+
+def test_unlogged_targets_are_rejected_before_running(synthetic_manager):
+    manager = synthetic_manager()
+    criteria = ConvergenceCriteria({'unserved_energy': 1.0}, min_iterations=4, max_iterations=10)
+    with pytest.raises(ValueError, match='unserved_energy'):
+        manager.monte_carlo(convergence=criteria)
+    assert manager.monte_carlo_logger.iterations == 0
+
+    manager.log_dispatch_metrics = True
+    assert manager.monte_carlo(convergence=criteria).iterations >= 4
+
+
+def test_criteria_confidence_applies_per_run(synthetic_manager):
+    manager = synthetic_manager()
+    capacities = {'gen_0': 100.0}
+    criteria = ConvergenceCriteria(
+        {'annual_dispatch_cost': 1e-9}, confidence=0.5, min_iterations=4, max_iterations=6
+    )
+    manager.monte_carlo_capacity_scenario('converging', capacities, 1e9, convergence=criteria)
+    assert manager.monte_carlo_logger.confidence == 0.95
+
+    results = manager.scenario_logger.log.set_index('statistic')
+    log = manager.monte_carlo_logger
+    assert results.loc['ci_half_width', 'annual_dispatch_cost'] == pytest.approx(
+        log.confidence_half_widths(0.5)['annual_dispatch_cost']
+    )
+    assert log.confidence_half_widths()['annual_dispatch_cost'] > \
+        results.loc['ci_half_width', 'annual_dispatch_cost']
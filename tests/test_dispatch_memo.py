@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.dispatch_memo import DispatchMemo
+from portfolio.utils.time_series_utils import DTPerfectForecaster, DTScheduler
+
+
+@pytest.mark.parametrize('storages', [0, 1])
+def test_memo_gives_identical_monte_carlo_log(synthetic_manager, seeded_monte_carlo, storages):
+    manager = synthetic_manager(storages=storages)
+    memo = DispatchMemo()
+    expected = seeded_monte_carlo(manager)
+    result = seeded_monte_carlo(manager, dispatch_memo=memo)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert memo.stats['hits'] > 0
+
+
+def test_memo_is_cleared_with_new_capacities(synthetic_manager):
+    manager = synthetic_manager()
+    manager.dispatch_memo = DispatchMemo()
+    manager.refresh_all()
+    manager.dispatch()
+    manager.clear_dispatch_log()
+    assert manager.dispatch_memo.stats['entries'] == 1
+
+    manager.update_capacities({'gen_0': 10.0}, cap_capacities=False)
+    assert manager.dispatch_memo.stats['entries'] == 0
+
+
+def test_key_follows_capacity_changes(synthetic_manager):
+    manager = synthetic_manager()
+    portfolio = manager.portfolio
+    manager.refresh_all()
+    key = DispatchMemo.key(manager.draw_key(), portfolio)
+
+    portfolio.generators.update_capacities({'gen_0': 10.0})
+    assert DispatchMemo.key(manager.draw_key(), portfolio) != key
+
+
+def test_unidentified_draws_are_not_memoised(synthetic_manager):
+    manager = synthetic_manager()
+    assert DispatchMemo.key(None, manager.portfolio) is None
+
+
+def test_spawned_managers_get_an_empty_memo(synthetic_manager):
+    manager = synthetic_manager()
+    manager.dispatch_memo = DispatchMemo(max_entries=8)
+    manager.refresh_all()
+    manager.dispatch()
+    spawned = manager.spawn()
+    assert spawned.dispatch_memo.stats['entries'] == 0
+    assert spawned.dispatch_memo.max_entries == 8
+
+
+def custom_event_storage(manager):
+    """ Give the storage a datetime scheduler with custom events, and
+    return a datetime-indexed demand for it
+    """
+    storage = manager.portfolio.storages.asset_rank[0]
+    storage.optimiser.scheduler = DTScheduler(
+        datetime(2019, 1, 1),
+        timedelta(days=1),
+        [datetime(2019, 3, 1, 12), datetime(2019, 6, 1, 12)]
+    )
+    storage.optimiser.forecaster = DTPerfectForecaster(timedelta(days=1))
+    return storage, pd.Series(
+        np.asarray(manager.demand.data, dtype=float),
+        index=pd.date_range('2019-01-01', periods=8760, freq='h')
+    )
+
+
+def test_scheduler_states_are_frozen_snapshots(synthetic_manager):
+    storage, _ = custom_event_storage(synthetic_manager(storages=1))
+    scheduler = storage.optimiser.scheduler
+    scheduler.next_event_due = datetime(2020, 1, 1)
+    state = scheduler.state()
+    hash(state)
+
+    scheduler.restore(state)
+    assert scheduler.event_due(datetime(2019, 3, 1, 13))
+    assert scheduler.custom_events == [datetime(2019, 6, 1, 12)]
+    assert dict(state)['custom_events'] == (datetime(2019, 3, 1, 12), datetime(2019, 6, 1, 12))
+
+
+def test_memo_with_custom_event_storage(synthetic_manager):
+    manager = synthetic_manager(storages=1)
+    storage, demand = custom_event_storage(manager)
+    portfolio = manager.portfolio
+    memo = DispatchMemo()
+    key = memo.key(('draw',), portfolio)
+    assert memo.get(key) is None
+
+    portfolio.dispatch(demand)
+    physical = portfolio.physical_dispatch()
+    memo.put(key, physical)
+    expected = portfolio.dispatch_logger.dispatch_log.copy()
+    assert storage.optimiser.scheduler.custom_events == []
+
+    portfolio.replay_dispatch(demand, memo.get(key))
+    pd.testing.assert_frame_equal(portfolio.dispatch_logger.dispatch_log, expected)
+    assert isinstance(storage.optimiser.scheduler.custom_events, list)
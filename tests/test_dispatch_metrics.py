@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from portfolio.portfolio.results_logging.dispatch_metrics import DispatchMetrics
+from portfolio.portfolio.results_logging.results_logging import DispatchLog
+from portfolio.resources.dispatch import DispatchVector
+
+
+@pytest.fixture
+def dispatch_logger():
+    """ Four hours of demand met by solar, a generator and a storage that
+    charges in hour 2. Residual demand is [20, 0, 5, 30]
+    """
+    logger = DispatchLog(np.array([100.0, 80.0, 60.0, 120.0]))
+    logger.log(
+        DispatchVector('solar', discharge=np.array([0.0, 30.0, 40.0, 20.0]), excess=np.array([0.0, 0.0, 10.0, 0.0])),
+        annual_cost=1000.0
+    )
+    logger.log(DispatchVector('gen', discharge=np.array([70.0, 50.0, 20.0, 70.0])), annual_cost=2000.0)
+    logger.log(DispatchVector(
+        'storage',
+        charge=np.array([0.0, 0.0, 5.0, 0.0]),
+        discharge=np.array([10.0, 0.0, 0.0, 0.0])
+    ))
+    logger.log(DispatchVector('idle', discharge=np.zeros(4)))
+    return logger
+
+
+def test_hand_computed_metrics(dispatch_logger):
+    metrics = DispatchMetrics({'solar': 40.0, 'gen': 70.0, 'storage': 10.0, 'idle': 0.0})
+    row = metrics.compute(dispatch_logger)
+
+    assert row['unserved_energy'] == pytest.approx(55.0)
+    assert row['loss_of_load_hours'] == 3
+    assert row['peak_unserved'] == pytest.approx(30.0)
+    assert row['curtailment'] == pytest.approx(10.0)
+    assert row['solar_capacity_factor'] == pytest.approx(90.0 / 160.0)
+    assert row['gen_capacity_factor'] == pytest.approx(210.0 / 280.0)
+    # Only discharge counts towards generation
+    assert row['storage_capacity_factor'] == pytest.approx(10.0 / 40.0)
+    assert row['idle_capacity_factor'] == 0.0
+    assert (row['solar_cost'], row['gen_cost'], row['storage_cost']) == (1000.0, 2000.0, 0.0)
+
+
+def test_unserved_tolerance(dispatch_logger):
+    metrics = DispatchMetrics({'solar': 40.0}, unserved_tolerance=10.0)
+    assert metrics.compute(dispatch_logger)['loss_of_load_hours'] == 2
+
+
+def test_row_is_reused(dispatch_logger):
+    metrics = DispatchMetrics({'gen': 70.0})
+    first = metrics.compute(dispatch_logger)
+    dispatch_logger.clear_log(np.zeros(4))
+    dispatch_logger.log(DispatchVector('gen', discharge=np.zeros(4)))
+    second = metrics.compute(dispatch_logger)
+    assert first['unserved_energy'] == second['unserved_energy'] == 0.0
@@ -0,0 +1,144 @@
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.dispatch_memo import DispatchMemo, PhysicalDispatch
+from portfolio.portfolio.dispatch_store import DispatchStore
+from tests.test_dispatch_memo import custom_event_storage
+
+
+def entries(directory) -> list:
+    return list([
+        os.path.join(directory, fn) for fn in os.listdir(directory)
+        if fn.endswith('.npz')
+    ])
+
+
+def hourly(fp: str) -> bool:
+    with np.load(fp) as entry:
+        return 'dispatch' in entry
+
+
+@pytest.mark.parametrize('storages', [0, 1])
+def test_store_gives_identical_monte_carlo_log(tmp_path, synthetic_manager, seeded_monte_carlo, storages):
+    manager = synthetic_manager(storages=storages)
+    expected = seeded_monte_carlo(manager)
+
+    first = DispatchStore(str(tmp_path))
+    pd.testing.assert_frame_equal(seeded_monte_carlo(manager, dispatch_store=first), expected)
+    assert first.misses > 0
+
+    second = DispatchStore(str(tmp_path))
+    result = seeded_monte_carlo(manager, dispatch_store=second, dispatch_memo=DispatchMemo())
+    pd.testing.assert_frame_equal(result, expected)
+    assert second.misses == 0
+
+
+def test_stored_dispatch_is_repriced(tmp_path, synthetic_manager, seeded_monte_carlo):
+    manager = synthetic_manager()
+    seeded_monte_carlo(manager, dispatch_store=DispatchStore(str(tmp_path)))
+    for asset in manager.portfolio.all_assets_list:
+        asset.technology.fixed_om *= 2
+    expected = seeded_monte_carlo(manager)
+
+    store = DispatchStore(str(tmp_path))
+    pd.testing.assert_frame_equal(seeded_monte_carlo(manager, dispatch_store=store), expected)
+    assert store.misses == 0
+
+
+def test_totals_only_entries(tmp_path, synthetic_manager, seeded_monte_carlo):
+    manager = synthetic_manager()
+    store = DispatchStore(str(tmp_path), hourly=False)
+    seeded_monte_carlo(manager, dispatch_store=store, log_dispatch_metrics=False)
+    assert not any([hourly(fp) for fp in entries(tmp_path)])
+
+    store = DispatchStore(str(tmp_path), hourly=False)
+    seeded_monte_carlo(manager, dispatch_store=store, log_dispatch_metrics=False)
+    assert store.misses == 0
+    # Hourly metrics need hourly entries, which replace totals-only ones
+    store = DispatchStore(str(tmp_path))
+    seeded_monte_carlo(manager, dispatch_store=store)
+    assert store.misses > 0
+    assert all([hourly(fp) for fp in entries(tmp_path)])
+
+
+def test_entries_load_without_pickle(tmp_path):
+    store = DispatchStore(str(tmp_path))
+    states = (('storage_0', (
+        0.5,
+        None,
+        (
+            ('custom_events', (datetime(2019, 5, 1),)),
+            ('interval', timedelta(hours=6)),
+            ('next_event_due', datetime(2019, 1, 1, 6)),
+        )
+    )),)
+    store.put('key', PhysicalDispatch(['gen_0'], {'gen_0': 12.5}, states))
+    for fp in entries(tmp_path):
+        with np.load(fp, allow_pickle=False) as entry:
+            assert all([entry[name].dtype != object for name in entry.files])
+
+    physical = store.get('key', pd.Series(np.zeros(3)))
+    assert physical.dispatch_states == states
+    assert physical.energy_totals == {'gen_0': 12.5}
+    hash(physical.dispatch_states)
+
+
+def test_unsupported_states_are_rejected(tmp_path):
+    store = DispatchStore(str(tmp_path))
+    with pytest.raises(TypeError):
+        store.put('key', PhysicalDispatch(['gen_0'], {'gen_0': 1.0}, (('gen_0', (object(),)),)))
+
+
+def test_size_bound(tmp_path, synthetic_manager, seeded_monte_carlo):
+    store = DispatchStore(str(tmp_path), max_bytes=400_000)
+    seeded_monte_carlo(synthetic_manager(), iterations=10, dispatch_store=store)
+    assert 0 < store.cache_manager.total_bytes() <= 400_000
+    assert sum([os.path.getsize(fp) for fp in entries(tmp_path)]) <= 400_000
+
+
+def test_restored_custom_events_stay_mutable(synthetic_manager, tmp_path):
+    manager = synthetic_manager(storages=1)
+    storage, demand = custom_event_storage(manager)
+    storage.optimiser.scheduler.next_event_due = datetime(2020, 1, 1)
+    store = DispatchStore(str(tmp_path))
+    key = store.key(demand, ('draw',), manager.portfolio)
+    physical = PhysicalDispatch(
+        [storage.name], {storage.name: 0.0}, manager.portfolio.dispatch_states()
+    )
+    store.put(key, physical)
+
+    stored = store.get(key, demand)
+    assert stored.dispatch_states == physical.dispatch_states
+    manager.portfolio.restore_dispatch_states(stored.dispatch_states)
+    scheduler = storage.optimiser.scheduler
+    assert scheduler.event_due(datetime(2019, 3, 1, 13))
+    assert scheduler.custom_events == [datetime(2019, 6, 1, 12)]
+
+
+def test_spawned_managers_share_store_counters(synthetic_manager, tmp_path):
+    store = DispatchStore(str(tmp_path))
+    manager = synthetic_manager()
+    manager.dispatch_store = store
+    assert manager.spawn().dispatch_store is store
+    assert pickle.loads(pickle.dumps(store)).directory == store.directory
+
+
+
+def test_entries_evicted_after_lookup_are_misses(tmp_path, monkeypatch):
+    store = DispatchStore(str(tmp_path))
+    store.put('key', PhysicalDispatch(['gen_0'], {'gen_0': 1.0}, (('gen_0', ()),)))
+    lookup = store.cache_manager.lookup
+
+    def evicting_lookup(key):
+        fp = lookup(key)
+        os.remove(fp)
+        return fp
+
+    monkeypatch.setattr(store.cache_manager, 'lookup', evicting_lookup)
+    assert store.get('key', pd.Series(dtype=float)) is None
+    assert store.misses == 1
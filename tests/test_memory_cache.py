@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+
+from portfolio.utils.data_utils import CacheManager, MemoryCache, s3BucketManager
+
+
+def test_hits_misses_and_entry_limit():
+    cache = MemoryCache(max_entries=2)
+    cache.put('a', {'x': 1})
+    cache.put('b', {'x': 2})
+    assert cache.get('a') == (True, {'x': 1})
+    cache.put('c', {'x': 3})
+
+    assert cache.get('b') == (False, None)
+    assert cache.stats == {'hits': 1, 'misses': 1, 'entries': 2, 'bytes': cache.total_bytes}
+
+
+def test_byte_limit(frame):
+    size = MemoryCache.size_of(frame)
+    cache = MemoryCache(max_entries=10, max_bytes=2 * size)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, frame)
+    assert cache.stats['entries'] == 2
+    assert cache.total_bytes <= 2 * size
+
+    cache.put('too_big', pd.concat([frame] * 3))
+    assert cache.get('too_big') == (False, None)
+
+
+def test_values_are_copied(frame):
+    cache = MemoryCache()
+    cache.put('a', frame)
+    _, cached = cache.get('a')
+    cached['demand'] = 0.0
+    pd.testing.assert_frame_equal(cache.get('a')[1], frame)
+
+
+def test_memory_tier_skips_disk(tmp_path, frame):
+    memory_cache = MemoryCache()
+    manager = s3BucketManager.local(
+        str(tmp_path / 'store'),
+        cache_manager=CacheManager(str(tmp_path / 'cache'), 3600, memory_cache=memory_cache)
+    )
+    manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+    manager.s3_ftr_to_df(['inputs'], 'demand.ftr')
+
+    # Neither the store nor the file cache is read again
+    os.remove(manager.backend.filepath('inputs/demand.ftr'))
+    for fn in os.listdir(tmp_path / 'cache'):
+        if not fn.startswith('index.sqlite'):
+            os.remove(tmp_path / 'cache' / fn)
+    pd.testing.assert_frame_equal(manager.s3_ftr_to_df(['inputs'], 'demand.ftr'), frame)
+    assert memory_cache.hits == 1
+
+
+def test_memory_tier_in_front_of_dummy_cache(tmp_path, frame):
+    memory_cache = MemoryCache()
+    manager = s3BucketManager.local(
+        str(tmp_path),
+        cache_manager=CacheManager('dummy_cache', 1, dummy=True, memory_cache=memory_cache)
+    )
+    manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+    manager.s3_ftr_to_df(['inputs'], 'demand.ftr')
+    os.remove(manager.backend.filepath('inputs/demand.ftr'))
+    pd.testing.assert_frame_equal(manager.s3_ftr_to_df(['inputs'], 'demand.ftr'), frame)
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.results_logging.results_logging import MonteCarloLog
+from portfolio.statistics.sketches import KLLSketch, RunningMoments
+
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(3).lognormal(0.0, 1.0, 5000)
+
+
+def test_running_moments_match_numpy(values):
+    moments = RunningMoments()
+    for value in values:
+        moments.update(value)
+    assert moments.count == len(values)
+    assert moments.mean == pytest.approx(values.mean())
+    assert moments.std == pytest.approx(values.std(ddof=1))
+    assert (moments.min, moments.max) == (values.min(), values.max())
+
+
+def test_merged_running_moments_match_numpy(values):
+    parts = list([RunningMoments() for _ in range(3)])
+    for part, chunk in zip(parts, np.array_split(values, 3)):
+        for value in chunk:
+            part.update(value)
+    parts[0].merge(parts[1])
+    parts[0].merge(parts[2])
+    assert parts[0].mean == pytest.approx(values.mean())
+    assert parts[0].var == pytest.approx(values.var(ddof=1))
+
+
+def test_running_moments_ignore_nan():
+    moments = RunningMoments()
+    for value in (1.0, np.nan, 3.0):
+        moments.update(value)
+    assert (moments.count, moments.mean) == (2, 2.0)
+
+
+def rank_error(sketch: KLLSketch, values: np.ndarray, q: float) -> float:
+    rank = np.searchsorted(np.sort(values), sketch.quantile(q), side='right') / len(values)
+    return abs(rank - q)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_kll_rank_error_bound(values, seed):
+    sketch = KLLSketch(k=200, seed=seed)
+    for value in values:
+        sketch.update(value)
+    assert sketch.size < len(values) / 5
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        assert rank_error(sketch, values, q) <= 2 * 1.7 / sketch.k
+
+
+def test_kll_is_exact_below_k():
+    sketch = KLLSketch(k=200)
+    for value in range(100):
+        sketch.update(float(value))
+    assert sketch.quantile(0.5) == 49.0
+    assert sketch.quantile(1.0) == 99.0
+
+
+def test_merged_kll_rank_error_bound(values):
+    sketches = list([KLLSketch(k=200, seed=seed) for seed in range(4)])
+    for sketch, chunk in zip(sketches, np.array_split(values, 4)):
+        for value in chunk:
+            sketch.update(value)
+    for sketch in sketches[1:]:
+        sketches[0].merge(sketch)
+    assert sketches[0].count == len(values)
+    for q in (0.05, 0.5, 0.95):
+        assert rank_error(sketches[0], values, q) <= 2 * 1.7 / sketches[0].k
+
+
+def iteration_results(seed: int, iterations: int) -> list:
+    rng = np.random.default_rng(seed)
+    return list([
+        pd.Series({'total_cost': rng.normal(100.0, 10.0), 'lolh': rng.poisson(3.0)})
+        for _ in range(iterations)
+    ])
+
+
+def logged(results: list, retain_log: bool = True) -> MonteCarloLog:
+    log = MonteCarloLog({'gen_0': 100.0}, retain_log=retain_log)
+    for result in results:
+        log.log_simulation(result)
+    return log
+
+
+def test_log_buffers_iterations():
+    results = iteration_results(0, 50)
+    log = logged(results[:20])
+    assert len(log.log) == 20
+    for result in results[20:]:
+        log.log_simulation(result)
+    pd.testing.assert_frame_equal(log.log, pd.DataFrame(results))
+    log.clear_log()
+    assert log.log.empty and log.iterations == 0
+
+
+def test_merge_matches_single_log():
+    first, second = iteration_results(0, 300), iteration_results(1, 200)
+    merged = logged(first)
+    merged.merge(logged(second))
+    single = logged(first + second)
+
+    assert merged.iterations == single.iterations == 500
+    pd.testing.assert_frame_equal(merged.log, single.log)
+    pd.testing.assert_series_equal(
+        merged.aggregated_statistics('s', ('mean', 'std'))['total_cost'],
+        single.aggregated_statistics('s', ('mean', 'std'))['total_cost']
+    )
+    pd.testing.assert_series_equal(merged.confidence_half_widths(), single.confidence_half_widths())
+
+
+def test_merge_with_unretained_log_streams():
+    first, second = iteration_results(0, 300), iteration_results(1, 200)
+    merged = logged(first)
+    merged.merge(logged(second, retain_log=False))
+    single = logged(first + second, retain_log=False)
+
+    assert not merged.retain_log and merged.log.empty
+    statistics = ('mean', 'std', 'count', 'ci_half_width')
+    pd.testing.assert_frame_equal(
+        merged.aggregated_statistics('s', statistics),
+        single.aggregated_statistics('s', statistics)
+    )
+    assert merged.quantiles(0.5)['total_cost'] == pytest.approx(100.0, abs=2.0)
@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.results_logging.parquet_sink import ParquetResultsSink
+from portfolio.portfolio.results_logging.results_logging import ScenarioLogger
+
+
+def scenario_results(scenario_name: str, mean: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        'gen_0': [100.0, 100.0],
+        'scenario_name': [scenario_name] * 2,
+        'statistic': ['mean', 'std'],
+        'annual_dispatch_cost': [mean, mean / 10],
+    })
+
+
+def sorted_rows(results: pd.DataFrame) -> pd.DataFrame:
+    results = results.assign(scenario_name=results['scenario_name'].astype(str))
+    return results[sorted(results.columns)] \
+        .sort_values(['scenario_name', 'statistic']) \
+        .reset_index(drop=True)
+
+
+def test_round_trip(tmp_path):
+    expected = pd.concat([scenario_results('a', 1.0), scenario_results('b', 2.0)], ignore_index=True)
+    with ParquetResultsSink(str(tmp_path)) as sink:
+        sink.write_scenario(expected.iloc[:2])
+        sink.write_scenario(expected.iloc[2:])
+    pd.testing.assert_frame_equal(sorted_rows(sink.read()), sorted_rows(expected))
+
+    selected = sink.read(scenario_names=['b'], columns=['statistic', 'annual_dispatch_cost'])
+    assert selected['annual_dispatch_cost'].tolist() == [2.0, 0.2]
+
+
+def test_rows_are_flushed_in_batches(tmp_path):
+    sink = ParquetResultsSink(str(tmp_path), batch_rows=4)
+    sink.write_scenario(scenario_results('a', 1.0))
+    assert not os.path.exists(sink.dataset_path('scenarios'))
+    sink.write_scenario(scenario_results('b', 2.0))
+    assert len(sink.read()) == 4
+
+
+@pytest.mark.parametrize('scenario_name', [
+    'gen_0=100.0_cap=1500.0',
+    'a/b',
+    'with space & symbols%',
+    'ünïcode',
+])
+def test_scenario_names_are_quoted(tmp_path, scenario_name):
+    with ParquetResultsSink(str(tmp_path)) as sink:
+        sink.write_scenario(scenario_results(scenario_name, 1.0))
+        sink.write_scenario(scenario_results('other', 2.0))
+    partitions = os.listdir(sink.dataset_path('scenarios'))
+    assert len(partitions) == 2
+    results = sink.read(scenario_names=[scenario_name])
+    assert results['scenario_name'].astype(str).tolist() == [scenario_name] * 2
+    assert results['annual_dispatch_cost'].tolist() == [1.0, 0.1]
+
+
+def test_iteration_results(tmp_path):
+    iterations = pd.DataFrame({'annual_dispatch_cost': [1.0, 2.0, 3.0]})
+    with ParquetResultsSink(str(tmp_path), write_iterations=True) as sink:
+        sink.write_iteration_results('a', iterations)
+    results = sink.read('iterations')
+    assert results['iteration'].tolist() == [0, 1, 2]
+    assert results['annual_dispatch_cost'].tolist() == [1.0, 2.0, 3.0]
+
+    with ParquetResultsSink(str(tmp_path / 'none')) as sink:
+        sink.write_iteration_results('a', iterations)
+    assert not os.path.exists(sink.dataset_path('iterations'))
+
+
+def test_invalid_dataset(tmp_path):
+    with pytest.raises(ValueError):
+        ParquetResultsSink(str(tmp_path)).read('results')
+
+
+@pytest.mark.parametrize('retain', [True, False])
+def test_scenario_logger_with_sink(tmp_path, retain):
+    sink = ParquetResultsSink(str(tmp_path), write_iterations=True)
+    logger = ScenarioLogger(sink=sink, retain=retain)
+    logger.log_scenario(scenario_results('a', 1.0), pd.DataFrame({'annual_dispatch_cost': [0.9, 1.1]}))
+    logger.log_scenario(scenario_results('b', 2.0))
+    logger.flush()
+
+    assert len(sink.read()) == 4
+    assert len(sink.read('iterations')) == 2
+    assert len(logger.log) == (4 if retain else 0)
@@ -0,0 +1,122 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def assert_in_sync(portfolio):
+    arrays = portfolio.arrays
+    np.testing.assert_array_equal(
+        arrays.nameplate,
+        [asset.nameplate_capacity for asset in arrays.assets]
+    )
+    assert portfolio.total_capacity == pytest.approx(sum([
+        asset.firm_capacity for asset in portfolio.all_assets_list
+    ]))
+
+
+def test_group_and_capper_mutators_keep_view_in_sync(synthetic_manager):
+    portfolio = synthetic_manager(storages=1).portfolio
+    assert_in_sync(portfolio)
+
+    portfolio.generators.update_capacities({'gen_0': 123.0})
+    assert_in_sync(portfolio)
+    assert portfolio.asset_capacities()['gen_0'] == 123.0
+
+    portfolio.storages.scale_asset_capacities(2.0)
+    assert_in_sync(portfolio)
+
+    portfolio.capacity_capper.cap(500.0)
+    assert_in_sync(portfolio)
+
+
+def test_direct_asset_changes_refresh_view(synthetic_manager):
+    portfolio = synthetic_manager(storages=1).portfolio
+    view = portfolio.arrays
+    generator = portfolio.all_assets_dict['gen_0']
+    generator.scale_capacity(2.0)
+    assert portfolio.arrays is not view
+    assert portfolio.asset_capacities()['gen_0'] == pytest.approx(generator.firm_capacity)
+
+    wind = portfolio.all_assets_dict['wind_farm']
+    wind.nameplate_capacity = 11.0
+    assert portfolio.asset_capacities()['wind_farm'] == pytest.approx(wind.firm_capacity)
+    assert_in_sync(portfolio)
+
+    view = portfolio.arrays
+    assert portfolio.arrays is view
+    portfolio.scale_asset_capacities(0.5)
+    assert generator.nameplate_capacity == pytest.approx(view.nameplate[view.index['gen_0']])
+    assert_in_sync(portfolio)
+
+
+def test_copies_invalidate_only_their_own_view(synthetic_manager):
+    portfolio = synthetic_manager().portfolio
+    portfolio.arrays
+    copied = copy.deepcopy(portfolio)
+    copied.generators.update_capacities({'gen_1': 7.0})
+
+    assert_in_sync(copied)
+    assert_in_sync(portfolio)
+    assert portfolio.asset_capacities()['gen_1'] != 7.0
+
+
+def test_vector_capping_matches_capacity_capper(synthetic_manager):
+    portfolio = synthetic_manager().portfolio
+    reference = copy.deepcopy(portfolio)
+    cap = 0.5 * portfolio.total_capacity
+
+    portfolio.nominal_capacity_cap = cap
+    portfolio.cap_capacities()
+    reference.capacity_capper.cap(reference.total_capacity - cap)
+
+    assert portfolio.asset_capacities() == pytest.approx(reference.asset_capacities())
+    assert portfolio.total_capacity == pytest.approx(cap)
+
+
+def test_capped_capacities_match_one_by_one_capping(synthetic_manager):
+    portfolio = synthetic_manager().portfolio
+    names = list([asset.name for asset in portfolio.generators.asset_rank])
+    scenarios = pd.DataFrame(
+        np.random.default_rng(0).uniform(100.0, 2000.0, size=(5, len(names))),
+        columns=names
+    )
+    caps = np.linspace(1000.0, 5000.0, 5)
+    capped = portfolio.capped_capacities(scenarios, caps)
+
+    for i, (_, scenario) in enumerate(scenarios.iterrows()):
+        single = copy.deepcopy(portfolio)
+        single.nominal_capacity_cap = caps[i]
+        single.update_capacities(scenario.to_dict(), cap_capacities=True)
+        for asset in single.all_assets_list:
+            assert capped.iloc[i][asset.name] == pytest.approx(asset.nameplate_capacity)
+
+
+@pytest.mark.parametrize('storages', [0, 1])
+def test_cap_batch_matches_capacity_capper(synthetic_manager, storages):
+    portfolio = synthetic_manager(storages=storages).portfolio
+    arrays = portfolio.arrays
+    nameplate = arrays.nameplate.copy()
+    rng = np.random.default_rng(1)
+    capacities = nameplate * rng.uniform(0.5, 3.0, size=(8, len(nameplate)))
+    # Cap from not binding, through one cappable asset, to all of them
+    caps = np.linspace(0.05, 1.2, 8) * (capacities @ arrays.firm_capacity_factor)
+    capped = arrays.cap_batch(capacities, caps)
+
+    for row, cap, capped_row in zip(capacities, caps, capped):
+        reference = copy.deepcopy(portfolio)
+        for asset, capacity in zip(reference.arrays.assets, row):
+            asset.nameplate_capacity = capacity
+        reference.capacity_capper.cap(reference.total_capacity - cap)
+        np.testing.assert_allclose(
+            capped_row,
+            [reference.all_assets_dict[name].nameplate_capacity for name in arrays.names]
+        )
+    np.testing.assert_array_equal(arrays.nameplate, nameplate)
+    np.testing.assert_array_equal(
+        [asset.nameplate_capacity for asset in arrays.assets], nameplate
+    )
+
+    single_cap = arrays.cap_batch(capacities, caps[3])
+    np.testing.assert_allclose(single_cap[3], capped[3])
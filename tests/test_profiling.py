@@ -0,0 +1,86 @@
+import json
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from portfolio.utils import profiling
+from portfolio.utils.profiling import Profiler, span
+
+
+def record_spans(count: int):
+    for _ in range(count):
+        with span('inner'):
+            pass
+
+
+def test_spans_from_threads_are_merged():
+    with profiling.profiling(record_events=True) as profiler:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(record_spans, [500] * 8))
+        record_spans(100)
+
+    spans = profiler.spans
+    assert spans['inner'].count == 4100
+    assert spans['inner'].total == pytest.approx(profiler.totals()['inner'])
+    assert len(profiler.events) == 4100
+    assert len(set([event[4] for event in profiler.events])) > 1
+
+
+def test_disabled_spans_are_not_recorded():
+    profiler = Profiler()
+    record_spans(10)
+    with profiling.profiling(profiler=profiler):
+        record_spans(10)
+    record_spans(10)
+    assert profiling.active_profiler() is None
+    assert profiler.spans['inner'].count == 10
+
+
+def test_summary_and_quantiles():
+    profiler = Profiler()
+    for duration_ms in range(1, 101):
+        profiler.record('slow', 0, duration_ms * 10 ** 6)
+    profiler.record('fast', 0, 1000)
+    summary = profiler.summary()
+
+    assert list(summary.index) == ['slow', 'fast']
+    slow = summary.loc['slow']
+    assert slow['count'] == 100
+    assert slow['mean'] == pytest.approx(0.0505)
+    assert slow['p50'] == pytest.approx(0.05, abs=0.002)
+    assert slow['p50'] <= slow['p95'] <= slow['p99'] <= slow['max'] == pytest.approx(0.1)
+    assert json.loads(profiler.to_json())['fast']['count'] == 1
+
+
+def test_merge_pickled_profilers():
+    profiler = Profiler(record_events=True, max_events=3)
+    profiler.record('a', 0, 10)
+    worker = pickle.loads(pickle.dumps(profiler))
+    worker.record('a', 10, 20)
+    worker.record('b', 30, 5)
+
+    profiler.merge(worker)
+    assert profiler.spans['a'].count == 3
+    assert profiler.spans['b'].total == pytest.approx(5e-9)
+    assert len(profiler.events) == 3
+
+
+def test_collect_replaces_active_profiler():
+    with profiling.profiling(record_events=True) as profiler:
+        record_spans(5)
+        collected = profiling.collect()
+        record_spans(2)
+        assert collected is profiler
+        assert profiling.active_profiler().record_events
+        assert profiling.active_profiler().spans['inner'].count == 2
+    assert collected.spans['inner'].count == 5
+
+
+def test_chrome_trace(tmp_path):
+    with profiling.profiling(record_events=True) as profiler:
+        record_spans(3)
+    fp = tmp_path / 'trace.json'
+    profiler.to_chrome_trace(str(fp))
+    events = json.loads(fp.read_text())['traceEvents']
+    assert [event['name'] for event in events] == ['inner'] * 3
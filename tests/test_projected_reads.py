@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.utils.data_utils import CacheManager, s3BucketManager
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def wide() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.uniform(size=(1000, 50)), columns=[f'site_{i}' for i in range(50)])
+
+
+def write_inputs(manager: s3BucketManager, df: pd.DataFrame):
+    manager.df_to_s3_ftr(df, ['inputs'], 'traces.ftr', chunksize=100)
+    manager.df_to_s3_parquet(df, ['inputs'], 'traces.parquet', row_group_size=100, index=False)
+    manager.df_to_s3_csv(df, ['inputs'], 'traces.csv', index=False)
+
+
+@pytest.mark.parametrize('read', ['s3_ftr_to_df', 's3_parquet_to_df', 's3_csv_to_df'])
+@pytest.mark.parametrize('columns, rows', [
+    (['site_3'], None),
+    (['site_7', 'site_2'], None),
+    (None, (150, 420)),
+    (['site_9'], (950, 1000)),
+    (['site_9'], (10, 10)),
+])
+def test_projections_match_pandas(tmp_path, wide, read, columns, rows):
+    manager = s3BucketManager.local(str(tmp_path))
+    write_inputs(manager, wide)
+    expected = wide if columns is None else wide[columns]
+    if rows is not None:
+        expected = expected.iloc[rows[0]:rows[1]].reset_index(drop=True)
+    result = getattr(manager, read)(['inputs'], f'traces.{read.split("_")[1]}', columns, rows)
+    # An empty CSV range carries no dtypes
+    pd.testing.assert_frame_equal(
+        result,
+        expected,
+        check_index_type=False,
+        check_dtype=len(expected) > 0 or read != 's3_csv_to_df'
+    )
+
+
+def test_invalid_row_range(tmp_path, wide):
+    manager = s3BucketManager.local(str(tmp_path))
+    write_inputs(manager, wide)
+    with pytest.raises(ValueError):
+        manager.s3_ftr_to_df(['inputs'], 'traces.ftr', rows=(5, 2))
+
+
+def test_cache_key_includes_projection(tmp_path, wide):
+    manager = s3BucketManager.local(
+        str(tmp_path / 'store'),
+        cache_manager=CacheManager(str(tmp_path / 'cache'), 3600)
+    )
+    write_inputs(manager, wide)
+    first = manager.s3_ftr_to_df(['inputs'], 'traces.ftr', ['site_1'])
+    second = manager.s3_ftr_to_df(['inputs'], 'traces.ftr', ['site_2'])
+    assert list(first.columns) == ['site_1']
+    assert list(second.columns) == ['site_2']
+
+
+def test_s3_reads_fetch_only_projected_ranges(s3, monkeypatch):
+    rng = np.random.default_rng(0)
+    wide = pd.DataFrame(rng.uniform(size=(20000, 50)), columns=[f'site_{i}' for i in range(50)])
+    manager = s3BucketManager(s3, 'testing', 'testing')
+    manager.df_to_s3_ftr(wide, ['inputs'], 'traces.ftr')
+    manager.df_to_s3_parquet(wide, ['inputs'], 'traces.parquet', index=False)
+    client = manager.backend.client
+    get_object = client.get_object
+    fetched = []
+
+    def counting_get_object(**kwargs):
+        response = get_object(**kwargs)
+        assert 'Range' in kwargs
+        fetched.append(response['ContentLength'])
+        return response
+    monkeypatch.setattr(client, 'get_object', counting_get_object)
+
+    for fn in ('traces.ftr', 'traces.parquet'):
+        fetched.clear()
+        size = client.head_object(Bucket=s3, Key=f'inputs/{fn}')['ContentLength']
+        read = manager.s3_ftr_to_df if fn.endswith('ftr') else manager.s3_parquet_to_df
+        result = read(['inputs'], fn, ['site_4'])
+        pd.testing.assert_series_equal(result['site_4'], wide['site_4'])
+        assert sum(fetched) < size / 10
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio.portfolio.dispatch_memo import DispatchMemo
+from portfolio.scenario.racing import CapacityScenarioRace
+from portfolio.statistics.sampling import thread_random_state
+from portfolio.utils.lazy_imports import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+class SyntheticRace(CapacityScenarioRace):
+    """ Race whose batches draw the metric from normal distributions with
+    known means (by candidate name) instead of dispatching
+    """
+    means: dict = None
+    std: float = 1.0
+
+    def _run_batch(self, candidate, base_capacities):
+        iterations = min(self.batch_iterations, self.max_iterations - candidate.iterations)
+        rng = np.random.default_rng([len(candidate.name), candidate.iterations])
+        draws = rng.normal(self.means[candidate.name], self.std, iterations)
+        candidate.log = pd.concat(
+            [candidate.log, pd.DataFrame({self.metric: draws})],
+            ignore_index=True
+        )
+
+
+def race(manager, means: dict, **settings) -> SyntheticRace:
+    synthetic = SyntheticRace(manager, capacity_cap=1e9, **settings)
+    synthetic.means = means
+    return synthetic
+
+
+def candidates(means: dict) -> dict:
+    return {name: {} for name in means}
+
+
+def test_elimination_keeps_best_candidate(synthetic_manager):
+    means = {'a': 0.0, 'bb': 1.0, 'ccc': 10.0}
+    synthetic = race(synthetic_manager(), means, batch_iterations=10, max_iterations=400)
+    ranking = synthetic.run(candidates(means))
+
+    assert list(ranking.index) == ['a', 'bb', 'ccc']
+    assert ranking['survivor'].tolist() == [True, False, False]
+    assert ranking.loc['ccc', 'eliminated_round'] == 1
+    assert ranking.loc['bb', 'eliminated_round'] > 1
+    assert ranking.loc['ccc', 'iterations'] == 10
+    assert ranking.loc['a', 'iterations'] < 400
+
+
+def test_equal_candidates_run_to_max_iterations(synthetic_manager):
+    means = {'a': 0.0, 'bb': 0.0}
+    ranking = race(synthetic_manager(), means, batch_iterations=10, max_iterations=50).run(candidates(means))
+    assert ranking['survivor'].all()
+    assert (ranking['iterations'] == 50).all()
+
+
+def test_tolerance_stops_race_early(synthetic_manager):
+    means = {'a': 0.0, 'bb': 0.1}
+    ranking = race(
+        synthetic_manager(), means, batch_iterations=10, max_iterations=200, tolerance=100.0
+    ).run(candidates(means))
+    assert (ranking['iterations'] == 10).all()
+
+
+def test_successive_halving(synthetic_manager):
+    means = {'a': 0.0, 'bb': 0.01, 'ccc': 0.02, 'dddd': 0.03}
+    ranking = race(
+        synthetic_manager(), means, batch_iterations=10, max_iterations=100, halving_fraction=0.5
+    ).run(candidates(means))
+    assert ranking['survivor'].sum() == 1
+    assert ranking['eliminated_round'].max() == 2
+
+
+def test_bonferroni_alpha(synthetic_manager):
+    means = {'a': 0.0, 'bb': 0.0, 'ccc': 0.0}
+    synthetic = race(synthetic_manager(), means, batch_iterations=10, max_iterations=40, confidence=0.9)
+    ranking = synthetic.run(candidates(means))
+
+    assert synthetic.alpha == pytest.approx(0.1 / (3 * 4))
+    candidate = synthetic.candidates[0]
+    n = candidate.iterations
+    expected = stats.t.ppf(1 - synthetic.alpha / 2, n - 1) * candidate.log[synthetic.metric].std() / np.sqrt(n)
+    assert ranking.loc['a', 'ci_half_width'] == pytest.approx(expected)
+
+
+def test_invalid_settings(synthetic_manager):
+    with pytest.raises(ValueError):
+        CapacityScenarioRace(synthetic_manager(), 1e9, batch_iterations=1)
+    with pytest.raises(ValueError):
+        CapacityScenarioRace(synthetic_manager(), 1e9, confidence=1.0)
+
+
+def test_memo_is_kept_across_batches(synthetic_manager, monkeypatch):
+    manager = synthetic_manager()
+    manager.dispatch_memo = DispatchMemo()
+    cleared = []
+    monkeypatch.setattr(DispatchMemo, 'clear', lambda memo: cleared.append(memo))
+    race = CapacityScenarioRace(manager, 1e9, batch_iterations=4, max_iterations=12)
+    with thread_random_state(1):
+        ranking = race.run({'small': {'gen_0': 100.0}, 'large': {'gen_0': 2000.0}})
+
+    assert cleared == []
+    assert ranking['iterations'].min() >= 4
+    # Entries from earlier batches are still held
+    assert race._run.dispatch_memo.stats['entries'] > race.batch_iterations
@@ -0,0 +1,47 @@
+import numpy as np
+
+from portfolio.portfolio.constraints import CapacityConstraints, StochasticWindowCapacityConstraint
+from portfolio.resources.passive_generators import PassiveResources, SimplePassiveResource
+
+
+def share_curve(manager):
+    """ Add a constraint and a passive resource reading the same curve, and
+    count refreshes of that curve
+    """
+    constraint = StochasticWindowCapacityConstraint.from_array(
+        'constraint', 'capacity_factor', np.random.default_rng(0).uniform(size=3 * 8760), True
+    )
+    curve = constraint.constraint_model
+    resource = SimplePassiveResource(resource=curve)
+    manager.passive_resource = PassiveResources(manager.passive_resource.resources + [resource])
+    manager.constraints = CapacityConstraints([constraint])
+
+    refreshes = []
+    refresh = curve.refresh
+
+    def counted_refresh():
+        refreshes.append(curve)
+        refresh()
+    curve.refresh = counted_refresh
+    return constraint, resource, refreshes
+
+
+def test_sources_shared_across_collections_are_sampled_once(synthetic_manager):
+    manager = synthetic_manager()
+    constraint, resource, refreshes = share_curve(manager)
+    for _ in range(3):
+        manager.refresh_all()
+        np.testing.assert_array_equal(resource.data, constraint.constraint)
+    assert len(refreshes) == 3
+
+
+def test_complementary_resources_see_one_draw(synthetic_manager):
+    manager = synthetic_manager()
+    solar, wind = manager.passive_resource.resources
+    for _ in range(5):
+        manager.refresh_all()
+        curve = solar.resource
+        np.testing.assert_array_equal(solar.data, curve.data['solar'])
+        np.testing.assert_array_equal(wind.data, curve.data['wind'])
+        assert solar.draw_key == wind.draw_key
+
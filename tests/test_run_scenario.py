@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from portfolio.scenario.scenarios import CapacityScenario
+
+
+def scenario(manager, name: str = 'doubled') -> CapacityScenario:
+    return CapacityScenario(
+        name,
+        {asset.name: 2 * asset.nameplate_capacity for asset in manager.portfolio.all_assets_list},
+        1e9
+    )
+
+
+def template_state(manager) -> tuple:
+    return (
+        dict([(a.name, a.nameplate_capacity) for a in manager.portfolio.all_assets_list]),
+        np.array(manager.demand.data, dtype=float),
+        manager.portfolio.dispatch_states(),
+        manager.portfolio.nominal_capacity_cap,
+        manager.monte_carlo_logger.iterations,
+        manager.scenario_logger,
+    )
+
+
+def test_template_is_unchanged(synthetic_manager):
+    manager = synthetic_manager(storages=1)
+    capacities, demand, states, cap, iterations, scenario_logger = template_state(manager)
+
+    results = manager.run_scenario(scenario(manager), iterations=5, seed=1)
+    assert results['scenario_name'].eq('doubled').all()
+
+    after = template_state(manager)
+    assert after[0] == capacities
+    np.testing.assert_array_equal(after[1], demand)
+    assert after[2:] == (states, cap, iterations, scenario_logger)
+
+
+def test_thread_scenarios_draw_independently(synthetic_manager):
+    manager = synthetic_manager()
+    seeds = [1, 2, 1]
+    with ThreadPoolExecutor(3) as executor:
+        results = list(executor.map(
+            lambda seed: manager.run_scenario(scenario(manager), iterations=10, seed=seed),
+            seeds
+        ))
+    pd.testing.assert_frame_equal(results[0], results[2])
+    assert not results[0]['annual_dispatch_cost'].equals(results[1]['annual_dispatch_cost'])
@@ -0,0 +1,107 @@
+import threading
+from time import sleep
+
+import pandas as pd
+import pytest
+
+from portfolio.utils.data_utils import s3BucketManager
+from portfolio.utils.storage_backends import S3Backend
+
+botocore_exceptions = pytest.importorskip('botocore.exceptions')
+
+
+def client_error(code: str):
+    return botocore_exceptions.ClientError({'Error': {'Code': code}}, 'PutObject')
+
+
+@pytest.fixture
+def manager(s3):
+    return s3BucketManager(s3, 'testing', 'testing', max_workers=4, backoff=0.0)
+
+
+def test_round_trips(manager, frame):
+    manager.df_to_s3_ftr(frame, ['inputs', 'nsw'], 'demand.ftr')
+    manager.df_to_s3_csv(frame, ['inputs', 'nsw'], 'demand.csv', index=False)
+    manager.dict_to_s3_json({'year': 2019, 'regions': ['nsw']}, ['inputs'], 'meta.json')
+
+    pd.testing.assert_frame_equal(manager.s3_ftr_to_df(['inputs', 'nsw'], 'demand.ftr'), frame)
+    pd.testing.assert_frame_equal(manager.s3_csv_to_df(['inputs', 'nsw'], 'demand.csv'), frame)
+    assert manager.s3_json_to_dict(['inputs'], 'meta.json') == {'year': 2019, 'regions': ['nsw']}
+
+
+def test_many_round_trip_in_order(manager, frame):
+    frames = list([frame.assign(demand=frame['demand'] * i) for i in range(12)])
+    manager.df_to_s3_ftr_many([(df, ['inputs'], f'{i}.ftr') for i, df in enumerate(frames)])
+    manager.dict_to_s3_json_many([({'i': i}, ['meta'], f'{i}.json') for i in range(12)])
+
+    loaded = manager.s3_ftr_to_df_many([(['inputs'], f'{i}.ftr') for i in range(12)])
+    for expected, result in zip(frames, loaded):
+        pd.testing.assert_frame_equal(result, expected)
+    assert manager.s3_json_to_dict_many([(['meta'], f'{i}.json') for i in range(12)]) \
+        == list([{'i': i} for i in range(12)])
+
+
+def test_many_shares_one_pooled_client(manager, frame, monkeypatch):
+    sessions = []
+    session = S3Backend._session
+
+    def counting_session(backend):
+        sessions.append(backend)
+        return session(backend)
+    monkeypatch.setattr(S3Backend, '_session', counting_session)
+
+    manager.df_to_s3_ftr_many([(frame, ['inputs'], f'{i}.ftr') for i in range(16)])
+    manager.s3_ftr_to_df_many([(['inputs'], f'{i}.ftr') for i in range(16)])
+    assert len(sessions) == 1
+    assert manager.backend.client is manager.backend.client
+
+
+def test_many_bounds_parallelism(manager, frame, monkeypatch):
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+    put = manager.backend.put
+
+    def slow_put(key, body):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        sleep(0.02)
+        put(key, body)
+        with lock:
+            active[0] -= 1
+    monkeypatch.setattr(manager.backend, 'put', slow_put)
+
+    manager.df_to_s3_ftr_many([(frame, ['inputs'], f'{i}.ftr') for i in range(16)])
+    assert 1 < peak[0] <= manager.max_workers
+
+
+def test_transient_errors_are_retried(manager, frame, monkeypatch):
+    client = manager.backend.client
+    put_object = client.put_object
+    calls = []
+
+    def flaky_put_object(**kwargs):
+        calls.append(kwargs['Key'])
+        if len(calls) <= 2:
+            raise client_error('SlowDown')
+        return put_object(**kwargs)
+    monkeypatch.setattr(client, 'put_object', flaky_put_object)
+
+    manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+    assert len(calls) == 3
+    pd.testing.assert_frame_equal(manager.s3_ftr_to_df(['inputs'], 'demand.ftr'), frame)
+
+
+def test_permanent_errors_are_not_retried(manager, monkeypatch):
+    client = manager.backend.client
+    calls = []
+
+    def denied_put_object(**kwargs):
+        calls.append(kwargs['Key'])
+        raise client_error('AccessDenied')
+    monkeypatch.setattr(client, 'put_object', denied_put_object)
+
+    with pytest.raises(botocore_exceptions.ClientError):
+        manager.dict_to_s3_json({}, ['meta'], 'denied.json')
+    assert len(calls) == 1
@@ -0,0 +1,77 @@
+import copy
+
+import numpy as np
+import pytest
+
+from portfolio.statistics.sampling import (
+    LatinHypercubeSampler,
+    PseudoRandomSampler,
+    SobolSampler,
+    StratifiedChoiceSampler,
+    thread_random_state,
+)
+
+
+def assert_stratified(samples: np.ndarray):
+    strata = (samples * len(samples)).astype(int)
+    for column in strata.T:
+        np.testing.assert_array_equal(np.sort(column), np.arange(len(samples)))
+
+
+@pytest.mark.parametrize('sampler_type', [LatinHypercubeSampler, SobolSampler])
+def test_each_block_is_stratified(sampler_type):
+    sampler = sampler_type(seed=1, batch_size=64)
+    samples = sampler.uniform(3, 3 * 64)
+    for block in np.split(samples, 3):
+        assert_stratified(block)
+
+
+@pytest.mark.parametrize('sampler_type', [LatinHypercubeSampler, SobolSampler])
+def test_blocks_are_kept_per_dimension(sampler_type):
+    sampler = sampler_type(seed=1, batch_size=64)
+    first = sampler.uniform(3, 40)
+    sampler.uniform(1, 10)
+    second = sampler.uniform(3, 24)
+    assert_stratified(np.concatenate([first, second]))
+
+
+def test_sobol_block_is_balanced_in_two_dimensions():
+    samples = SobolSampler(seed=2, batch_size=64).uniform(2, 64)
+    cells = (samples * 8).astype(int)
+    counts = np.zeros((8, 8), dtype=int)
+    np.add.at(counts, (cells[:, 0], cells[:, 1]), 1)
+    assert (counts == 1).all()
+
+
+def test_sobol_batch_size_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        SobolSampler(batch_size=100)
+
+
+def test_stratified_choices_visit_every_choice():
+    sampler = StratifiedChoiceSampler(seed=3)
+    indices = sampler.choice_indices(5, 20)
+    for run in np.split(indices, 4):
+        np.testing.assert_array_equal(np.sort(run), np.arange(5))
+
+
+@pytest.mark.parametrize('sampler_type', [PseudoRandomSampler, LatinHypercubeSampler, SobolSampler])
+def test_seeded_samplers_are_reproducible(sampler_type):
+    sampler = sampler_type(seed=4)
+    np.testing.assert_array_equal(sampler.uniform(2, 100), sampler_type(seed=4).uniform(2, 100))
+
+    copied = copy.deepcopy(sampler)
+    np.testing.assert_array_equal(copied.uniform(2, 10), sampler.uniform(2, 10))
+
+
+@pytest.mark.parametrize('sampler_type', [PseudoRandomSampler, LatinHypercubeSampler])
+def test_unseeded_copies_draw_from_thread_random_state(sampler_type):
+    template = sampler_type()
+    template.uniform(2, 10)
+
+    def draws(seed: int) -> np.ndarray:
+        with thread_random_state(seed):
+            return copy.deepcopy(template).uniform(2, 10)
+
+    np.testing.assert_array_equal(draws(1), draws(1))
+    assert not np.array_equal(draws(1), draws(2))
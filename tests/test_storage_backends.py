@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+from portfolio.utils.data_utils import s3BucketManager
+from portfolio.utils.storage_backends import LocalBackend
+
+pa = pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def local(tmp_path) -> s3BucketManager:
+    return s3BucketManager.local(str(tmp_path))
+
+
+def test_local_round_trips(local, frame):
+    local.df_to_s3_ftr(frame, ['inputs', 'nsw'], 'demand.ftr')
+    local.df_to_s3_parquet(frame, ['inputs', 'nsw'], 'demand.parquet')
+    local.df_to_s3_csv(frame, ['inputs', 'nsw'], 'demand.csv', index=False)
+    local.dict_to_s3_json({'year': 2019}, ['inputs'], 'meta.json')
+
+    pd.testing.assert_frame_equal(local.s3_ftr_to_df(['inputs', 'nsw'], 'demand.ftr'), frame)
+    pd.testing.assert_frame_equal(local.s3_parquet_to_df(['inputs', 'nsw'], 'demand.parquet'), frame)
+    pd.testing.assert_frame_equal(local.s3_csv_to_df(['inputs', 'nsw'], 'demand.csv'), frame)
+    assert local.s3_json_to_dict(['inputs'], 'meta.json') == {'year': 2019}
+    assert os.path.exists(local.backend.filepath('inputs/nsw/demand.ftr'))
+
+
+def test_local_writes_leave_no_temporary_files(local, frame):
+    local.df_to_s3_ftr_many([(frame, ['inputs'], f'{i}.ftr') for i in range(8)])
+    assert sorted(os.listdir(local.backend.filepath('inputs'))) \
+        == sorted([f'{i}.ftr' for i in range(8)])
+
+
+@pytest.mark.parametrize('memory_map, file_type', [
+    (True, 'MemoryMappedFile'),
+    (False, 'OSFile'),
+])
+def test_local_feather_reads_are_memory_mapped(tmp_path, frame, memory_map, file_type):
+    backend = LocalBackend(str(tmp_path), memory_map)
+    manager = s3BucketManager.local(str(tmp_path), memory_map=memory_map)
+    manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+    with backend.open_input_file('inputs/demand.ftr') as source:
+        assert type(source).__name__ == file_type
+    pd.testing.assert_frame_equal(backend.read_feather('inputs/demand.ftr'), frame)
+
+
+def test_local_and_s3_backends_agree(s3, tmp_path, frame):
+    local = s3BucketManager.local(str(tmp_path))
+    remote = s3BucketManager(s3, 'testing', 'testing')
+    for manager in (local, remote):
+        manager.df_to_s3_ftr(frame, ['inputs'], 'demand.ftr')
+        manager.df_to_s3_csv(frame, ['inputs'], 'demand.csv', index=False)
+    pd.testing.assert_frame_equal(
+        local.s3_ftr_to_df(['inputs'], 'demand.ftr'),
+        remote.s3_ftr_to_df(['inputs'], 'demand.ftr')
+    )
+    pd.testing.assert_frame_equal(
+        local.s3_csv_to_df(['inputs'], 'demand.csv'),
+        remote.s3_csv_to_df(['inputs'], 'demand.csv')
+    )
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from portfolio.portfolio.results_logging.trace_archive import DispatchTraceRecorder, EveryNthSelector
+from portfolio.scenario.racing import CapacityScenarioRace
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def recorded_manager(tmp_path, synthetic_manager):
+    manager = synthetic_manager()
+    manager.trace_recorder = DispatchTraceRecorder(str(tmp_path), EveryNthSelector(2))
+    return manager
+
+
+def capacities(manager) -> dict:
+    return {a.name: a.nameplate_capacity for a in manager.portfolio.all_assets_list}
+
+
+def test_one_readable_file_per_scenario(recorded_manager):
+    recorder = recorded_manager.trace_recorder
+    for name in ('low', 'high'):
+        recorded_manager.monte_carlo_capacity_scenario(name, capacities(recorded_manager), 1e9, iterations=4)
+
+    assert sorted(os.listdir(recorder.directory)) == ['high.arrow', 'low.arrow']
+    table = DispatchTraceRecorder.read_traces(recorder.path('low'))
+    assert sorted(set(table['iteration'].to_pylist())) == [0, 2]
+    assert table.num_rows == 2 * 8760
+
+
+def test_race_does_not_archive_batches(recorded_manager):
+    base = capacities(recorded_manager)
+    race = CapacityScenarioRace(recorded_manager, 1e9, batch_iterations=2, max_iterations=4)
+    race.run({'a': base, 'b': {**base, 'gen_0': 2 * base['gen_0']}})
+
+    assert os.listdir(recorded_manager.trace_recorder.directory) == []
+
+
+def test_offering_outside_a_scenario_raises(recorded_manager):
+    with pytest.raises(RuntimeError):
+        recorded_manager.monte_carlo(2)
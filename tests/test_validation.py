@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from portfolio.resources.dispatch import DispatchVector
+from portfolio.resources.technologies import Validator as TechnologyValidator
+from portfolio.utils.validation import should_validate, validation, validation_level, set_validation_level
+
+
+def negative_dispatch() -> DispatchVector:
+    return DispatchVector('gen_0', discharge=np.array([1.0, -1.0]))
+
+
+def test_strict_runs_every_check():
+    with validation('strict'):
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                negative_dispatch()
+
+
+def test_off_skips_checks():
+    with validation('off'):
+        dispatch = negative_dispatch()
+    np.testing.assert_array_equal(dispatch.charge, np.zeros(2))
+    assert validation_level() == 'strict'
+
+
+def test_sampled_runs_every_nth_check():
+    with validation('sampled', sample_every=3):
+        raised = []
+        for _ in range(7):
+            try:
+                negative_dispatch()
+                raised.append(False)
+            except ValueError:
+                raised.append(True)
+    assert raised == [True, False, False, True, False, False, True]
+
+
+def test_construction_checks_ignore_level():
+    with validation('off'):
+        with pytest.raises(ValueError):
+            TechnologyValidator.is_proportion(1.5, 'cappable_capacity')
+
+
+def test_sampled_counts_are_thread_safe():
+    with validation('sampled', sample_every=10):
+        with ThreadPoolExecutor(8) as executor:
+            checks = list(executor.map(lambda _: should_validate('check'), range(8000)))
+    assert sum(checks) == 800
+
+
+def test_invalid_level():
+    with pytest.raises(ValueError):
+        set_validation_level('lenient')
+    with pytest.raises(ValueError):
+        set_validation_level('sampled', sample_every=0)
+    assert validation_level() == 'strict'